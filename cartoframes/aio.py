@@ -0,0 +1,146 @@
+"""Asynchronous API: coroutines of the CARTO operations that don't block the event loop.
+
+The operations run the same code as the synchronous functions in a pool of threads of every account,
+over the pooled HTTP connections of the credentials, so the data is streamed and encoded in the same way.
+The concurrent operations of every account are limited by `setup_aio`.
+
+Example:
+    >>> from cartoframes import aio
+    >>> gdf = await aio.read_carto('table_name', credentials)
+    >>> await aio.to_carto(gdf, 'new_table_name', credentials)
+
+"""
+
+import asyncio
+import weakref
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .auth.defaults import get_default_credentials
+from .io import carto
+from .io.managers.context_manager import ContextManager
+from .utils.utils import check_credentials
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+_max_concurrency = DEFAULT_MAX_CONCURRENCY
+
+# Limiters by event loop and account
+_limiters = weakref.WeakKeyDictionary()
+
+
+def setup_aio(max_concurrency=None):
+    '''Update the configuration of the asynchronous API.
+
+    Args:
+        max_concurrency (int, optional): maximum number of concurrent operations by account.
+            The rest of operations wait for their turn. Default is 8.
+
+    '''
+    global _max_concurrency
+
+    if max_concurrency is not None and (not isinstance(max_concurrency, int) or max_concurrency < 1):
+        raise ValueError('Wrong max_concurrency value. You should provide an integer >= 1.')
+
+    _max_concurrency = max_concurrency or DEFAULT_MAX_CONCURRENCY
+
+    for loop_limiters in list(_limiters.values()):
+        for limiter in loop_limiters.values():
+            limiter.executor.shutdown(wait=False)
+    _limiters.clear()
+
+
+async def read_carto(source, credentials=None, **kwargs):
+    """Coroutine of :py:meth:`read_carto <cartoframes.read_carto>`, with the same arguments.
+    The `chunksize` reads are not available."""
+    if kwargs.get('chunksize') is not None:
+        raise ValueError('Wrong chunksize value. The chunked reads are not available in the asynchronous API.')
+
+    return await _run(carto.read_carto, source, credentials=credentials, **kwargs)
+
+
+async def to_carto(dataframe, table_name, credentials=None, **kwargs):
+    """Coroutine of :py:meth:`to_carto <cartoframes.to_carto>`, with the same arguments."""
+    return await _run(carto.to_carto, dataframe, table_name, credentials=credentials, **kwargs)
+
+
+async def has_table(table_name, credentials=None, schema=None):
+    """Coroutine of :py:meth:`has_table <cartoframes.has_table>`, with the same arguments."""
+    return await _run(carto.has_table, table_name, credentials=credentials, schema=schema)
+
+
+async def delete_table(table_name, credentials=None, log_enabled=True):
+    """Coroutine of :py:meth:`delete_table <cartoframes.delete_table>`, with the same arguments."""
+    return await _run(carto.delete_table, table_name, credentials=credentials, log_enabled=log_enabled)
+
+
+async def execute_query(query, credentials=None, parse_json=True, do_post=True, format=None):
+    """Run a query with the SQL API and return its response.
+
+    Args:
+        query (str): SQL query.
+        credentials (:py:class:`Credentials <cartoframes.auth.Credentials>`, optional):
+            instance of Credentials (username, api_key, etc).
+        parse_json (bool, optional): return the response parsed as JSON. Default is True.
+        do_post (bool, optional): send the query with a POST request. Default is True.
+        format (str, optional): format of the response. Default is JSON.
+
+    """
+    return await _run(_execute_query, query, parse_json, do_post, format, credentials=credentials)
+
+
+async def execute_long_running_query(query, credentials=None):
+    """Run a query with the Batch SQL API, and return the job once it's finished.
+
+    Args:
+        query (str): SQL query.
+        credentials (:py:class:`Credentials <cartoframes.auth.Credentials>`, optional):
+            instance of Credentials (username, api_key, etc).
+
+    """
+    return await _run(_execute_long_running_query, query, credentials=credentials)
+
+
+def _execute_query(query, parse_json, do_post, format, credentials=None):
+    return ContextManager(credentials).execute_query(query, parse_json, do_post, format)
+
+
+def _execute_long_running_query(query, credentials=None):
+    return ContextManager(credentials).execute_long_running_query(query)
+
+
+class _Limiter:
+    """Slots of the concurrent operations of an account, and the threads that run them."""
+
+    def __init__(self, max_concurrency):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='cartoframes-aio')
+
+
+async def _run(function, *args, credentials=None, **kwargs):
+    credentials = credentials or get_default_credentials()
+    check_credentials(credentials)
+
+    loop = asyncio.get_running_loop()
+    limiter = _get_limiter(loop, credentials)
+
+    await limiter.semaphore.acquire()
+    try:
+        future = loop.run_in_executor(limiter.executor, partial(function, *args, credentials=credentials, **kwargs))
+    except BaseException:
+        limiter.semaphore.release()
+        raise
+
+    # A thread can't be stopped: when the task is cancelled, the slot is kept until the call finishes
+    future.add_done_callback(lambda _: limiter.semaphore.release())
+    return await asyncio.shield(future)
+
+
+def _get_limiter(loop, credentials):
+    loop_limiters = _limiters.setdefault(loop, {})
+
+    if credentials.base_url not in loop_limiters:
+        loop_limiters[credentials.base_url] = _Limiter(_max_concurrency)
+
+    return loop_limiters[credentials.base_url]
@@ -0,0 +1,129 @@
+"""Process-wide registry of the API clients, that share a pooled HTTP session"""
+
+import time
+import threading
+
+import requests
+
+from requests.adapters import HTTPAdapter
+from carto.auth import APIKeyAuthClient
+from carto.exceptions import CartoException, CartoRateLimitException
+
+from .rate_limit import (get_rate_limiter, backoff_delay, is_transient_error, is_connect_error, is_idempotent,
+                         is_replayable, DEFAULT_MAX_RETRIES, TRANSIENT_STATUS_CODES)
+from .. import __version__
+from ..utils.logger import log
+
+# Connections kept alive by host. It covers the concurrent COPY streams of `parallel`
+DEFAULT_POOL_SIZE = 32
+
+_registry = None
+
+
+def get_client_registry():
+    global _registry
+
+    if _registry is None:
+        _registry = ClientRegistry()
+
+    return _registry
+
+
+class ClientRegistry:
+    """Creates the API clients once by credentials. The clients of the credentials without a
+    `session` share a single `requests.Session`, whose connection pool keeps `pool_size`
+    connections alive by host: the repeated and concurrent requests reuse the TCP and TLS
+    connections instead of opening new ones. It's safe to use from concurrent operations."""
+
+    def __init__(self, pool_size=None):
+        self.pool_size = pool_size or DEFAULT_POOL_SIZE
+        self._session = None
+        self._auth_clients = {}
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                self._session = create_session(self.pool_size)
+            return self._session
+
+    def get_auth_client(self, credentials, public=False):
+        """Returns the `APIKeyAuthClient` of the credentials, or of their public API key."""
+        api_key = 'default_public' if public else credentials.api_key
+        key = (credentials.base_url, api_key, credentials.session)
+        session = credentials.session or self.session
+
+        with self._lock:
+            auth_client = self._auth_clients.get(key)
+            if auth_client is None:
+                log.debug('Auth client: %s', credentials.base_url)
+                auth_client = RateLimitedAuthClient(
+                    base_url=credentials.base_url,
+                    api_key=api_key,
+                    session=session,
+                    client_id='cartoframes_{}'.format(__version__),
+                    user_agent='cartoframes_{}'.format(__version__))
+                self._auth_clients[key] = auth_client
+
+        return auth_client
+
+    def clear(self):
+        with self._lock:
+            self._auth_clients.clear()
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+class RateLimitedAuthClient(APIKeyAuthClient):
+    """APIKeyAuthClient whose requests wait for the rate limiter of their account and endpoint
+    (see `RateLimiter`). The requests whose body can be sent again are retried `max_retries` times,
+    with exponential backoff, when they are rate limited or the connection can't be opened. The
+    writes may run twice if they are sent again after reaching the server, so only the idempotent
+    requests (GET) are retried after the other connection errors and the 502 and 503 responses."""
+
+    def __init__(self, *args, max_retries=DEFAULT_MAX_RETRIES, **kwargs):
+        super(RateLimitedAuthClient, self).__init__(*args, **kwargs)
+        self.max_retries = max_retries
+
+    def send(self, relative_path, http_method, **requests_args):
+        rate_limiter = get_rate_limiter(self.base_url, relative_path)
+        replayable = is_replayable(requests_args)
+        idempotent = replayable and is_idempotent(http_method)
+        attempt = 0
+
+        while True:
+            rate_limiter.acquire()
+
+            try:
+                response = super(RateLimitedAuthClient, self).send(relative_path, http_method, **requests_args)
+            except CartoRateLimitException as e:
+                rate_limiter.update(e.limit, e.remaining, e.reset, e.retry_after)
+                if not replayable or attempt >= self.max_retries:
+                    raise
+            except CartoException as e:
+                retry = is_transient_error(e) if idempotent else replayable and is_connect_error(e)
+                if not retry or attempt >= self.max_retries:
+                    raise
+            else:
+                rate_limiter.update_from_headers(response.headers)
+                if response.status_code not in TRANSIENT_STATUS_CODES or not idempotent or \
+                        attempt >= self.max_retries:
+                    return response
+                response.close()
+
+            delay = backoff_delay(attempt)
+            log.debug('Retrying request to %s in %.2f seconds', relative_path, delay)
+            time.sleep(delay)
+            attempt += 1
+
+
+def create_session(pool_size=DEFAULT_POOL_SIZE):
+    """`requests.Session` with a connection pool of `pool_size` connections by host. The connections
+    are kept alive, and the requests over the limit open temporary connections instead of waiting."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
@@ -4,10 +4,9 @@ import os
 
 from urllib.parse import urlparse
 
-from carto.auth import APIKeyAuthClient
 from carto.do_token import DoTokenManager
 
-from .. import __version__
+from .clients import get_client_registry
 from ..utils.logger import log
 from ..utils.utils import is_valid_str, check_do_enabled, save_in_config, read_from_config, default_config_path
 
@@ -109,6 +108,7 @@ class Credentials:
     def session(self, session):
         """Set session"""
         self._session = session
+        self._api_key_auth_client = None
 
     @property
     def me_data(self):
@@ -277,13 +277,7 @@ class Credentials:
 
     def get_api_key_auth_client(self):
         if not self._api_key_auth_client:
-            self._api_key_auth_client = APIKeyAuthClient(
-                base_url=self._base_url,
-                api_key=self.api_key,
-                session=self.session,
-                client_id='cartoframes_{}'.format(__version__),
-                user_agent='cartoframes_{}'.format(__version__)
-            )
+            self._api_key_auth_client = get_client_registry().get_auth_client(self)
 
         return self._api_key_auth_client
 
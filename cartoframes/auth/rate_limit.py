@@ -0,0 +1,169 @@
+"""Rate limiting and retries of the requests to the CARTO APIs"""
+
+import re
+import time
+import random
+import threading
+
+from requests.exceptions import ConnectionError, ConnectTimeout
+from urllib3.exceptions import NewConnectionError
+
+from ..utils.logger import log
+
+DEFAULT_MAX_RETRIES = 3
+BACKOFF_BASE = 0.5  # seconds
+BACKOFF_CAP = 30  # seconds
+
+# Responses of a gateway or a server that is not available, retried for the idempotent requests
+TRANSIENT_STATUS_CODES = [502, 503]
+
+# Requests that can be sent again after they may have reached the server
+IDEMPOTENT_METHODS = ['get', 'head', 'options']
+
+# Identifiers of the resources, like the Batch SQL jobs, that are not part of the endpoint
+ID_PATTERN = re.compile(r'^[0-9a-f]{8}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{12}$', re.IGNORECASE)
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(base_url, relative_path):
+    """Returns the limiter of the account and the API endpoint of the path. CARTO limits
+    every endpoint (SQL, COPY, Batch...) of an account independently."""
+    key = (base_url.rstrip('/'), _get_endpoint(relative_path))
+
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter()
+        return _limiters[key]
+
+
+def clear_rate_limiters():
+    with _limiters_lock:
+        _limiters.clear()
+
+
+class RateLimiter:
+    """Token bucket of the requests to an endpoint, shared by all the threads.
+
+    The bucket is fed by the `Carto-Rate-Limit-*` headers of the responses: the limit is the
+    capacity, the remaining requests are the tokens available, and the refill rate is computed
+    from the seconds until the limit is reset. Until the first headers, the requests are not limited.
+
+    The tokens are reserved in order, so the concurrent requests are spaced at the refill rate
+    instead of being sent together and rate limited. After a rate-limited response, the requests
+    wait for its `Retry-After` seconds."""
+
+    def __init__(self):
+        self.capacity = None
+        self.tokens = None
+        self.rate = None
+        self.blocked_until = 0
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, waiting for it when the bucket is empty."""
+        with self._lock:
+            now = time.monotonic()
+            wait = self.blocked_until - now
+
+            if self.tokens is not None:
+                self._refill(now)
+                self.tokens -= 1
+                if self.tokens < 0 and self.rate:
+                    wait = max(wait, -self.tokens / self.rate)
+
+        if wait > 0:
+            log.debug('Rate limit: waiting %.2f seconds', wait)
+            time.sleep(wait)
+
+    def update(self, limit, remaining, reset, retry_after=None):
+        with self._lock:
+            now = time.monotonic()
+            if self.tokens is not None:
+                self._refill(now)
+            self._updated_at = now
+
+            self.capacity = limit
+            if limit > remaining and reset > 0:
+                self.rate = (limit - remaining) / reset
+
+            # The server count is used unless the local one is lower, with the reserved tokens
+            if self.tokens is None or self.rate is None:
+                self.tokens = remaining
+            else:
+                self.tokens = min(self.tokens, remaining)
+
+            if retry_after is not None and retry_after > 0:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+    def update_from_headers(self, headers):
+        try:
+            limit = int(headers['Carto-Rate-Limit-Limit'])
+            remaining = int(headers['Carto-Rate-Limit-Remaining'])
+            reset = int(headers['Carto-Rate-Limit-Reset'])
+        except (KeyError, ValueError):
+            return
+
+        self.update(limit, remaining, reset)
+
+    def _refill(self, now):
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Exponential backoff with full jitter: a random delay up to `base * 2 ** attempt` seconds,
+    so the retries of concurrent requests are spread instead of sent at the same time."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def is_transient_error(error):
+    """The connection errors, wrapped in one or more CartoException by the API clients."""
+    return _get_connection_error(error) is not None
+
+
+def is_connect_error(error):
+    """The errors opening the connection, raised before the request is sent to the server."""
+    connection_error = _get_connection_error(error)
+    if connection_error is None:
+        return False
+
+    if isinstance(connection_error, ConnectTimeout):
+        return True
+
+    # requests wraps the urllib3 MaxRetryError, whose reason is the original error
+    reason = connection_error.args[0] if connection_error.args else None
+    reason = getattr(reason, 'reason', reason)
+    return isinstance(reason, NewConnectionError)
+
+
+def is_idempotent(http_method):
+    return http_method.lower() in IDEMPOTENT_METHODS
+
+
+def is_replayable(requests_args):
+    """The streamed bodies, like the COPY FROM data, can't be sent again."""
+    data = requests_args.get('data')
+    return not hasattr(data, '__next__') and not hasattr(data, 'read')
+
+
+def _get_connection_error(error):
+    seen = set()
+
+    while error is not None and id(error) not in seen:
+        if isinstance(error, ConnectionError):
+            return error
+
+        seen.add(id(error))
+        causes = [arg for arg in error.args if isinstance(arg, BaseException)]
+        error = causes[0] if causes else error.__cause__
+
+    return None
+
+
+def _get_endpoint(relative_path):
+    segments = relative_path.split('?')[0].strip('/').split('/')
+    return '/'.join(segment for segment in segments if not ID_PATTERN.match(segment))
@@ -55,6 +55,23 @@ class SQLClient:
         """
         return self._context_manager.execute_long_running_query(query.strip())
 
+    def execute_many(self, queries, timeout=None):
+        """Run several long running queries as concurrent jobs, and wait for all of them.
+        It returns the jobs in the same order as the queries. It takes as long as the slowest
+        job instead of the sum of all of them.
+
+        Args:
+            queries (list): SQL queries.
+            timeout (int, optional): seconds to wait for every job. The jobs not finished
+                in time are cancelled.
+
+        Example:
+            >>> sql.execute_many([
+            ...     "SELECT CDB_CartodbfyTable('{}')".format(table_name) for table_name in table_names])
+
+        """
+        return self._context_manager.execute_long_running_queries([query.strip() for query in queries], timeout)
+
     def distinct(self, table_name, column_name):
         """Get the distict values and their count in a table
         for a specific column.
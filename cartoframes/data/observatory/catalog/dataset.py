@@ -421,7 +421,8 @@ class Dataset(CatalogEntity):
         self._download(_credentials, file_path, limit=limit, order_by=order_by, sql_query=sql_query, add_geom=add_geom)
 
     @check_do_enabled
-    def to_dataframe(self, credentials=None, limit=None, order_by=None, sql_query=None, add_geom=None):
+    def to_dataframe(self, credentials=None, limit=None, order_by=None, sql_query=None, add_geom=None,
+                     dtype_backend=None):
         """Download dataset data as a geopandas.GeoDataFrame. You need Data Observatory enabled in your CARTO
         account, please contact us at support@carto.com for more information.
 
@@ -441,6 +442,8 @@ class Dataset(CatalogEntity):
                 `$dataset$` is mandatory and it will be replaced by the actual dataset before running the query.
                 You can build any arbitrary query.
             add_geom (boolean, optional): to include the geography when using the `sql_query` argument. Default to True.
+            dtype_backend (str, optional): 'pyarrow' to read the data into Arrow-backed columns. Text columns
+                with few distinct values become categorical. It requires the `pyarrow` package. Default is None.
 
 
         Returns:
@@ -457,7 +460,8 @@ class Dataset(CatalogEntity):
         if not self.is_subscribed(_credentials, DATASET_TYPE):
             raise DOError(DATASET_SUBSCRIPTION_ERROR)
 
-        return self._download(_credentials, limit=limit, order_by=order_by, sql_query=sql_query, add_geom=add_geom)
+        return self._download(_credentials, limit=limit, order_by=order_by, sql_query=sql_query, add_geom=add_geom,
+                              dtype_backend=dtype_backend)
 
     @check_do_enabled
     def subscribe(self, credentials=None):
@@ -6,6 +6,7 @@ from geopandas import GeoDataFrame
 from carto.do_dataset import DODataset
 from . import subscriptions
 from ....utils.geom_utils import set_geometry
+from ....utils.arrow import check_dtype_backend, read_csv_arrow, DTYPE_BACKEND_PYARROW
 from ....utils.logger import log
 
 _DATASET_READ_MSG = '''To load it as a DataFrame you can do:
@@ -127,9 +128,12 @@ class CatalogEntity(ABC):
 
         return self.id
 
-    def _download(self, credentials, file_path=None, limit=None, order_by=None, sql_query=None, add_geom=None):
+    def _download(self, credentials, file_path=None, limit=None, order_by=None, sql_query=None, add_geom=None,
+                  dtype_backend=None):
         auth_client = credentials.get_api_key_auth_client()
 
+        check_dtype_backend(dtype_backend)
+
         is_geography = None
         if sql_query is not None:
             is_geography = self.__class__.__name__ == 'Geography'
@@ -150,7 +154,10 @@ class CatalogEntity(ABC):
             elif self.__class__.__name__ == 'Geography':
                 log.info(_GEOGRAPHY_READ_MSG.format(file_path))
         else:
-            dataframe = pd.read_csv(rows)
+            if dtype_backend == DTYPE_BACKEND_PYARROW:
+                dataframe = read_csv_arrow(rows, column_types={GEOM_COL: 'string'}, exclude_dictionary=[GEOM_COL])
+            else:
+                dataframe = pd.read_csv(rows)
             gdf = GeoDataFrame(dataframe)
 
             if GEOM_COL in gdf:
@@ -216,7 +216,7 @@ class Geography(CatalogEntity):
         self._download(_credentials, file_path, limit=limit, order_by=order_by, sql_query=sql_query)
 
     @check_do_enabled
-    def to_dataframe(self, credentials=None, limit=None, order_by=None, sql_query=None):
+    def to_dataframe(self, credentials=None, limit=None, order_by=None, sql_query=None, dtype_backend=None):
         """Download geography data as a pandas.DataFrame. You need Data Observatory enabled in your CARTO
         account, please contact us at support@carto.com for more information.
 
@@ -235,6 +235,8 @@ class Geography(CatalogEntity):
                 For instance, to download just one row: `select * from $geography$ limit 1`. The placeholder
                 `$geography$` is mandatory and it will be replaced by the actual geography dataset before running
                 the query. You can build any arbitrary query.
+            dtype_backend (str, optional): 'pyarrow' to read the data into Arrow-backed columns. Text columns
+                with few distinct values become categorical. It requires the `pyarrow` package. Default is None.
 
         Returns:
             pandas.DataFrame
@@ -250,7 +252,8 @@ class Geography(CatalogEntity):
         if not self.is_subscribed(_credentials, GEOGRAPHY_TYPE):
             raise DOError(GEOGRAPHY_SUBSCRIPTION_ERROR)
 
-        return self._download(_credentials, limit=limit, order_by=order_by, sql_query=sql_query)
+        return self._download(_credentials, limit=limit, order_by=order_by, sql_query=sql_query,
+                              dtype_backend=dtype_backend)
 
     @check_do_enabled
     def subscribe(self, credentials=None):
@@ -1,29 +1,37 @@
 """Functions to interact with the CARTO platform"""
-import math
+from functools import partial
 
-from pandas import DataFrame
+from pandas import DataFrame, concat
 from geopandas import GeoDataFrame
 
 from carto.exceptions import CartoException
 
-from .managers.context_manager import ContextManager, _compute_copy_data, get_dataframe_columns_info
-from ..utils.geom_utils import is_reprojection_needed, reproject, has_geometry, set_geometry
+from .managers.context_manager import (ContextManager, encode_copy_data, get_chunk_ranges,
+                                       get_dataframe_columns_info, get_index_statements,
+                                       COPY_MAX_BUFFER_SIZE, COPY_MAX_ENCODED_SIZE, COPY_COMPRESSION_GZIP,
+                                       COPY_COMPRESSIONS, DEFAULT_COMPRESSION_LEVEL)
+from ..utils.geom_utils import is_reprojection_needed, reproject, has_geometry, set_geometry, hilbert_sort
+from ..utils.journal import get_journal
 from ..utils.logger import log
-from ..utils.utils import is_valid_str, is_sql_query
+from ..utils.utils import is_valid_str, is_sql_query, double_quote
 from ..utils.metrics import send_metrics
 
 
 GEOM_COLUMN_NAME = 'the_geom'
+DELTA_KEY_NAME = 'cartodb_id'
 IF_EXISTS_OPTIONS = ['fail', 'replace', 'append']
+KEY_IF_EXISTS_OPTIONS = ['upsert', 'sync']
+UPLOAD_IF_EXISTS_OPTIONS = IF_EXISTS_OPTIONS + KEY_IF_EXISTS_OPTIONS
 
 MAX_UPLOAD_SIZE_BYTES = 2000000000  # 2GB
-SAMPLE_ROWS_NUMBER = 100
 CSV_TO_CARTO_RATIO = 1.4
 
 
 @send_metrics('data_downloaded')
 def read_carto(source, credentials=None, limit=None, retry_times=3, schema=None, index_col=None, decode_geom=True,
-               null_geom_value=None):
+               null_geom_value=None, parallel=None, partition_column=None, format='csv', chunksize=None, columns=None,
+               where=None, bbox=None, geometry=None, simplify_tolerance=None, cache=False, since=None,
+               watermark_column=None, base=None, dtype_backend=None):
     """Read a table or a SQL query from the CARTO account.
 
     Args:
@@ -40,9 +48,47 @@ def read_carto(source, credentials=None, limit=None, retry_times=3, schema=None,
         decode_geom (bool, optional): convert the "the_geom" column into a valid geometry column.
         null_geom_value (Object, optional): value for the `the_geom` column when it's null.
             Defaults to None
+        parallel (int, optional): number of concurrent COPY streams used to download the data.
+            The source is split in ranges of the `partition_column` values. It can't be
+            combined with `limit`. Default is a single stream.
+        partition_column (str, optional): numeric column used to split the source when
+            `parallel` is set. Default is "cartodb_id".
+        format (str, optional): wire format of the COPY stream: 'csv' or 'binary'. The 'binary'
+            format skips the text round-trip: the columns are decoded straight into NumPy arrays
+            and the geometries are sent as WKB. Default is 'csv'.
+        chunksize (int, optional): read the COPY stream incrementally and return an iterator
+            of GeoDataFrames with up to `chunksize` rows each. The geometry decoding and the type
+            conversion are applied to every chunk, and all the chunks have the same dtypes.
+            It can't be combined with `parallel` or the 'binary' format. Default is None.
+        columns (list of str, optional): names of the columns to download. The geometry
+            column is always included. Default is all the columns.
+        where (str, optional): SQL condition applied to the source in CARTO, for example
+            "population > 1000".
+        bbox (tuple, optional): (west, south, east, north) bounding box in EPSG:4326. Only the
+            rows whose geometry intersects the bounding box are downloaded.
+        geometry (shapely.geometry, optional): geometry in EPSG:4326. Only the rows whose
+            geometry intersects it are downloaded. It can't be combined with `bbox`.
+        simplify_tolerance (float, optional): tolerance used to simplify the geometries in
+            CARTO with `ST_SimplifyPreserveTopology` before downloading them.
+        cache (bool, optional): store the result in a local on-disk cache, and reuse it while the
+            tables of the source are not updated. It requires the `pyarrow` package. The cache
+            can be configured with :py:meth:`setup_cache <cartoframes.utils.setup_cache>`.
+            It's not used with `chunksize`. Default is False.
+        since (object, optional): watermark of a previous download. Only the rows with a
+            `watermark_column` value greater than `since` are downloaded.
+        watermark_column (str, optional): column compared with `since`, for example "updated_at".
+        base (geopandas.GeoDataFrame, optional): result of a previous download. Only the rows
+            with a new "cartodb_id" (or past the watermark) are downloaded, and they are merged
+            into `base` by "cartodb_id". Deleted rows are not detected.
+        dtype_backend (str, optional): 'pyarrow' to parse the COPY stream with the pyarrow CSV
+            reader into Arrow-backed columns. Text columns with few distinct values become
+            categorical. It requires the `pyarrow` package and the 'csv' format without
+            `chunksize`. Default is None (NumPy dtypes).
 
     Returns:
-        geopandas.GeoDataFrame
+        geopandas.GeoDataFrame, or an iterator of geopandas.GeoDataFrame if `chunksize` is set.
+        If `since` or `base` are set, a tuple with the merged GeoDataFrame and the new watermark
+        (the maximum value of `watermark_column`) to be used as `since` in the next call.
 
     Raises:
         ValueError: if the source is not a valid table_name or SQL query.
@@ -51,10 +97,97 @@ def read_carto(source, credentials=None, limit=None, retry_times=3, schema=None,
     if not is_valid_str(source):
         raise ValueError('Wrong source. You should provide a valid table_name or SQL query.')
 
+    if parallel is not None and (not isinstance(parallel, int) or parallel < 1):
+        raise ValueError('Wrong parallel value. You should provide an integer >= 1.')
+
+    if chunksize is not None and (not isinstance(chunksize, int) or chunksize < 1):
+        raise ValueError('Wrong chunksize value. You should provide an integer >= 1.')
+
+    is_delta = since is not None or base is not None
+
+    if is_delta:
+        if chunksize is not None:
+            raise ValueError('Incremental reads are not available with `chunksize`.')
+        if since is not None and watermark_column is None:
+            raise ValueError('Wrong watermark_column. You should provide the column to compare with `since`.')
+        where = _get_delta_condition(where, since, watermark_column, base)
+
     context_manager = ContextManager(credentials)
 
-    df = context_manager.copy_to(source, schema, limit, retry_times)
+    result = context_manager.copy_to(source, schema, limit, retry_times, parallel=parallel,
+                                     partition_column=partition_column, format=format, chunksize=chunksize,
+                                     columns=columns, where=where, bbox=bbox, geometry=geometry,
+                                     simplify_tolerance=simplify_tolerance, cache=cache, dtype_backend=dtype_backend)
+
+    if chunksize is not None:
+        return (_process_carto_dataframe(df, index_col, decode_geom, null_geom_value) for df in result)
+
+    gdf = _process_carto_dataframe(result, index_col, decode_geom, null_geom_value)
+
+    if is_delta:
+        if base is not None:
+            gdf = _merge_delta(base, gdf)
+        return gdf, _get_watermark(gdf, since, watermark_column)
+
+    return gdf
+
+
+def _get_delta_condition(where, since, watermark_column, base):
+    conditions = []
+
+    if since is not None:
+        conditions.append('{} > {}'.format(double_quote(watermark_column), _sql_literal(since)))
+
+    if base is not None:
+        ids = _get_delta_key(base)
+        if len(ids) > 0:
+            conditions.append('{} > {}'.format(double_quote(DELTA_KEY_NAME), int(ids.max())))
+
+    condition = ' OR '.join(conditions) if conditions else 'true'
+
+    if where is not None:
+        return '({}) AND ({})'.format(where, condition)
+
+    return condition
+
+
+def _merge_delta(base, delta):
+    """Replace the rows of `base` with the same key and append the new ones."""
+    if len(delta) == 0:
+        return base
 
+    base_ids = _get_delta_key(base)
+    delta_ids = _get_delta_key(delta)
+    kept = base[~base_ids.isin(delta_ids).to_numpy()]
+
+    return concat([kept, delta], ignore_index=DELTA_KEY_NAME in base.columns)
+
+
+def _get_delta_key(gdf):
+    if DELTA_KEY_NAME in gdf.columns:
+        return gdf[DELTA_KEY_NAME]
+
+    if gdf.index.name == DELTA_KEY_NAME:
+        return gdf.index.to_series()
+
+    raise ValueError('Wrong base. It should contain a "{}" column or index.'.format(DELTA_KEY_NAME))
+
+
+def _get_watermark(gdf, since, watermark_column):
+    if watermark_column is None or watermark_column not in gdf or gdf[watermark_column].isnull().all():
+        return since
+
+    return gdf[watermark_column].max()
+
+
+def _sql_literal(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+
+    return "'{}'".format(str(value).replace("'", "''"))
+
+
+def _process_carto_dataframe(df, index_col, decode_geom, null_geom_value):
     gdf = GeoDataFrame(df)
 
     if index_col:
@@ -76,7 +209,9 @@ def read_carto(source, credentials=None, limit=None, retry_times=3, schema=None,
 @send_metrics('data_uploaded')
 def to_carto(dataframe, table_name, credentials=None, if_exists='fail', geom_col=None, index=False, index_label=None,
              cartodbfy=True, log_enabled=True, retry_times=3, max_upload_size=MAX_UPLOAD_SIZE_BYTES,
-             skip_quota_warning=False):
+             skip_quota_warning=False, parallel=None, max_buffer_size=None,
+             compression=COPY_COMPRESSION_GZIP, compression_level=DEFAULT_COMPRESSION_LEVEL, resume=False,
+             key=None, bulk_load=False, indexes=None, cluster_on=None, spatial_sort=False, copy=True):
     """Upload a DataFrame to CARTO. The geometry's CRS must be WGS 84 (EPSG:4326) so you can use it on CARTO.
 
     Args:
@@ -84,7 +219,11 @@ def to_carto(dataframe, table_name, credentials=None, if_exists='fail', geom_col
         table_name (str): name of the table to upload the data.
         credentials (:py:class:`Credentials <cartoframes.auth.Credentials>`, optional):
             instance of Credentials (username, api_key, etc).
-        if_exists (str, optional): 'fail', 'replace', 'append'. Default is 'fail'.
+        if_exists (str, optional): 'fail', 'replace', 'append', 'upsert', 'sync'. Default is 'fail'.
+            With 'upsert', the rows of the table that match the `key` columns are updated
+            and the rest of rows are inserted. With 'sync', the rows are compared by their content
+            hash: only the new and changed rows are uploaded, and the rows of the table that are
+            not in the dataframe are deleted.
         geom_col (str, optional): name of the geometry column of the dataframe.
         index (bool, optional): write the index in the table. Default is False.
         index_label (str, optional): name of the index column in the table. By default it
@@ -99,6 +238,35 @@ def to_carto(dataframe, table_name, credentials=None, if_exists='fail', geom_col
         skip_quota_warning (bool, optional): skip the quota exceeded check and force the upload.
             (The upload will still fail if the size of the dataset exceeds the remaining DB quota).
             Default is False.
+        parallel (int, optional): number of concurrent COPY streams used to upload the data.
+            The dataframe is split in at least `parallel` chunks, uploaded to the same table.
+            Default is a single stream.
+        max_buffer_size (int, optional): maximum size in bytes of the encoded data buffered by every
+            COPY stream. The data is encoded in the background while it's being sent, and the encoding
+            waits when the buffer is full. When it's provided, the rows encoded to measure their size
+            are kept for the upload only up to this size. Default is 100MB.
+        compression (str, optional): compression of the uploaded data: 'gzip' or None. Default is 'gzip'.
+        compression_level (int, optional): gzip compression level, from 1 (fastest) to 9 (smallest).
+            Default is 1, the most efficient end-to-end.
+        resume (bool, optional): record the uploaded chunks in a local journal, and skip the chunks
+            already uploaded by a previous call that failed with the same dataframe and table.
+            Default is False.
+        key (str or list, optional): columns that identify the rows with `if_exists='upsert'`
+            and `if_exists='sync'`.
+        bulk_load (bool, optional): upload the data to an unlogged staging table, and create the table
+            from it in a single batch job that also cartodbfies and analyzes the table. It's faster for
+            large uploads, but the table is created again with `if_exists='replace'`. Default is False.
+        indexes (list, optional): indexes created in the table after the upload. Every index is
+            a column name or a tuple of column names. The indexes of a geometry column are spatial.
+        cluster_on (str, optional): column whose index is used to CLUSTER the table after the upload,
+            so the rows are physically ordered like the index. It's created if it doesn't exist.
+        spatial_sort (bool, optional): sort the rows by the Hilbert curve of their geometries before
+            the upload, so nearby geometries are stored together without a CLUSTER of the table.
+            The sorted rows are a copy of the dataframe. Default is False.
+        copy (bool, optional): copy the dataframe before preparing it for the upload. With False, the
+            data of the dataframe is not copied nor modified: the geometries are reprojected while they
+            are encoded, and the encoded rows are not kept, so the memory used is about the size of the
+            dataframe. Default is True.
 
     Returns:
         string: the table name normalized.
@@ -110,33 +278,53 @@ def to_carto(dataframe, table_name, credentials=None, if_exists='fail', geom_col
     if not isinstance(dataframe, DataFrame):
         raise ValueError('Wrong dataframe. You should provide a valid DataFrame instance.')
 
-    if isinstance(dataframe, GeoDataFrame):
+    if copy and isinstance(dataframe, GeoDataFrame):
         if is_reprojection_needed(dataframe):
             dataframe = reproject(dataframe)
 
     if not is_valid_str(table_name):
         raise ValueError('Wrong table name. You should provide a valid table name.')
 
-    if if_exists not in IF_EXISTS_OPTIONS:
+    if if_exists not in UPLOAD_IF_EXISTS_OPTIONS:
         raise ValueError('Wrong option for the `if_exists` param. You should provide: {}.'.format(
-            ', '.join(IF_EXISTS_OPTIONS)))
+            ', '.join(UPLOAD_IF_EXISTS_OPTIONS)))
 
-    context_manager = ContextManager(credentials)
+    if isinstance(key, str):
+        key = [key]
 
-    if not skip_quota_warning:
-        me_data = context_manager.credentials.me_data
-        if me_data is not None and me_data.get('user_data'):
-            n = min(SAMPLE_ROWS_NUMBER, len(dataframe))
-            estimated_byte_size = len(dataframe.sample(n=n).to_csv(header=False)) * len(dataframe) \
-                / n / CSV_TO_CARTO_RATIO
-            remaining_byte_quota = me_data.get('user_data').get('remaining_byte_quota')
+    if if_exists in KEY_IF_EXISTS_OPTIONS and not key:
+        raise ValueError("Wrong key. You should provide the columns that identify the rows with if_exists='{}'.".format(
+            if_exists))
 
-            if remaining_byte_quota is not None and estimated_byte_size > remaining_byte_quota:
-                raise CartoException('DB Quota will be exceeded. '
-                                     'The remaining quota is {} bytes and the dataset size is {} bytes.'.format(
-                                        remaining_byte_quota, estimated_byte_size))
+    if if_exists in KEY_IF_EXISTS_OPTIONS and resume:
+        raise ValueError("Wrong resume value. Resumable uploads are not available with if_exists='{}'.".format(
+            if_exists))
+
+    if bulk_load and (if_exists in KEY_IF_EXISTS_OPTIONS or resume):
+        raise ValueError('Wrong bulk_load value. The bulk load is not available with resume or if_exists={}.'.format(
+            ', '.join(KEY_IF_EXISTS_OPTIONS)))
+
+    if parallel is not None and (not isinstance(parallel, int) or parallel < 1):
+        raise ValueError('Wrong parallel value. You should provide an integer >= 1.')
+
+    if compression not in COPY_COMPRESSIONS:
+        raise ValueError("Wrong compression. Valid values are: None, '{}'.".format(COPY_COMPRESSION_GZIP))
+
+    if not isinstance(compression_level, int) or not 1 <= compression_level <= 9:
+        raise ValueError('Wrong compression_level value. You should provide an integer between 1 and 9.')
+
+    if indexes is not None and (not isinstance(indexes, (list, tuple)) or not all(
+            isinstance(index, str) or (isinstance(index, (list, tuple)) and index) for index in indexes)):
+        raise ValueError('Wrong indexes. You should provide a list of column names or tuples of column names.')
+
+    if cluster_on is not None and not is_valid_str(cluster_on):
+        raise ValueError('Wrong cluster_on. You should provide a column name.')
+
+    context_manager = ContextManager(credentials)
 
-    gdf = GeoDataFrame(dataframe, copy=True)
+    # Without copy, a shallow copy shares the data of the dataframe. The columns are added,
+    # dropped and renamed only in the shallow copy, so the dataframe is not modified
+    gdf = GeoDataFrame(dataframe if copy else dataframe.copy(deep=False), copy=copy)
 
     if index:
         index_name = index_label or gdf.index.name
@@ -162,14 +350,95 @@ def to_carto(dataframe, table_name, credentials=None, if_exists='fail', geom_col
     elif isinstance(dataframe, GeoDataFrame):
         log.warning('Geometry column not found in the GeoDataFrame.')
 
-    chunk_count = math.ceil(estimate_csv_size(gdf) / max_upload_size)
-    chunk_row_size = int(math.ceil(len(gdf) / chunk_count))
-    chunked_gdf = [gdf[i:i + chunk_row_size] for i in range(0, gdf.shape[0], chunk_row_size)]
+    if spatial_sort:
+        if not has_geometry(gdf):
+            raise ValueError('Wrong spatial_sort value. The dataframe has no geometry column.')
+        gdf = hilbert_sort(gdf).reset_index(drop=True)
 
-    for i, chunk in enumerate(chunked_gdf):
-        if i > 0:
-            if_exists = 'append'
-        table_name = context_manager.copy_from(chunk, table_name, if_exists, cartodbfy, retry_times)
+    df_columns = get_dataframe_columns_info(gdf)
+
+    # Check the columns of the indexes before the upload
+    get_index_statements(table_name, df_columns, indexes, cluster_on)
+
+    # Exact size of every encoded row, used for the quota check and to split the chunks. The encoded
+    # blocks are sent by the upload, if they fit in the memory allowed. Otherwise, they are encoded again
+    if not copy:
+        max_encoded_size = 0
+    elif max_buffer_size is not None:
+        max_encoded_size = min(max_buffer_size, COPY_MAX_ENCODED_SIZE)
+    else:
+        max_encoded_size = COPY_MAX_ENCODED_SIZE
+
+    if max_buffer_size is None:
+        max_buffer_size = COPY_MAX_BUFFER_SIZE
+
+    copy_data = encode_copy_data(gdf, df_columns, max_size=max_encoded_size)
+    row_sizes = copy_data.row_sizes
+
+    if not skip_quota_warning:
+        me_data = context_manager.credentials.me_data
+        if me_data is not None and me_data.get('user_data'):
+            estimated_byte_size = int(row_sizes.sum()) / CSV_TO_CARTO_RATIO
+            remaining_byte_quota = me_data.get('user_data').get('remaining_byte_quota')
+
+            if remaining_byte_quota is not None and estimated_byte_size > remaining_byte_quota:
+                raise CartoException('DB Quota will be exceeded. '
+                                     'The remaining quota is {} bytes and the dataset size is {} bytes.'.format(
+                                        remaining_byte_quota, estimated_byte_size))
+
+    chunk_ranges = get_chunk_ranges(row_sizes, max_upload_size, parallel or 1)
+
+    committed = set()
+    on_copied = None
+    if resume:
+        table_name = context_manager.normalize_table_name(table_name)
+        journal = get_journal()
+        journal_key = journal.get_key(context_manager.credentials.base_url, table_name, gdf, chunk_ranges)
+        committed = journal.read(journal_key)
+        on_copied = partial(journal.commit, journal_key)
+
+        if committed and log_enabled:
+            log.info('Resuming the upload to table "{}": {} chunks already uploaded'.format(
+                table_name, len(committed)))
+
+    if if_exists in KEY_IF_EXISTS_OPTIONS:
+        key_copy_from = context_manager.upsert_from if if_exists == 'upsert' else context_manager.sync_from
+        table_name = key_copy_from(gdf, table_name, key, cartodbfy, retry_times, parallel=parallel or 1,
+                                   row_sizes=row_sizes, max_chunk_size=max_upload_size, max_buffer_size=max_buffer_size,
+                                   compression=compression, compression_level=compression_level,
+                                   copy_data=copy_data)
+    elif bulk_load:
+        table_name = context_manager.bulk_copy_from(gdf, table_name, if_exists, cartodbfy, retry_times,
+                                                    parallel=parallel or 1, row_sizes=row_sizes,
+                                                    max_chunk_size=max_upload_size, max_buffer_size=max_buffer_size,
+                                                    compression=compression, compression_level=compression_level,
+                                                    indexes=indexes, cluster_on=cluster_on, copy_data=copy_data)
+    elif parallel is not None and parallel > 1:
+        table_name = context_manager.parallel_copy_from(gdf, table_name, if_exists, cartodbfy, retry_times,
+                                                        parallel=parallel, row_sizes=row_sizes,
+                                                        max_chunk_size=max_upload_size,
+                                                        max_buffer_size=max_buffer_size, compression=compression,
+                                                        compression_level=compression_level,
+                                                        skip_ranges=committed, on_copied=on_copied,
+                                                        copy_data=copy_data)
+    else:
+        for i, (start, end) in enumerate(chunk_ranges):
+            if i > 0:
+                if_exists = 'append'
+            if (start, end) in committed:
+                continue
+            table_name = context_manager.copy_from(gdf[start:end], table_name, if_exists, cartodbfy, retry_times,
+                                                   max_buffer_size=max_buffer_size, compression=compression,
+                                                   compression_level=compression_level,
+                                                   copy_data=copy_data.get_range(start, end))
+            if on_copied is not None:
+                on_copied(start, end)
+
+    if (indexes or cluster_on) and not bulk_load:
+        context_manager.create_indexes(table_name, df_columns, indexes, cluster_on)
+
+    if resume:
+        journal.remove(journal_key)
 
     if log_enabled:
         log.info('Success! Data uploaded to table "{}" correctly'.format(table_name))
@@ -414,10 +683,3 @@ def update_privacy_table(table_name, privacy, credentials=None, log_enabled=True
 
     if log_enabled:
         log.info('Success! Table "{}" privacy updated correctly'.format(table_name))
-
-
-def estimate_csv_size(gdf):
-    n = min(SAMPLE_ROWS_NUMBER, len(gdf))
-    columns = get_dataframe_columns_info(gdf)
-    return sum([len(x) for x in
-                _compute_copy_data(gdf.sample(n=n), columns)]) * len(gdf) / n
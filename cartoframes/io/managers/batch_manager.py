@@ -0,0 +1,164 @@
+"""Non-blocking Batch SQL API jobs, polled together in the background"""
+
+import time
+import weakref
+import threading
+
+from concurrent.futures import Future, TimeoutError, wait
+
+from carto.exceptions import CartoException
+from carto.sql import BatchSQLClient, BATCH_JOBS_PENDING_STATUSES, BATCH_JOBS_FAILED_STATUSES
+
+from ...auth.rate_limit import is_transient_error
+from ...utils.logger import log
+
+MIN_POLL_INTERVAL = 0.5  # seconds
+MAX_POLL_INTERVAL = 5  # seconds
+POLL_BACKOFF = 1.5
+MAX_READ_ERRORS = 10  # consecutive connection errors reading a job
+
+# Managers by auth client, shared by the operations with the same credentials
+_managers = weakref.WeakKeyDictionary()
+_managers_lock = threading.Lock()
+
+
+def get_batch_job_manager(auth_client):
+    with _managers_lock:
+        if auth_client not in _managers:
+            _managers[auth_client] = BatchJobManager(BatchSQLClient(auth_client))
+        return _managers[auth_client]
+
+
+class BatchJobManager:
+    """Submits Batch SQL API jobs without waiting for them, and returns a future for every job.
+
+    The status of all the pending jobs is read by a single thread in every round. The rounds start
+    every `min_interval` seconds, and the interval grows by `backoff` up to `max_interval` while
+    no job finishes. The thread stops when there are no pending jobs. A job whose status can't be
+    read because of a connection error is read again in the next rounds, up to `max_read_errors`
+    consecutive times.
+
+    The future of a job has its `job_id`. Its result is the job data, like the one of
+    `BatchSQLClient.create_and_wait_for_completion`, or a CartoException if the job fails.
+    Cancelling the future cancels the job."""
+
+    def __init__(self, batch_sql_client, min_interval=MIN_POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL,
+                 backoff=POLL_BACKOFF, max_read_errors=MAX_READ_ERRORS):
+        self.batch_sql_client = batch_sql_client
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_read_errors = max_read_errors
+        self._jobs = {}
+        self._read_errors = {}
+        self._interval = min_interval
+        self._poller = None
+        self._condition = threading.Condition()
+
+    def submit(self, query, timeout=None):
+        """Create the job of the query. With `timeout` seconds, the job is cancelled when it's not
+        finished in time, and its future raises a TimeoutError."""
+        data = self.batch_sql_client.create(query)
+
+        future = Future()
+        future.job_id = data['job_id']
+        log.debug('Batch SQL job: %s', future.job_id)
+
+        if data['status'] not in BATCH_JOBS_PENDING_STATUSES:
+            _resolve(future, data)
+            return future
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        with self._condition:
+            self._jobs[future.job_id] = (future, deadline)
+
+            if self._poller is None:
+                self._interval = self.min_interval
+                self._poller = threading.Thread(target=self._poll, daemon=True)
+                self._poller.start()
+            elif self._interval > self.min_interval:
+                # Wake up the poller to check the new job soon
+                self._interval = self.min_interval
+                self._condition.notify()
+
+        return future
+
+    def wait(self, futures, timeout=None):
+        """Wait for a group of jobs and return their results, in the same order. It raises the
+        error of the first failed job, or a TimeoutError if they are not finished in `timeout` seconds."""
+        _, not_done = wait(futures, timeout)
+
+        if not_done:
+            raise TimeoutError('{} Batch SQL jobs are not finished.'.format(len(not_done)))
+
+        return [future.result() for future in futures]
+
+    def _poll(self):
+        while True:
+            with self._condition:
+                if not self._jobs:
+                    self._poller = None
+                    return
+                self._condition.wait(self._interval)
+                jobs = list(self._jobs.items())
+
+            finished = [job_id for job_id, (future, deadline) in jobs if self._poll_job(job_id, future, deadline)]
+
+            with self._condition:
+                for job_id in finished:
+                    del self._jobs[job_id]
+                    self._read_errors.pop(job_id, None)
+                self._interval = self.min_interval if finished else min(self._interval * self.backoff,
+                                                                        self.max_interval)
+
+    def _poll_job(self, job_id, future, deadline):
+        """Returns True when the job is not pending anymore."""
+        if future.cancelled():
+            self._cancel_job(job_id)
+            return True
+
+        if deadline is not None and time.monotonic() > deadline:
+            self._cancel_job(job_id)
+            if future.set_running_or_notify_cancel():
+                future.set_exception(TimeoutError('Batch SQL job {} timed out.'.format(job_id)))
+            return True
+
+        try:
+            data = self.batch_sql_client.read(job_id)
+        except CartoException as e:
+            read_errors = self._read_errors.get(job_id, 0) + 1
+            if is_transient_error(e) and read_errors <= self.max_read_errors:
+                # The poll interval grows while the job is pending, so the next reads back off
+                log.debug('Batch SQL job %s not read (%s): %s', job_id, read_errors, e)
+                self._read_errors[job_id] = read_errors
+                return False
+
+            if future.set_running_or_notify_cancel():
+                future.set_exception(e)
+            return True
+
+        self._read_errors.pop(job_id, None)
+
+        if data['status'] in BATCH_JOBS_PENDING_STATUSES:
+            return False
+
+        _resolve(future, data)
+        return True
+
+    def _cancel_job(self, job_id):
+        log.debug('Cancel Batch SQL job: %s', job_id)
+        try:
+            self.batch_sql_client.cancel(job_id)
+        except CartoException as e:
+            log.debug('Batch SQL job %s not cancelled: %s', job_id, e)
+
+
+def _resolve(future, data):
+    if not future.set_running_or_notify_cancel():
+        return
+
+    if data['status'] in BATCH_JOBS_FAILED_STATUSES:
+        future.set_exception(CartoException('Batch SQL job failed with result: {data}'.format(data=data)))
+    else:
+        future.set_result(data)
@@ -1,32 +1,75 @@
+import math
 import time
+import hashlib
 
+import numpy as np
 import pandas as pd
 
 from warnings import warn
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from geopandas import GeoSeries
 
-from carto.auth import APIKeyAuthClient
 from carto.datasets import DatasetManager
 from carto.exceptions import CartoException, CartoRateLimitException
 from carto.sql import SQLClient, BatchSQLClient, CopySQLClient
-from pyrestcli.exceptions import NotFoundException
+from pyrestcli.exceptions import NotFoundException, BadRequestException
+from shapely.geometry.base import BaseGeometry
 
+from .batch_manager import get_batch_job_manager
 from ..dataset_info import DatasetInfo
-from ... import __version__
+from ...auth.clients import get_client_registry
+from ...auth.rate_limit import backoff_delay, is_transient_error, is_connect_error
 from ...auth.defaults import get_default_credentials
 from ...utils.logger import log
-from ...utils.geom_utils import encode_geometry_ewkb
+from ...utils.geom_utils import encode_geometries_ewkb, is_reprojection_needed, reproject
+from ...utils.cache import get_cache
+from ...utils.metadata_cache import get_metadata_cache, get_credentials_key
+from ...utils.arrow import (check_dtype_backend, read_csv_arrow_table, arrow_tables_to_dataframe,
+                            get_arrow_column_types, DTYPE_BACKEND_PYARROW)
+from ...utils.binary_copy import binary_copy_expression, read_binary_copy
 from ...utils.utils import (is_sql_query, check_credentials, encode_row, map_geom_type, PG_NULL, double_quote,
                             create_tmp_name)
-from ...utils.columns import (get_dataframe_columns_info, get_query_columns_info, obtain_converters, date_columns_names,
-                              normalize_name)
+from ...utils.columns import (get_dataframe_columns_info, get_query_columns_info, obtain_parser_dtypes,
+                              obtain_nullable_dtypes, obtain_na_values, normalize_null_values, date_columns_names,
+                              normalize_name, ColumnInfo, INT_DBTYPES, FLOAT_DBTYPES, BOOL_DBTYPES,
+                              DATETIME_DBTYPES)
 
 DEFAULT_RETRY_TIMES = 3
+DEFAULT_PARTITION_COLUMN = 'cartodb_id'
+COPY_FORMAT_CSV = 'csv'
+COPY_FORMAT_BINARY = 'binary'
+COPY_FORMATS = [COPY_FORMAT_CSV, COPY_FORMAT_BINARY]
+COPY_BLOCK_SIZE = 50000
+COPY_ENCODE_WORKERS = 2
+COPY_MAX_BUFFER_SIZE = 100000000  # 100MB
+COPY_MAX_ENCODED_SIZE = 500000000  # 500MB
+COPY_COMPRESSION_GZIP = 'gzip'
+COPY_COMPRESSIONS = [None, COPY_COMPRESSION_GZIP]
+DEFAULT_COMPRESSION_LEVEL = 1
+COPY_SPECIAL_CHARACTERS = '["|\n]'
+ROW_HASH_COLUMN = '_row_hash'
 BATCH_API_PAYLOAD_THRESHOLD = 12000
 
 
 def retry_copy(func):
+    """Retry the COPY when it's rate limited or there is a connection error. The streamed data
+    can't be sent again by the API client, so the whole COPY is retried."""
+    return _retry_copy(func, is_transient_error)
+
+
+def retry_copy_from(func):
+    """Same as `retry_copy`, but only the errors opening the connection are retried: after a
+    connection reset, the server may have committed the COPY, and sending it again duplicates
+    the rows. The rate-limited requests are not processed, so they are retried too."""
+    return _retry_copy(func, is_connect_error)
+
+
+def _retry_copy(func, is_retryable):
     def wrapper(*args, **kwargs):
         m_retry_times = kwargs.get('retry_times', DEFAULT_RETRY_TIMES)
+        attempt = 0
         while m_retry_times >= 1:
             try:
                 return func(*args, **kwargs)
@@ -38,9 +81,21 @@ def retry_copy(func):
                           'This usually happens when there are multiple queries being read at the same time.'))
                     raise err
 
-                warn('Read call rate limited. Waiting {s} seconds'.format(s=err.retry_after))
-                time.sleep(err.retry_after)
+                # The jitter spreads the retries of the concurrent COPY streams
+                delay = err.retry_after + backoff_delay(attempt)
+                warn('Read call rate limited. Waiting {s} seconds'.format(s=round(delay, 1)))
+                time.sleep(delay)
                 warn('Retrying...')
+            except CartoException as err:
+                m_retry_times -= 1
+
+                if m_retry_times <= 0 or not is_retryable(err):
+                    raise err
+
+                delay = backoff_delay(attempt)
+                log.debug('COPY connection error: {}. Retrying in {:.2f} seconds'.format(err, delay))
+                time.sleep(delay)
+            attempt += 1
         return func(*args, **kwargs)
     return wrapper
 
@@ -70,27 +125,298 @@ class ContextManager:
         self.sql_client = SQLClient(self.auth_client)
         self.copy_client = CopySQLClient(self.auth_client)
         self.batch_sql_client = BatchSQLClient(self.auth_client)
+        self.credentials_key = get_credentials_key(self.credentials)
 
     @not_found
     def execute_query(self, query, parse_json=True, do_post=True, format=None, **request_args):
-        return self.sql_client.send(query.strip(), parse_json, do_post, format, **request_args)
+        try:
+            return self.sql_client.send(query.strip(), parse_json, do_post, format, **request_args)
+        finally:
+            get_metadata_cache().invalidate_query(self.credentials_key, query)
 
     @not_found
     def execute_long_running_query(self, query):
-        return self.batch_sql_client.create_and_wait_for_completion(query.strip())
+        try:
+            return self.batch_sql_client.create_and_wait_for_completion(query.strip())
+        finally:
+            get_metadata_cache().invalidate_query(self.credentials_key, query)
+
+    def submit_long_running_query(self, query, timeout=None):
+        """Create the Batch SQL job of the query without waiting for it. Returns the future
+        of the job (see `BatchJobManager`)."""
+        future = get_batch_job_manager(self.auth_client).submit(query.strip(), timeout)
+        future.add_done_callback(lambda _: get_metadata_cache().invalidate_query(self.credentials_key, query))
+        return future
+
+    def execute_long_running_queries(self, queries, timeout=None):
+        """Run the queries as concurrent Batch SQL jobs, and wait for all of them."""
+        futures = [self.submit_long_running_query(query, timeout) for query in queries]
+        return get_batch_job_manager(self.auth_client).wait(futures)
+
+    def copy_to(self, source, schema=None, limit=None, retry_times=DEFAULT_RETRY_TIMES, parallel=None,
+                partition_column=None, format=COPY_FORMAT_CSV, chunksize=None, columns=None, where=None,
+                bbox=None, geometry=None, simplify_tolerance=None, cache=False, dtype_backend=None):
+        if format not in COPY_FORMATS:
+            raise ValueError('Wrong COPY format. Valid formats are: {}.'.format(', '.join(COPY_FORMATS)))
+
+        check_dtype_backend(dtype_backend)
+
+        if dtype_backend is not None and (format != COPY_FORMAT_CSV or chunksize is not None):
+            raise ValueError('Arrow-backed output is only available with the csv format without chunks.')
 
-    def copy_to(self, source, schema=None, limit=None, retry_times=DEFAULT_RETRY_TIMES):
         query = self.compute_query(source, schema)
-        columns = self._get_query_columns_info(query)
-        copy_query = self._get_copy_query(query, columns, limit)
-        return self._copy_to(copy_query, columns, retry_times)
+        source_columns = self._get_query_columns_info(query)
+
+        # The partition column of the parallel downloads is kept in the query, even if it's not selected
+        kept_column = (partition_column or DEFAULT_PARTITION_COLUMN) if parallel is not None and parallel > 1 else None
+        query, query_columns = self._get_pushdown_query(query, source_columns, columns, where, bbox, geometry,
+                                                        simplify_tolerance, kept_column)
+
+        if chunksize is not None:
+            if format != COPY_FORMAT_CSV or (parallel is not None and parallel > 1):
+                raise ValueError('Reading in chunks is only available with a single COPY stream in csv format.')
+            copy_query = self._get_copy_query(query, query_columns, limit)
+            return self._copy_to_chunks(copy_query, query_columns, chunksize, retry_times=retry_times)
+
+        if cache:
+            return self._cached_copy_to(query, limit, format, dtype_backend, lambda: self._copy_to_dataframe(
+                query, query_columns, limit, retry_times, parallel, partition_column, format, dtype_backend,
+                source_columns))
+
+        return self._copy_to_dataframe(query, query_columns, limit, retry_times, parallel, partition_column, format,
+                                       dtype_backend, source_columns)
 
     def copy_from(self, gdf, table_name, if_exists='fail', cartodbfy=True,
-                  retry_times=DEFAULT_RETRY_TIMES):
+                  retry_times=DEFAULT_RETRY_TIMES, max_buffer_size=COPY_MAX_BUFFER_SIZE,
+                  compression=COPY_COMPRESSION_GZIP, compression_level=DEFAULT_COMPRESSION_LEVEL, copy_data=None):
+        schema = self.get_schema()
+        table_name = self.normalize_table_name(table_name)
+        df_columns = get_dataframe_columns_info(gdf)
+
+        cartodbfy = self._prepare_copy_from_table(table_name, schema, df_columns, if_exists) and cartodbfy
+
+        self._copy_from(gdf, table_name, df_columns, retry_times, max_buffer_size=max_buffer_size,
+                        compression=compression, compression_level=compression_level, copy_data=copy_data)
+
+        if cartodbfy is True:
+            cartodbfy_query = _cartodbfy_query(table_name, schema)
+            self.execute_long_running_query(cartodbfy_query)
+
+        return table_name
+
+    def parallel_copy_from(self, gdf, table_name, if_exists='fail', cartodbfy=True,
+                           retry_times=DEFAULT_RETRY_TIMES, parallel=2, row_sizes=None, max_chunk_size=None,
+                           max_buffer_size=COPY_MAX_BUFFER_SIZE, compression=COPY_COMPRESSION_GZIP,
+                           compression_level=DEFAULT_COMPRESSION_LEVEL, skip_ranges=None, on_copied=None,
+                           copy_data=None):
+        """Upload the DataFrame with `parallel` concurrent COPY streams, in at least `parallel` chunks
+        of at most `max_chunk_size` bytes according to the `row_sizes` from `encode_copy_data`.
+        The table is prepared once, and it's cartodbfied once all the chunks are uploaded. Every
+        stream buffers up to `max_buffer_size` bytes of encoded data, and sends the blocks of
+        `copy_data` already encoded.
+
+        The (start, end) row ranges in `skip_ranges` were uploaded by a previous call, so the table
+        is not prepared again and those chunks are not sent. `on_copied(start, end)` is called
+        every time a chunk is uploaded."""
+        schema = self.get_schema()
+        table_name = self.normalize_table_name(table_name)
+        df_columns = get_dataframe_columns_info(gdf)
+
+        if skip_ranges:
+            cartodbfy = cartodbfy and if_exists != 'append'
+        else:
+            cartodbfy = self._prepare_copy_from_table(table_name, schema, df_columns, if_exists) and cartodbfy
+
+        chunk_ranges = get_chunk_ranges(_get_row_sizes(gdf, row_sizes), max_chunk_size, parallel)
+        self._copy_from_chunks(gdf, table_name, df_columns, chunk_ranges, parallel, retry_times, max_buffer_size,
+                               compression, compression_level, skip_ranges, on_copied, copy_data)
+
+        if cartodbfy is True:
+            cartodbfy_query = _cartodbfy_query(table_name, schema)
+            self.execute_long_running_query(cartodbfy_query)
+
+        return table_name
+
+    def upsert_from(self, gdf, table_name, key, cartodbfy=True, retry_times=DEFAULT_RETRY_TIMES, parallel=1,
+                    row_sizes=None, max_chunk_size=None, max_buffer_size=COPY_MAX_BUFFER_SIZE,
+                    compression=COPY_COMPRESSION_GZIP, compression_level=DEFAULT_COMPRESSION_LEVEL, copy_data=None):
+        """Update the rows of the table that match the `key` columns of the DataFrame, and insert
+        the rest. The DataFrame is uploaded to a staging table, and it's merged in a single batch job
+        that only rewrites the rows with changes. A new table is created if it doesn't exist."""
+        schema = self.get_schema()
+        table_name = self.normalize_table_name(table_name)
+        df_columns = get_dataframe_columns_info(gdf)
+        key_columns = [column.dbname for column in _get_key_columns_info(df_columns, key)]
+
+        if not self.has_table(table_name, schema):
+            cartodbfy = self._prepare_copy_from_table(table_name, schema, df_columns, 'fail') and cartodbfy
+            staging_table_name = table_name
+        else:
+            cartodbfy = False
+            staging_table_name = create_tmp_name(base='tmp_upsert')
+            self._create_table_from_columns(staging_table_name, schema, df_columns, unlogged=True)
+
+        chunk_ranges = get_chunk_ranges(_get_row_sizes(gdf, row_sizes), max_chunk_size, parallel)
+
+        try:
+            self._copy_from_chunks(gdf, staging_table_name, df_columns, chunk_ranges, parallel, retry_times,
+                                   max_buffer_size, compression, compression_level, copy_data=copy_data)
+
+            if staging_table_name != table_name:
+                log.debug('UPSERT table "{}"'.format(table_name))
+                self.execute_long_running_query(
+                    _upsert_query(table_name, staging_table_name, df_columns, key_columns))
+        finally:
+            if staging_table_name != table_name:
+                self.execute_query(_drop_table_query(staging_table_name))
+
+        if cartodbfy is True:
+            cartodbfy_query = _cartodbfy_query(table_name, schema)
+            self.execute_long_running_query(cartodbfy_query)
+
+        return table_name
+
+    def sync_from(self, gdf, table_name, key, cartodbfy=True, retry_times=DEFAULT_RETRY_TIMES, parallel=1,
+                  row_sizes=None, max_chunk_size=None, max_buffer_size=COPY_MAX_BUFFER_SIZE,
+                  compression=COPY_COMPRESSION_GZIP, compression_level=DEFAULT_COMPRESSION_LEVEL, copy_data=None):
+        """Make the table equal to the DataFrame, matching the rows by the `key` columns. The hashes
+        of the rows in the table are downloaded and compared with the hashes of the DataFrame rows:
+        only the new and changed rows are upserted, and the rows not in the DataFrame are deleted.
+        The changed rows are encoded again: the blocks of `copy_data` are only sent to a new table."""
+        schema = self.get_schema()
+        table_name = self.normalize_table_name(table_name)
+        df_columns = get_dataframe_columns_info(gdf)
+        key_columns_info = _get_key_columns_info(df_columns, key)
+
+        if not self.has_table(table_name, schema):
+            return self.upsert_from(gdf, table_name, key, cartodbfy, retry_times, parallel, row_sizes,
+                                    max_chunk_size, max_buffer_size, compression, compression_level, copy_data)
+
+        changed_rows, deleted_keys = self._compare_row_hashes(gdf, table_name, schema, df_columns, key_columns_info,
+                                                              retry_times)
+
+        log.debug('SYNC table "{}": {} changed rows, {} deleted rows'.format(
+            table_name, len(changed_rows), len(deleted_keys)))
+
+        if len(changed_rows) > 0:
+            changed_row_sizes = row_sizes[changed_rows] if row_sizes is not None else None
+            self.upsert_from(gdf.iloc[changed_rows], table_name, key, False, retry_times, parallel, changed_row_sizes,
+                             max_chunk_size, max_buffer_size, compression, compression_level)
+
+        if len(deleted_keys) > 0:
+            self._delete_rows(table_name, schema, deleted_keys, key_columns_info, retry_times)
+
+        return table_name
+
+    def bulk_copy_from(self, gdf, table_name, if_exists='fail', cartodbfy=True, retry_times=DEFAULT_RETRY_TIMES,
+                       parallel=1, row_sizes=None, max_chunk_size=None, max_buffer_size=COPY_MAX_BUFFER_SIZE,
+                       compression=COPY_COMPRESSION_GZIP, compression_level=DEFAULT_COMPRESSION_LEVEL,
+                       indexes=None, cluster_on=None, copy_data=None):
+        """Upload the DataFrame to an UNLOGGED staging table without indexes, and load it in a single
+        batch job: the table is created from the staging table with one statement (or the rows are
+        inserted with 'append'), cartodbfied or spatially indexed, indexed as in `create_indexes`
+        and analyzed. With 'replace', the table is created again instead of truncated."""
         schema = self.get_schema()
         table_name = self.normalize_table_name(table_name)
         df_columns = get_dataframe_columns_info(gdf)
 
+        table_exists = self.has_table(table_name, schema)
+        if table_exists and if_exists == 'fail':
+            raise Exception('Table "{schema}.{table_name}" already exists in your CARTO account. '
+                            'Please choose a different `table_name` or use '
+                            'if_exists="replace" to overwrite it.'.format(
+                                table_name=table_name, schema=schema))
+
+        append = table_exists and if_exists == 'append'
+        staging_table_name = create_tmp_name(base='tmp_bulk')
+        self._create_table_from_columns(staging_table_name, schema, df_columns, unlogged=True)
+
+        try:
+            chunk_ranges = get_chunk_ranges(_get_row_sizes(gdf, row_sizes), max_chunk_size, parallel)
+            self._copy_from_chunks(gdf, staging_table_name, df_columns, chunk_ranges, parallel, retry_times,
+                                   max_buffer_size, compression, compression_level, copy_data=copy_data)
+
+            log.debug('BULK LOAD table "{}"'.format(table_name))
+            self.execute_long_running_query(_bulk_load_query(
+                table_name, staging_table_name, schema, df_columns, append, cartodbfy and not append, indexes,
+                cluster_on))
+        finally:
+            self.execute_query(_drop_table_query(staging_table_name))
+
+        return table_name
+
+    def create_indexes(self, table_name, columns, indexes=None, cluster_on=None):
+        """Create the `indexes` of the table and CLUSTER it on `cluster_on` (see `get_index_statements`),
+        and analyze it, in a single batch job. The existing indexes with the same name are kept."""
+        table_name = self.normalize_table_name(table_name)
+        statements = get_index_statements(table_name, columns, indexes, cluster_on)
+        statements.append('ANALYZE {}'.format(table_name))
+
+        log.debug('CREATE indexes table "{}"'.format(table_name))
+        self.execute_long_running_query('; '.join(statements) + ';')
+
+    def _compare_row_hashes(self, gdf, table_name, schema, df_columns, key_columns_info, retry_times):
+        """Returns the positions of the DataFrame rows that are new or different in the table, and
+        the keys of the table rows that are not in the DataFrame."""
+        key_names = [column.dbname for column in key_columns_info]
+
+        query = 'SELECT {keys}, {row_hash} AS {row_hash_column} FROM "{schema}"."{table_name}"'.format(
+            keys=','.join(double_quote(name) for name in key_names), row_hash=_row_hash_expression(df_columns),
+            row_hash_column=ROW_HASH_COLUMN, schema=schema, table_name=table_name)
+        remote = self._copy_to(query, self._get_query_columns_info(query), retry_times=retry_times)
+
+        local = pd.DataFrame({column.dbname: gdf[column.name].to_numpy() for column in key_columns_info})
+        local[ROW_HASH_COLUMN] = _compute_row_hashes(gdf, df_columns)
+        local['_position'] = np.arange(len(gdf))
+
+        merged = local.merge(remote, on=key_names, how='outer', suffixes=('', '_remote'), indicator=True)
+
+        changed = (merged['_merge'] == 'left_only') | (
+            (merged['_merge'] == 'both') & (merged[ROW_HASH_COLUMN] != merged[ROW_HASH_COLUMN + '_remote']))
+        deleted = merged['_merge'] == 'right_only'
+
+        changed_rows = np.sort(merged.loc[changed, '_position'].to_numpy(dtype=np.int64))
+        deleted_keys = merged.loc[deleted, key_names].reset_index(drop=True)
+
+        return changed_rows, deleted_keys
+
+    def _delete_rows(self, table_name, schema, keys, key_columns_info, retry_times):
+        log.debug('DELETE {} rows from table "{}"'.format(len(keys), table_name))
+        staging_columns = [ColumnInfo(column.dbname, column.dbname, column.dbtype, column.is_geom)
+                           for column in key_columns_info]
+        staging_table_name = create_tmp_name(base='tmp_delete')
+        self._create_table_from_columns(staging_table_name, schema, staging_columns, unlogged=True)
+
+        try:
+            self._copy_from(keys, staging_table_name, staging_columns, retry_times=retry_times)
+            self.execute_long_running_query(
+                _delete_rows_query(table_name, staging_table_name, [column.dbname for column in key_columns_info]))
+        finally:
+            self.execute_query(_drop_table_query(staging_table_name))
+
+    def _copy_from_chunks(self, gdf, table_name, df_columns, chunk_ranges, parallel, retry_times, max_buffer_size,
+                          compression, compression_level, skip_ranges=None, on_copied=None, copy_data=None):
+        ranges = [row_range for row_range in chunk_ranges if row_range not in (skip_ranges or set())]
+
+        log.debug('COPY FROM in {} chunks with {} streams'.format(len(ranges), parallel))
+
+        def copy_chunk(start, end):
+            # Each chunk is retried on its own by the `retry_copy` decorator
+            self._copy_from(gdf[start:end], table_name, df_columns, retry_times=retry_times,
+                            max_buffer_size=max_buffer_size, compression=compression,
+                            compression_level=compression_level,
+                            copy_data=copy_data.get_range(start, end) if copy_data is not None else None)
+            if on_copied is not None:
+                on_copied(start, end)
+
+        with ThreadPoolExecutor(max_workers=parallel) as executor:
+            futures = [executor.submit(copy_chunk, start, end) for start, end in ranges]
+            for future in futures:
+                future.result()
+
+    def _prepare_copy_from_table(self, table_name, schema, df_columns, if_exists):
+        """Create or reset the target table. Returns False when the data is appended
+        to an existing table, which doesn't need to be cartodbfied again."""
         if self.has_table(table_name, schema):
             if if_exists == 'replace':
                 table_query = self._compute_query_from_table(table_name, schema)
@@ -110,17 +436,11 @@ class ContextManager:
                                 'if_exists="replace" to overwrite it.'.format(
                                     table_name=table_name, schema=schema))
             else:  # 'append'
-                cartodbfy = False
+                return False
         else:
             self._create_table_from_columns(table_name, schema, df_columns)
 
-        self._copy_from(gdf, table_name, df_columns, retry_times)
-
-        if cartodbfy is True:
-            cartodbfy_query = _cartodbfy_query(table_name, schema)
-            self.execute_long_running_query(cartodbfy_query)
-
-        return table_name
+        return True
 
     def create_table_from_query(self, query, table_name, if_exists, cartodbfy=True):
         schema = self.get_schema()
@@ -220,6 +540,9 @@ class ContextManager:
 
     def get_schema(self):
         """Get user schema from current credentials"""
+        return self._get_metadata('schema', None, self._get_schema)
+
+    def _get_schema(self):
         query = 'SELECT current_schema()'
         result = self.execute_query(query, do_post=False)
         schema = result['rows'][0]['current_schema']
@@ -260,6 +583,17 @@ class ContextManager:
             return response.get('rows')[0].get('bounds')
         return None
 
+    def get_updated_at(self, query):
+        """Get the last update time of the tables used in the query"""
+        updated_at_query = 'SELECT MAX(updated_at) AS updated_at FROM CDB_QueryTables_Updated_At($q${query}$q$)'.format(
+            query=query)
+        try:
+            result = self.execute_query(updated_at_query)
+            return result['rows'][0]['updated_at']
+        except CartoException as e:
+            log.debug('Update time not available: {}'.format(e))
+            return None
+
     def get_column_names(self, source, schema=None, exclude=None):
         query = self.compute_query(source, schema)
         columns = [c.name for c in self._get_query_columns_info(query)]
@@ -307,10 +641,10 @@ class ContextManager:
             create=_create_table_from_query_query(table_name, query))
         self.execute_long_running_query(query)
 
-    def _create_table_from_columns(self, table_name, schema, columns):
+    def _create_table_from_columns(self, table_name, schema, columns, unlogged=False):
         log.debug('CREATE table "{}"'.format(table_name))
         query = 'BEGIN; {create}; COMMIT;'.format(
-            create=_create_table_from_columns_query(table_name, columns))
+            create=_create_table_from_columns_query(table_name, columns, unlogged))
         self.execute_query(query)
 
     def _truncate_table(self, table_name, schema):
@@ -366,15 +700,33 @@ class ContextManager:
             table_name=table_name
         )
 
+    def _get_metadata(self, kind, key, compute):
+        """Metadata shared by the managers with the same credentials, see `MetadataCache`."""
+        return get_metadata_cache().get(self.credentials_key, kind, key, compute)
+
     def _check_exists(self, query):
+        try:
+            return self._get_metadata('exists', query, lambda: self._explain_query(query))
+        except CartoException:
+            # The errors that don't answer the query, like the rate limit, aren't cached
+            return False
+
+    def _explain_query(self, query):
+        """Only the queries rejected by the database, like a missing table, are False.
+        The rest of errors are raised."""
         exists_query = 'EXPLAIN {}'.format(query)
         try:
             self.execute_query(exists_query, do_post=False)
             return True
-        except CartoException:
-            return False
+        except CartoException as e:
+            if _is_bad_request(e):
+                return False
+            raise
 
     def _check_regenerate_table_exists(self):
+        return self._get_metadata('capabilities', 'cdb_regeneratetable', self._query_regenerate_table_exists)
+
+    def _query_regenerate_table_exists(self):
         query = '''
             SELECT 1
             FROM pg_catalog.pg_proc p
@@ -385,20 +737,27 @@ class ContextManager:
         return len(result['rows']) > 0
 
     def _get_query_columns_info(self, query):
+        # A copy of the cached list, so the callers can modify it
+        return list(self._get_metadata('columns', query, lambda: self._query_columns_info(query)))
+
+    def _query_columns_info(self, query):
         query = 'SELECT * FROM ({}) _q LIMIT 0'.format(query)
         table_info = self.execute_query(query)
         return get_query_columns_info(table_info['fields'])
 
-    def _get_copy_query(self, query, columns, limit):
+    def _get_copy_query(self, query, columns, limit, where=None, format=COPY_FORMAT_CSV):
         query_columns = [
-            double_quote(column.name) for column in columns
-            if (column.name != 'the_geom_webmercator')
+            binary_copy_expression(column) if format == COPY_FORMAT_BINARY else double_quote(column.name)
+            for column in _get_copy_columns(columns)
         ]
 
         query = 'SELECT {columns} FROM ({query}) _q'.format(
             query=query,
             columns=','.join(query_columns))
 
+        if where is not None:
+            query += ' WHERE {where}'.format(where=where)
+
         if limit is not None:
             if isinstance(limit, int) and (limit >= 0):
                 query += ' LIMIT {limit}'.format(limit=limit)
@@ -407,6 +766,142 @@ class ContextManager:
 
         return query
 
+    def _copy_to_dataframe(self, query, columns, limit, retry_times, parallel=None, partition_column=None,
+                           format=COPY_FORMAT_CSV, dtype_backend=None, source_columns=None):
+        if parallel is not None and parallel > 1:
+            if limit is None:
+                return self._parallel_copy_to(query, columns, parallel, partition_column, retry_times, format,
+                                              dtype_backend, source_columns)
+            log.debug('Parallel download is not available with `limit`. Using a single COPY stream')
+
+        copy_query = self._get_copy_query(query, columns, limit, format=format)
+        return self._get_copy_to_function(format, dtype_backend)(copy_query, columns, retry_times)
+
+    def _cached_copy_to(self, query, limit, format, dtype_backend, copy_to_function):
+        updated_at = self.get_updated_at(query)
+
+        if updated_at is None:
+            log.debug('Cache skipped: the update time of the source is not available')
+            return copy_to_function()
+
+        result_cache = get_cache()
+        key = result_cache.get_key(self.credentials.base_url, query, limit, format, dtype_backend)
+        df = result_cache.read(key, updated_at, dtype_backend)
+
+        if df is None:
+            df = copy_to_function()
+            result_cache.write(key, updated_at, df)
+
+        return df
+
+    def _get_pushdown_query(self, query, columns, selected_columns=None, where=None, bbox=None, geometry=None,
+                            simplify_tolerance=None, kept_column=None):
+        """Push the projection, the filters and the simplification down to the source query. The
+        spatial filters are applied to the geometry column, so the spatial index can be used.
+        The `kept_column` is selected in the query, but it's not part of the returned columns."""
+        if selected_columns is None and where is None and bbox is None and geometry is None and \
+                simplify_tolerance is None:
+            return query, columns
+
+        geom_column = next((c for c in _get_copy_columns(columns) if c.is_geom), None)
+        query_columns = columns
+
+        if selected_columns is not None:
+            names = [column.name for column in columns]
+            missing = [name for name in selected_columns if name not in names]
+            if missing:
+                raise ValueError('Wrong columns. "{}" not found in the source.'.format('", "'.join(missing)))
+            # The geometry column is always kept
+            query_columns = [c for c in columns if c.name in selected_columns or c is geom_column or
+                             c.name == kept_column]
+            columns = [c for c in columns if c.name in selected_columns or c is geom_column]
+
+        conditions = []
+        if where is not None:
+            conditions.append('({})'.format(where))
+        if bbox is not None or geometry is not None:
+            conditions.append(_get_spatial_condition(geom_column, bbox, geometry))
+
+        expressions = []
+        for column in _get_copy_columns(query_columns):
+            name = double_quote(column.name)
+            if column is geom_column and simplify_tolerance is not None:
+                if not isinstance(simplify_tolerance, (int, float)) or simplify_tolerance < 0:
+                    raise ValueError('Wrong simplify_tolerance value. You should provide a number >= 0.')
+                expressions.append('ST_SimplifyPreserveTopology({0}, {1}) AS {0}'.format(name, simplify_tolerance))
+            else:
+                expressions.append(name)
+
+        query = 'SELECT {columns} FROM ({query}) _q'.format(columns=','.join(expressions), query=query)
+
+        if conditions:
+            query += ' WHERE {}'.format(' AND '.join(conditions))
+
+        return query, columns
+
+    def _get_partition_conditions(self, query, partition_column, parallel):
+        """Split the values of a numeric column in `parallel` key ranges.
+        The first range also takes the rows with null keys."""
+        is_int = partition_column.dbtype in INT_DBTYPES
+        column = double_quote(partition_column.name)
+        bounds_query = 'SELECT MIN({column}) AS min, MAX({column}) AS max FROM ({query}) _q'.format(
+            column=column, query=query)
+        result = self.execute_query(bounds_query, do_post=False)
+        row = result['rows'][0]
+
+        if row['min'] is None or row['min'] == row['max']:
+            return []
+
+        step = (row['max'] - row['min']) / parallel
+        bounds = [row['min'] + step * i for i in range(1, parallel)]
+        bounds = sorted(set(math.ceil(bound) for bound in bounds) if is_int else bounds)
+
+        conditions = ['({column} < {upper} OR {column} IS NULL)'.format(column=column, upper=bounds[0])]
+        for lower, upper in zip(bounds, bounds[1:]):
+            conditions.append('{column} >= {lower} AND {column} < {upper}'.format(
+                column=column, lower=lower, upper=upper))
+        conditions.append('{column} >= {lower}'.format(column=column, lower=bounds[-1]))
+
+        return conditions
+
+    def _parallel_copy_to(self, query, columns, parallel, partition_column, retry_times, format=COPY_FORMAT_CSV,
+                          dtype_backend=None, source_columns=None):
+        """The partition column is looked up in the `source_columns`, as it may not be selected in the `columns`."""
+        partition_column = partition_column or DEFAULT_PARTITION_COLUMN
+        column = next((c for c in source_columns or columns if c.name == partition_column), None)
+
+        if column is None or column.dbtype not in INT_DBTYPES + FLOAT_DBTYPES:
+            raise ValueError('Wrong partition column. "{}" must be a numeric column of the source.'.format(
+                partition_column))
+
+        conditions = self._get_partition_conditions(query, column, parallel)
+        copy_to_function = self._get_copy_to_function(format, dtype_backend)
+
+        if len(conditions) < 2:
+            copy_query = self._get_copy_query(query, columns, None, format=format)
+            return copy_to_function(copy_query, columns, retry_times)
+
+        log.debug('COPY TO in {} partitions by "{}"'.format(len(conditions), partition_column))
+
+        if dtype_backend == DTYPE_BACKEND_PYARROW:
+            # The partitions are concatenated before the dictionary encoding, so the
+            # categorical columns get the same categories in all of them
+            copy_to_function = self._copy_to_arrow_table
+
+        with ThreadPoolExecutor(max_workers=parallel) as executor:
+            # Each partition is retried on its own by the `retry_copy` decorator
+            futures = [
+                executor.submit(copy_to_function, self._get_copy_query(query, columns, None, condition, format),
+                                columns, retry_times=retry_times)
+                for condition in conditions
+            ]
+            results = [future.result() for future in futures]
+
+        if dtype_backend == DTYPE_BACKEND_PYARROW:
+            return arrow_tables_to_dataframe(results, _get_geom_column_names(columns))
+
+        return pd.concat(results, ignore_index=True)
+
     @retry_copy
     def _copy_to(self, query, columns, retry_times=DEFAULT_RETRY_TIMES):
         log.debug('COPY TO')
@@ -414,27 +909,79 @@ class ContextManager:
 
         raw_result = self.copy_client.copyto_stream(copy_query)
 
-        converters = obtain_converters(columns)
-        parse_dates = date_columns_names(columns)
+        return normalize_null_values(_read_copy_csv(raw_result, columns), columns)
 
-        df = pd.read_csv(
-            raw_result,
-            converters=converters,
-            parse_dates=parse_dates)
+    @retry_copy
+    def _copy_to_chunks(self, query, columns, chunksize, retry_times=DEFAULT_RETRY_TIMES):
+        log.debug('COPY TO (chunks of {} rows)'.format(chunksize))
+        copy_query = "COPY ({0}) TO stdout WITH (FORMAT csv, HEADER true, NULL '{1}')".format(query, PG_NULL)
 
-        return df
+        raw_result = self.copy_client.copyto_stream(copy_query)
+
+        # The stream is read incrementally. All the chunks get the same
+        # dtypes whether or not they contain null values.
+        dtypes = obtain_nullable_dtypes(_get_copy_columns(columns))
+        reader = _read_copy_csv(raw_result, columns, chunksize=chunksize)
+
+        return (_astype_chunk(df, dtypes) for df in reader)
+
+    def _copy_to_arrow(self, query, columns, retry_times=DEFAULT_RETRY_TIMES):
+        table = self._copy_to_arrow_table(query, columns, retry_times=retry_times)
+        return arrow_tables_to_dataframe([table], _get_geom_column_names(columns))
+
+    @retry_copy
+    def _copy_to_arrow_table(self, query, columns, retry_times=DEFAULT_RETRY_TIMES):
+        log.debug('COPY TO (pyarrow)')
+        copy_query = "COPY ({0}) TO stdout WITH (FORMAT csv, HEADER true, NULL '{1}')".format(query, PG_NULL)
+
+        raw_result = self.copy_client.copyto_stream(copy_query)
+
+        return read_csv_arrow_table(
+            raw_result,
+            column_types=get_arrow_column_types(_get_copy_columns(columns)),
+            null_values=[PG_NULL],
+            true_values=['t'],
+            false_values=['f'])
 
     @retry_copy
-    def _copy_from(self, dataframe, table_name, columns, retry_times=DEFAULT_RETRY_TIMES):
+    def _copy_to_binary(self, query, columns, retry_times=DEFAULT_RETRY_TIMES):
+        log.debug('COPY TO (binary)')
+        copy_query = 'COPY ({0}) TO stdout WITH (FORMAT binary)'.format(query)
+
+        raw_result = self.copy_client.copyto_stream(copy_query)
+
+        return read_binary_copy(raw_result, _get_copy_columns(columns))
+
+    def _get_copy_to_function(self, format, dtype_backend=None):
+        if format == COPY_FORMAT_BINARY:
+            return self._copy_to_binary
+        if dtype_backend == DTYPE_BACKEND_PYARROW:
+            return self._copy_to_arrow
+        return self._copy_to
+
+    @retry_copy_from
+    def _copy_from(self, dataframe, table_name, columns, retry_times=DEFAULT_RETRY_TIMES,
+                   max_buffer_size=COPY_MAX_BUFFER_SIZE, compression=COPY_COMPRESSION_GZIP,
+                   compression_level=DEFAULT_COMPRESSION_LEVEL, copy_data=None):
         log.debug('COPY FROM')
         query = """
             COPY {table_name}({columns}) FROM stdin WITH (FORMAT csv, DELIMITER '|', NULL '{null}');
         """.format(
             table_name=table_name, null=PG_NULL,
             columns=','.join(double_quote(column.dbname) for column in columns)).strip()
-        data = _compute_copy_data(dataframe, columns)
 
-        self.copy_client.copyfrom(query, data)
+        # The data is created on every attempt, so the retries send it again from the start
+        if copy_data is not None:
+            data = copy_data.iter_blocks(max_buffer_size)
+        else:
+            data = _pipeline_copy_data(dataframe, columns, max_buffer_size=max_buffer_size)
+
+        # The copy client compresses the blocks incrementally and sends them with `Content-Encoding: gzip`
+        self.copy_client.copyfrom(query, data, compress=compression == COPY_COMPRESSION_GZIP,
+                                  compression_level=compression_level)
+
+        if copy_data is not None:
+            copy_data.release()
 
     def _rename_table(self, table_name, new_table_name):
         query = _rename_table_query(table_name, new_table_name)
@@ -447,6 +994,64 @@ class ContextManager:
         return norm_table_name
 
 
+def _astype_chunk(df, dtypes):
+    """The timestamps with time zone keep their zone, only the unit of their dtype is fixed."""
+    dtypes = {
+        name: pd.DatetimeTZDtype('us', df[name].dtype.tz) if isinstance(df[name].dtype, pd.DatetimeTZDtype) else dtype
+        for name, dtype in dtypes.items()
+    }
+    return df.astype(dtypes)
+
+
+def _read_copy_csv(stream, columns, chunksize=None):
+    columns = _get_copy_columns(columns)
+
+    # Explicit dtypes and NULL sentinels keep all the columns in the C parser
+    return pd.read_csv(
+        stream,
+        dtype=obtain_parser_dtypes(columns),
+        na_values=obtain_na_values(columns),
+        keep_default_na=False,
+        true_values=['t'],
+        false_values=['f'],
+        parse_dates=date_columns_names(columns),
+        chunksize=chunksize)
+
+
+def _get_spatial_condition(geom_column, bbox=None, geometry=None):
+    if geom_column is None:
+        raise ValueError('Wrong spatial filter. The source has no geometry column.')
+
+    if bbox is not None and geometry is not None:
+        raise ValueError('Wrong spatial filter. You should provide either bbox or geometry.')
+
+    name = double_quote(geom_column.name)
+
+    if bbox is not None:
+        if not isinstance(bbox, (list, tuple)) or len(bbox) != 4 or \
+                not all(isinstance(value, (int, float)) for value in bbox):
+            raise ValueError('Wrong bbox. You should provide a (west, south, east, north) tuple.')
+        return '{0} && ST_MakeEnvelope({1}, {2}, {3}, {4}, 4326)'.format(name, *bbox)
+
+    if not isinstance(geometry, BaseGeometry):
+        raise ValueError('Wrong geometry. You should provide a shapely geometry.')
+    return "ST_Intersects({0}, ST_GeomFromText('{1}', 4326))".format(name, geometry.wkt)
+
+
+def _is_bad_request(error):
+    """The SQL API errors of the query are 400 responses, wrapped in a CartoException by the SQL client."""
+    cause = error.args[0] if error.args else None
+    return isinstance(cause, BadRequestException)
+
+
+def _get_geom_column_names(columns):
+    return [column.name for column in _get_copy_columns(columns) if column.is_geom]
+
+
+def _get_copy_columns(columns):
+    return [column for column in columns if column.name != 'the_geom_webmercator']
+
+
 def _drop_table_query(table_name, if_exists=True):
     return 'DROP TABLE {if_exists} {table_name}'.format(
         table_name=table_name,
@@ -511,9 +1116,10 @@ def _not_reserved(column):
     return column not in RESERVED_COLUMNS
 
 
-def _create_table_from_columns_query(table_name, columns):
+def _create_table_from_columns_query(table_name, columns, unlogged=False):
     columns = ['{name} {type}'.format(name=double_quote(c.dbname), type=c.dbtype) for c in columns]
-    return 'CREATE TABLE {table_name} ({columns})'.format(
+    return 'CREATE {unlogged}TABLE {table_name} ({columns})'.format(
+        unlogged='UNLOGGED ' if unlogged else '',
         table_name=table_name,
         columns=','.join(columns))
 
@@ -522,6 +1128,210 @@ def _create_table_from_query_query(table_name, query):
     return 'CREATE TABLE {table_name} AS ({query})'.format(table_name=table_name, query=query)
 
 
+def _get_key_columns_info(df_columns, key):
+    return _get_columns_info(df_columns, key, 'key')
+
+
+def _get_columns_info(df_columns, names, param):
+    names = [normalize_name(name) for name in names]
+    columns_info = {column.dbname: column for column in df_columns}
+
+    missing_columns = set(names) - set(columns_info)
+    if missing_columns:
+        raise ValueError('Wrong {}. The columns {} are not in the dataframe.'.format(
+            param, ', '.join(sorted(missing_columns))))
+
+    return [columns_info[name] for name in names]
+
+
+def get_index_statements(table_name, columns, indexes=None, cluster_on=None):
+    """Statements that create the `indexes` of the table, every one a column name or a tuple of
+    column names, and CLUSTER the table on the index of the `cluster_on` column. The indexes of a
+    single geometry column are GIST, and the rest are B-tree."""
+    statements = []
+
+    for index in indexes or []:
+        index_columns = _get_columns_info(columns, [index] if isinstance(index, str) else index, 'indexes')
+        statements.append(_create_index_query(table_name, index_columns))
+
+    if cluster_on is not None:
+        index_columns = _get_columns_info(columns, [cluster_on], 'cluster_on')
+        statements.append(_create_index_query(table_name, index_columns))
+        statements.append(_cluster_table_query(table_name, _index_name(table_name, index_columns)))
+
+    return statements
+
+
+def _index_name(table_name, columns):
+    # The name that PostgreSQL gives to the indexes created without name, like the ones of cartodbfy
+    return '{}_{}_idx'.format(table_name, '_'.join(column.dbname for column in columns))
+
+
+def _create_index_query(table_name, columns):
+    method = 'GIST' if len(columns) == 1 and columns[0].is_geom else 'BTREE'
+    return 'CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} USING {method} ({columns})'.format(
+        index_name=_index_name(table_name, columns), table_name=table_name, method=method,
+        columns=','.join(double_quote(column.dbname) for column in columns))
+
+
+def _cluster_table_query(table_name, index_name):
+    return 'CLUSTER {table_name} USING {index_name}'.format(table_name=table_name, index_name=index_name)
+
+
+def _row_hash_expression(columns):
+    """MD5 of the row, as computed by `_compute_row_hashes`. Every value is prefixed by its length,
+    and the floats and geometries are hashed by their binary representation."""
+    fields = []
+
+    for column in columns:
+        name = double_quote(column.dbname)
+        if column.is_geom:
+            value = "encode(ST_AsEWKB({}), 'hex')".format(name)
+        elif column.dbtype in FLOAT_DBTYPES:
+            value = "encode(float8send({}::float8), 'hex')".format(name)
+        else:
+            value = '{}::text'.format(name)
+        fields.append("coalesce(length({value})::text || ':' || {value}, '-')".format(value=value))
+
+    return 'md5({})'.format(' || '.join(fields))
+
+
+def _compute_row_hashes(df, columns):
+    """The fields are formatted column by column, and only their concatenation and MD5 are computed
+    row by row. 1M rows of 5 columns with points take about 8s instead of 10.5s, and most of it is
+    the EWKB of the geometries (4s) and the MD5 of the rows (1.5s)."""
+    fields = [_row_hash_field(_get_column_values(df, column), column) for column in columns]
+    return [hashlib.md5(''.join(row).encode('utf-8')).hexdigest() for row in zip(*fields)]
+
+
+def _row_hash_field(series, column):
+    """Returns the text of every value of the column as it's hashed in `_row_hash_expression`."""
+    dtype = series.dtype
+    is_numpy_dtype = isinstance(dtype, np.dtype)
+
+    if column.is_geom:
+        values = encode_geometries_ewkb(series.to_numpy(dtype=object))
+        values = np.array([value.lower() if isinstance(value, str) else None for value in values], dtype=object)
+    elif is_numpy_dtype and dtype.kind == 'f':
+        # Hexadecimal of the IEEE 754 bits, as `float8send`
+        bits = series.to_numpy(dtype=np.float64).astype('>f8').tobytes()
+        return '16:' + np.frombuffer(bits.hex().encode('ascii'), dtype='S16').astype(str).astype(object)
+    elif is_numpy_dtype and dtype == bool:
+        return np.where(series.to_numpy(), '4:true', '5:false').astype(object)
+    elif is_numpy_dtype and dtype.kind in 'iu':
+        values = series.to_numpy().astype(str).astype(object)
+    else:
+        # The text loaded by COPY FROM
+        values = series.to_numpy(dtype=object) if dtype == object or isinstance(dtype, pd.StringDtype) \
+            else series.array.to_numpy(dtype=object)
+        is_str = np.fromiter((isinstance(value, str) for value in values), dtype=bool, count=len(values))
+        values = values.copy()
+        values[~is_str] = [_copy_text(value) for value in values[~is_str]]
+
+    # The length prefixes are formatted once for every distinct length
+    is_null = pd.isnull(values)
+    not_null = values[~is_null]
+    lengths, inverse = np.unique(np.fromiter(map(len, not_null), dtype=np.int64, count=len(not_null)),
+                                 return_inverse=True)
+    prefixes = np.array(['{}:'.format(length) for length in lengths], dtype=object)
+
+    fields = np.full(len(values), '-', dtype=object)
+    fields[~is_null] = prefixes[inverse] + not_null
+    return fields
+
+
+def _copy_text(value):
+    text = encode_row(value).decode('utf-8')
+
+    if text == PG_NULL:
+        return None
+
+    if text.startswith('"'):
+        return text[1:-1].replace('""', '"')
+
+    return text
+
+
+def _bulk_load_query(table_name, staging_table_name, schema, columns, append=False, cartodbfy=True,
+                     indexes=None, cluster_on=None):
+    columns_names = ','.join(double_quote(column.dbname) for column in columns)
+
+    if append:
+        load = 'INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {staging_table_name};'
+    else:
+        load = ('DROP TABLE IF EXISTS {table_name}; '
+                'CREATE TABLE {table_name} AS SELECT {columns} FROM {staging_table_name};')
+
+    statements = ['BEGIN; ' + load.format(
+        table_name=table_name, staging_table_name=staging_table_name, columns=columns_names) + ' COMMIT;']
+
+    if cartodbfy:
+        statements.append(_cartodbfy_query(table_name, schema) + ';')
+    elif not append:
+        statements.extend(
+            'CREATE INDEX ON {table_name} USING GIST ({column});'.format(
+                table_name=table_name, column=double_quote(column.dbname))
+            for column in columns if column.is_geom)
+
+    statements.extend(statement + ';' for statement in get_index_statements(table_name, columns, indexes, cluster_on))
+    statements.append('ANALYZE {};'.format(table_name))
+
+    return ' '.join(statements)
+
+
+def _delete_rows_query(table_name, staging_table_name, key_columns):
+    key_condition = ' AND '.join(
+        '_t.{column} = _s.{column}'.format(column=double_quote(column)) for column in key_columns)
+
+    return 'BEGIN; DELETE FROM {table_name} _t USING {staging_table_name} _s WHERE {key_condition}; COMMIT;'.format(
+        table_name=table_name, staging_table_name=staging_table_name, key_condition=key_condition)
+
+
+def _upsert_query(table_name, staging_table_name, columns, key_columns):
+    """UPDATE + INSERT merge, so the target table doesn't need a unique constraint on the key.
+    Only the rows with some different value (see `_upsert_comparison_value`) are updated."""
+    key_condition = ' AND '.join(
+        '_t.{column} = _s.{column}'.format(column=double_quote(column)) for column in key_columns)
+    value_columns_info = [column for column in columns if column.dbname not in key_columns]
+    value_columns = [double_quote(column.dbname) for column in value_columns_info]
+    all_columns = ','.join(double_quote(column.dbname) for column in columns)
+
+    update = ''
+    if value_columns:
+        update = '''
+            UPDATE {table_name} _t SET {assignments} FROM {staging_table_name} _s
+            WHERE {key_condition} AND ({target_values}) IS DISTINCT FROM ({staging_values});
+        '''.format(
+            table_name=table_name, staging_table_name=staging_table_name, key_condition=key_condition,
+            assignments=','.join('{column} = _s.{column}'.format(column=column) for column in value_columns),
+            target_values=','.join(_upsert_comparison_value('_t', column) for column in value_columns_info),
+            staging_values=','.join(_upsert_comparison_value('_s', column) for column in value_columns_info)).strip()
+
+    insert = '''
+        INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {staging_table_name} _s
+        WHERE NOT EXISTS (SELECT 1 FROM {table_name} _t WHERE {key_condition});
+    '''.format(
+        table_name=table_name, staging_table_name=staging_table_name, columns=all_columns,
+        key_condition=key_condition).strip()
+
+    return 'BEGIN; {update} {insert} COMMIT;'.format(update=update, insert=insert)
+
+
+def _upsert_comparison_value(alias, column):
+    """The geometries are compared by their EWKB, as `=` only compares the bounding boxes before
+    PostGIS 3. The text columns may be json in the target table, which has no `=`: they are
+    compared as text."""
+    name = '{}.{}'.format(alias, double_quote(column.dbname))
+
+    if column.is_geom:
+        return 'ST_AsEWKB({})'.format(name)
+
+    if column.dbtype in INT_DBTYPES + FLOAT_DBTYPES + BOOL_DBTYPES + DATETIME_DBTYPES:
+        return name
+
+    return '{}::text'.format(name)
+
+
 def _cartodbfy_query(table_name, schema):
     return "SELECT CDB_CartodbfyTable('{schema}', '{table_name}')".format(
         schema=schema, table_name=table_name)
@@ -538,26 +1348,239 @@ def _rename_table_query(table_name, new_table_name):
 
 
 def _create_auth_client(credentials, public=False):
-    return APIKeyAuthClient(
-        base_url=credentials.base_url,
-        api_key='default_public' if public else credentials.api_key,
-        session=credentials.session,
-        client_id='cartoframes_{}'.format(__version__),
-        user_agent='cartoframes_{}'.format(__version__))
+    return get_client_registry().get_auth_client(credentials, public)
+
+
+def _compute_copy_data(df, columns, block_size=COPY_BLOCK_SIZE):
+    """Encode the DataFrame for `COPY ... FROM stdin WITH (FORMAT csv, DELIMITER '|')`. Each
+    column is formatted in bulk, and the rows are yielded in blocks of `block_size` rows."""
+    for start in range(0, len(df), block_size):
+        yield _encode_copy_block(df.iloc[start:start + block_size], columns)
+
+
+def encode_copy_data(df, columns, block_size=COPY_BLOCK_SIZE, workers=COPY_ENCODE_WORKERS,
+                     max_size=COPY_MAX_ENCODED_SIZE):
+    """Encode the DataFrame as `_compute_copy_data` does and measure the exact size of every row,
+    in a single pass. The blocks are encoded by a pool of threads, and they are kept while they
+    fit in `max_size` bytes, so the upload sends them instead of encoding the rows again."""
+    row_sizes = np.zeros(len(df), dtype=np.int64)
+    blocks = {}
+    kept_size = 0
+    starts = range(0, len(df), block_size)
+
+    def encode(start):
+        return _encode_copy_block(df.iloc[start:start + block_size], columns, with_sizes=True)
+
+    with ThreadPoolExecutor(max_workers=workers or 1) as executor:
+        for start, (block, sizes) in zip(starts, executor.map(encode, starts)):
+            row_sizes[start:start + len(sizes)] = sizes
+            if kept_size + len(block) <= max_size:
+                blocks[start] = block
+                kept_size += len(block)
+
+    log.debug('COPY FROM data encoded: {} bytes, {} bytes kept'.format(int(row_sizes.sum()), kept_size))
+
+    return CopyData(df, columns, row_sizes, blocks, block_size)
+
+
+class CopyData:
+    """Rows of a DataFrame encoded by `encode_copy_data`: the size of every row and the encoded
+    blocks by their first row. `get_range` returns the data of a chunk, that shares the blocks."""
+
+    def __init__(self, df, columns, row_sizes, blocks, block_size=COPY_BLOCK_SIZE, start=0, end=None):
+        self.df = df
+        self.columns = columns
+        self.row_sizes = row_sizes
+        self.block_size = block_size
+        self.start = start
+        self.end = len(df) if end is None else end
+        self._blocks = blocks
+
+    def get_range(self, start, end):
+        return CopyData(self.df, self.columns, self.row_sizes, self._blocks, self.block_size, start, end)
+
+    def iter_blocks(self, max_buffer_size=COPY_MAX_BUFFER_SIZE):
+        """Yields the encoded rows of the range. The blocks at the edges are cut at the exact
+        offset of the rows, and the rows of the blocks that were not kept are encoded again."""
+        pending = None
+
+        for block_start in range(self.start - self.start % self.block_size, self.end, self.block_size):
+            start = max(block_start, self.start)
+            end = min(block_start + self.block_size, self.end)
+            block = self._blocks.get(block_start)
+
+            if block is None:
+                if pending is None:
+                    pending = start
+                continue
+
+            if pending is not None:
+                yield from _pipeline_copy_data(self.df.iloc[pending:start], self.columns, self.block_size,
+                                               max_buffer_size=max_buffer_size)
+                pending = None
+
+            offset = int(self.row_sizes[block_start:start].sum())
+            size = int(self.row_sizes[start:end].sum())
+            yield block if offset == 0 and size == len(block) else block[offset:offset + size]
+
+        if pending is not None:
+            yield from _pipeline_copy_data(self.df.iloc[pending:self.end], self.columns, self.block_size,
+                                           max_buffer_size=max_buffer_size)
+
+    def release(self):
+        """Free the blocks inside the range, once it's uploaded."""
+        first_block_start = self.start + -self.start % self.block_size
+
+        for block_start in range(first_block_start, self.end, self.block_size):
+            if min(block_start + self.block_size, len(self.df)) <= self.end:
+                self._blocks.pop(block_start, None)
+
+
+def get_chunk_ranges(row_sizes, max_chunk_size=None, min_chunks=1):
+    """Split the rows in (start, end) ranges of at most `max_chunk_size` bytes, and in at least
+    `min_chunks` ranges of similar size. A row bigger than `max_chunk_size` is a range on its own.
+    Without rows, there is a single empty range, so the table is still created."""
+    cumulative_sizes = np.cumsum(row_sizes)
+    total_size = int(cumulative_sizes[-1]) if len(cumulative_sizes) > 0 else 0
+
+    chunk_size = int(math.ceil(total_size / min_chunks))
+    if max_chunk_size is not None:
+        chunk_size = min(chunk_size, max_chunk_size)
+    chunk_size = max(chunk_size, 1)
+
+    ranges = []
+    start = 0
+    while start < len(row_sizes):
+        offset = cumulative_sizes[start - 1] if start > 0 else 0
+        end = int(np.searchsorted(cumulative_sizes, offset + chunk_size, side='right'))
+        end = max(end, start + 1)
+        ranges.append((start, end))
+        start = end
+
+    return ranges or [(0, 0)]
+
+
+def _get_row_sizes(df, row_sizes=None):
+    """Without the encoded sizes, all the rows are considered of the same size."""
+    return row_sizes if row_sizes is not None else np.ones(len(df), dtype=np.int64)
+
+
+def _pipeline_copy_data(df, columns, block_size=COPY_BLOCK_SIZE, workers=COPY_ENCODE_WORKERS,
+                        max_buffer_size=COPY_MAX_BUFFER_SIZE):
+    """Same blocks as `_compute_copy_data`, but the next blocks are encoded by a pool of threads
+    while the current one is being sent. The number of blocks in flight is limited so that about
+    `max_buffer_size` bytes are buffered: when the network is slower, the encoding waits for it."""
+    starts = list(range(0, len(df), block_size))
+
+    if len(starts) <= 1 or not workers or not max_buffer_size:
+        yield from _compute_copy_data(df, columns, block_size)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+
+    def submit(start):
+        pending.append(executor.submit(_encode_copy_block, df.iloc[start:start + block_size], columns))
+
+    try:
+        # The size of the first block is used to compute the number of blocks in flight
+        submit(starts[0])
+        block = pending.popleft().result()
+        max_pending = max(1, max_buffer_size // max(len(block), 1))
+        log.debug('COPY FROM pipeline with {} blocks in flight'.format(max_pending))
+
+        next_starts = iter(starts[1:])
+        for start in next_starts:
+            submit(start)
+            if len(pending) >= max_pending:
+                break
+
+        while True:
+            yield block
+            if not pending:
+                break
+            block = pending.popleft().result()
+            for start in next_starts:
+                submit(start)
+                break
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def _encode_copy_block(block, columns, with_sizes=False):
+    """Returns the encoded rows of the block and, `with_sizes`, the size of every row."""
+    encoded_columns = [_encode_column(_get_column_values(block, column), column.is_geom) for column in columns]
+
+    rows = pd.Series(encoded_columns[0], dtype=object)
+    if len(encoded_columns) > 1:
+        rows = rows.str.cat([pd.Series(values, dtype=object) for values in encoded_columns[1:]], sep='|')
+
+    text = '\n'.join(rows.tolist()) + '\n'
+    data = text.encode('utf-8')
+
+    if not with_sizes:
+        return data
+
+    # The size of the rows with the newline. With multibyte characters, the character offsets of the
+    # row ends are mapped to the bytes that start a character (not 0b10xxxxxx) in the encoded data
+    ends = np.cumsum(rows.str.len().to_numpy(dtype=np.int64) + 1)
+    if len(data) != len(text):
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        ends = np.append(np.flatnonzero((buffer & 0xc0) != 0x80), len(data))[ends]
+
+    return data, np.diff(ends, prepend=0)
+
+
+def _get_column_values(df, column):
+    """The geometries in other CRS, from `to_carto` with `copy=False`, are reprojected block by block."""
+    series = df[column.name]
+
+    if column.is_geom and isinstance(series, GeoSeries) and is_reprojection_needed(series):
+        series = reproject(series)
+
+    return series
+
+
+def _encode_column(series, is_geom=False):
+    """Returns the text of every value of the column, as `encode_row` does."""
+    if is_geom:
+        values = encode_geometries_ewkb(series.to_numpy(dtype=object))
+        return np.where(pd.isnull(values), PG_NULL, values)
+
+    dtype = series.dtype
+    is_numpy_dtype = isinstance(dtype, np.dtype)
+
+    if is_numpy_dtype and dtype == bool:
+        return np.where(series.to_numpy(), 'True', 'False')
+
+    if is_numpy_dtype and dtype.kind in 'iu':
+        return series.to_numpy().astype(str)
+
+    if is_numpy_dtype and dtype == np.float64:
+        values = series.to_numpy()
+        encoded = values.astype(str)
+        encoded[np.isnan(values)] = 'NaN'
+        encoded[np.isposinf(values)] = 'Infinity'
+        encoded[np.isneginf(values)] = '-Infinity'
+        return encoded
 
+    if dtype == object or isinstance(dtype, pd.StringDtype):
+        return _encode_text_column(series.to_numpy(dtype=object))
 
-def _compute_copy_data(df, columns):
-    for index in df.index:
-        row_data = []
-        for column in columns:
-            val = df.at[index, column.name]
+    return np.array([encode_row(value).decode('utf-8') for value in series.array], dtype=object)
 
-            if column.is_geom:
-                val = encode_geometry_ewkb(val)
 
-            row_data.append(encode_row(val))
+def _encode_text_column(values):
+    """Quote the strings with special characters in bulk. Other values use `encode_row`."""
+    is_str = np.fromiter((isinstance(value, str) for value in values), dtype=bool, count=len(values))
+    encoded = np.empty(len(values), dtype=object)
 
-        csv_row = b'|'.join(row_data)
-        csv_row += b'\n'
+    strings = pd.Series(values[is_str], dtype=object)
+    special = strings.str.contains(COPY_SPECIAL_CHARACTERS, regex=True).to_numpy(dtype=bool)
+    strings[special] = '"' + strings[special].str.replace('"', '""', regex=False) + '"'
+    encoded[is_str] = strings.to_numpy()
 
-        yield csv_row
+    encoded[~is_str] = [encode_row(value).decode('utf-8') for value in values[~is_str]]
+    return encoded
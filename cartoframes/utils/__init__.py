@@ -1,9 +1,13 @@
 from .logger import set_log_level
 from .geom_utils import decode_geometry
 from .metrics import setup_metrics
+from .cache import setup_cache
+from .metadata_cache import setup_metadata_cache
 
 __all__ = [
     'setup_metrics',
+    'setup_cache',
+    'setup_metadata_cache',
     'set_log_level',
     'decode_geometry'
 ]
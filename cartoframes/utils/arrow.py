@@ -0,0 +1,112 @@
+"""Arrow-backed DataFrames, used with `dtype_backend='pyarrow'`"""
+
+import pandas as pd
+
+from .columns import INT_DBTYPES, FLOAT_DBTYPES, BOOL_DBTYPES, DATETIME_DBTYPES
+from .utils import check_package
+
+DTYPE_BACKEND_PYARROW = 'pyarrow'
+DTYPE_BACKENDS = [None, DTYPE_BACKEND_PYARROW]
+
+# Text columns with at most this ratio of distinct values become categorical
+DICTIONARY_MAX_RATIO = 0.5
+
+
+def check_dtype_backend(dtype_backend):
+    if dtype_backend not in DTYPE_BACKENDS:
+        raise ValueError("Wrong dtype_backend. Valid values are: None, '{}'.".format(DTYPE_BACKEND_PYARROW))
+
+    if dtype_backend == DTYPE_BACKEND_PYARROW:
+        check_package('pyarrow', is_optional=True)
+
+
+def read_csv_arrow(stream, column_types=None, null_values=None, true_values=None, false_values=None,
+                   exclude_dictionary=None):
+    """Read a CSV stream with the pyarrow streaming reader into a DataFrame of Arrow-backed columns.
+
+    The text columns with few distinct values are dictionary-encoded, so they become categorical.
+
+    Args:
+        stream (file-like object): CSV stream with header.
+        column_types (dict, optional): pyarrow types (or type names) by column name. The rest are inferred.
+        null_values (list, optional): values parsed as nulls. Default is the pyarrow list.
+        true_values (list, optional): values parsed as True.
+        false_values (list, optional): values parsed as False.
+        exclude_dictionary (list, optional): text columns that are never dictionary-encoded.
+
+    """
+    table = read_csv_arrow_table(stream, column_types, null_values, true_values, false_values)
+    return arrow_tables_to_dataframe([table], exclude_dictionary)
+
+
+def read_csv_arrow_table(stream, column_types=None, null_values=None, true_values=None, false_values=None):
+    """Same as `read_csv_arrow`, but returns the Arrow table without dictionary-encoded columns."""
+    from pyarrow import csv
+
+    convert_options = {'strings_can_be_null': True}
+    if column_types is not None:
+        convert_options['column_types'] = column_types
+    if null_values is not None:
+        convert_options['null_values'] = null_values
+    if true_values is not None:
+        convert_options['true_values'] = true_values
+    if false_values is not None:
+        convert_options['false_values'] = false_values
+
+    reader = csv.open_csv(stream, convert_options=csv.ConvertOptions(**convert_options))
+    return reader.read_all()
+
+
+def arrow_tables_to_dataframe(tables, exclude_dictionary=None):
+    """Concatenate the Arrow tables into a DataFrame. The text columns are dictionary-encoded after
+    the concatenation, so all the rows of a categorical column share the same categories."""
+    import pyarrow as pa
+
+    table = pa.concat_tables(tables, promote_options='default') if len(tables) > 1 else tables[0]
+    table = _dictionary_encode(table, exclude_dictionary or [])
+
+    return table.to_pandas(types_mapper=arrow_types_mapper, split_blocks=True, self_destruct=True)
+
+
+def arrow_types_mapper(arrow_type):
+    """Arrow-backed dtypes for all the columns except the dictionaries, which become categorical."""
+    import pyarrow as pa
+
+    if pa.types.is_dictionary(arrow_type):
+        return None
+
+    return pd.ArrowDtype(arrow_type)
+
+
+def get_arrow_column_types(columns):
+    """Returns the pyarrow types of the non-date columns. Dates are inferred by the reader."""
+    import pyarrow as pa
+
+    column_types = {}
+
+    for column in columns:
+        if column.dbtype in INT_DBTYPES:
+            column_types[column.name] = pa.int64()
+        elif column.dbtype in FLOAT_DBTYPES:
+            column_types[column.name] = pa.float64()
+        elif column.dbtype in BOOL_DBTYPES:
+            column_types[column.name] = pa.bool_()
+        elif column.dbtype not in DATETIME_DBTYPES:
+            column_types[column.name] = pa.string()
+
+    return column_types
+
+
+def _dictionary_encode(table, exclude):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    for i, field in enumerate(table.schema):
+        if field.name in exclude or not pa.types.is_string(field.type) or table.num_rows == 0:
+            continue
+
+        column = table.column(i)
+        if pc.count_distinct(column).as_py() <= DICTIONARY_MAX_RATIO * table.num_rows:
+            table = table.set_column(i, field.name, column.dictionary_encode())
+
+    return table
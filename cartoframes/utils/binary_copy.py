@@ -0,0 +1,329 @@
+"""Decoder of the PostgreSQL binary COPY format"""
+
+import struct
+
+import numpy as np
+import pandas as pd
+
+from .columns import INT_DBTYPES, FLOAT_DBTYPES, BOOL_DBTYPES, DATETIME_DBTYPES
+from .geom_utils import decode_geometry
+from .utils import double_quote
+
+BINARY_SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+BINARY_HEADER_LENGTH = len(BINARY_SIGNATURE) + 8
+
+# Bytes of the stream decoded at once
+BINARY_BLOCK_SIZE = 8 * 1024 * 1024
+
+# PostgreSQL binary timestamps are microseconds since 2000-01-01
+PG_EPOCH = np.datetime64('2000-01-01T00:00:00', 'us')
+PG_TIMESTAMP_INFINITY = (np.iinfo(np.int64).min, np.iinfo(np.int64).max)
+
+# Wire type requested for each column: (cast, numpy dtype of the fixed-width values)
+INT_WIRE_TYPE = ('int8', '>i8')
+FLOAT_WIRE_TYPE = ('float8', '>f8')
+BOOL_WIRE_TYPE = ('bool', '?')
+DATETIME_WIRE_TYPE = ('timestamp', '>i8')
+TEXT_WIRE_TYPE = ('text', None)
+
+_unpack_int16 = struct.Struct('>h').unpack_from
+_unpack_int32 = struct.Struct('>i').unpack_from
+
+
+def binary_copy_expression(column):
+    """Returns the SQL expression that casts the column to the type decoded by `read_binary_copy`."""
+    name = double_quote(column.name)
+
+    if column.is_geom:
+        return 'ST_AsBinary({0}) AS {0}'.format(name)
+
+    return '{0}::{1} AS {0}'.format(name, _wire_type(column)[0])
+
+
+def read_binary_copy(stream, columns, block_size=BINARY_BLOCK_SIZE):
+    """Decode a `COPY ... TO stdout WITH (FORMAT binary)` stream into a DataFrame.
+
+    The stream is read in blocks of `block_size` bytes. The tuples of each block are located
+    at once (see `_scan_tuples`), each fixed-width column is gathered into a NumPy array, text
+    columns are decoded as UTF-8 and geometry columns (sent as WKB) are decoded into shapely
+    geometries at the end.
+
+    Args:
+        stream (file-like object): binary COPY stream.
+        columns (list): ColumnInfo list of the selected columns, in the query order.
+        block_size (int, optional): bytes of the stream decoded at once.
+
+    """
+    data = _read_at_least(stream, b'', BINARY_HEADER_LENGTH, block_size)
+
+    if not data.startswith(BINARY_SIGNATURE):
+        raise ValueError('Wrong binary COPY stream. The PGCOPY signature was not found.')
+
+    if len(data) < BINARY_HEADER_LENGTH:
+        raise ValueError('Wrong binary COPY stream. The stream ended before the trailer.')
+
+    widths = [_wire_width(column) for column in columns]
+    blocks = [[] for _ in columns]
+    position = BINARY_HEADER_LENGTH + _unpack_int32(data, BINARY_HEADER_LENGTH - 4)[0]
+    data = _read_at_least(stream, data, position, block_size)
+
+    while True:
+        offsets, lengths, position, finished = _scan_tuples(data, position, widths)
+        buffer = np.frombuffer(data, dtype=np.uint8)
+
+        for i, column in enumerate(columns):
+            blocks[i].append(_read_fields(buffer, data, column, offsets[i], lengths[i]))
+
+        if finished:
+            break
+
+        next_data = _read_block(stream, block_size)
+
+        if not next_data:
+            raise ValueError('Wrong binary COPY stream. The stream ended before the trailer.')
+
+        # The incomplete tuple at the end of the block is decoded with the next one
+        data = data[position:] + next_data
+        position = 0
+
+    return pd.DataFrame({
+        column.name: _decode_column(column, blocks[i]) for i, column in enumerate(columns)
+    }, columns=[column.name for column in columns])
+
+
+def _scan_tuples(data, position, widths):
+    """Locate the complete tuples of the data from `position`. Returns the offset (-1 for NULL
+    values) and length of every field by column, the position after the last complete tuple
+    and whether the trailer was found.
+
+    The tuples are not walked one by one: every position with the field count is a candidate
+    tuple start, and the fields of all the candidates are walked together, column by column.
+    The candidates with unexpected field lengths are discarded. The tuples are the chain of
+    candidates that starts at `position`, where every tuple ends at the start of the next one."""
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    end = len(data)
+
+    view = buffer[position:]
+    starts = np.flatnonzero((view[:-1] == len(widths) >> 8) &
+                            (view[1:] == len(widths) & 0xff)) + position
+
+    valid = np.ones(len(starts), dtype=bool)
+    field_positions = starts + 2
+    offsets = []
+    lengths = []
+
+    for width in widths:
+        valid &= field_positions + 4 <= end
+        field_positions = np.where(valid, field_positions, 0)
+        length = _gather_int32(buffer, field_positions)
+        valid &= (length >= -1) if width is None else (length == width) | (length == -1)
+
+        offsets.append(np.where(length < 0, -1, field_positions + 4))
+        lengths.append(np.maximum(length, 0))
+        field_positions = field_positions + 4 + lengths[-1]
+
+    valid &= field_positions <= end
+
+    starts = starts[valid]
+    ends = field_positions[valid]
+    chain = _get_chain(starts, ends, position)
+
+    if len(chain):
+        position = int(ends[chain[-1]])
+
+    if end - position >= 2 and _unpack_int16(data, position)[0] == -1:
+        finished = True
+    else:
+        finished = False
+        _check_incomplete_tuple(data, position, widths)
+
+    return ([offset[valid][chain] for offset in offsets],
+            [length[valid][chain] for length in lengths],
+            position, finished)
+
+
+def _get_chain(starts, ends, position):
+    """Returns the indices of the candidates chained from the one at `position`. The candidates
+    inside other tuples break the chain of consecutive candidates, and they are skipped."""
+    count = len(starts)
+
+    if count == 0 or starts[0] != position:
+        return np.array([], dtype=np.int64)
+
+    breaks = np.flatnonzero(ends[:-1] != starts[1:])
+    chain = []
+    index = 0
+
+    while index is not None:
+        next_break = np.searchsorted(breaks, index)
+        last = breaks[next_break] if next_break < len(breaks) else count - 1
+        chain.append(np.arange(index, last + 1))
+
+        index = np.searchsorted(starts, ends[last])
+        if index >= count or starts[index] != ends[last]:
+            index = None
+
+    return np.concatenate(chain)
+
+
+def _check_incomplete_tuple(data, position, widths):
+    """Raises an error if the tuple at `position` is complete, as it was not located."""
+    end = len(data)
+
+    if position + 2 > end:
+        return
+
+    field_count = _unpack_int16(data, position)[0]
+    if field_count != len(widths):
+        raise ValueError('Wrong binary COPY stream. Expected {} fields but found {}.'.format(
+            len(widths), field_count))
+
+    position += 2
+    for width in widths:
+        if position + 4 > end:
+            return
+
+        length = _unpack_int32(data, position)[0]
+        if length < -1 or (width is not None and length not in (-1, width)):
+            raise ValueError('Wrong binary COPY stream. Unexpected field length {}.'.format(length))
+
+        position += 4 + max(length, 0)
+
+    if position <= end:
+        raise ValueError('Wrong binary COPY stream.')
+
+
+def _read_at_least(stream, data, size, block_size):
+    """Read blocks until the data has `size` bytes or the stream ends."""
+    while len(data) < size:
+        block = _read_block(stream, block_size)
+        if not block:
+            break
+        data += block
+
+    return data
+
+
+def _read_block(stream, size):
+    block = bytearray(size)
+    view = memoryview(block)
+    total = 0
+
+    while total < size:
+        count = stream.readinto(view[total:])
+        if not count:
+            break
+        total += count
+
+    return bytes(view[:total])
+
+
+def _read_fields(buffer, data, column, offsets, lengths):
+    """Returns the values of the fields of a block: the not null values and the null mask
+    of the fixed-width columns, or an object array of the variable-width ones."""
+    if column.is_geom:
+        return np.array([
+            data[offset:offset + length] if offset >= 0 else None
+            for offset, length in zip(offsets.tolist(), lengths.tolist())
+        ], dtype=object)
+
+    _, dtype = _wire_type(column)
+
+    if dtype is None:
+        return _decode_text(buffer, offsets, lengths)
+
+    nulls = offsets < 0
+    return _gather_fixed_width(buffer, offsets[~nulls], np.dtype(dtype)), nulls
+
+
+def _decode_column(column, blocks):
+    if column.is_geom:
+        return decode_geometry(pd.Series(np.concatenate(blocks), dtype=object)).values
+
+    if _wire_type(column)[1] is None:
+        return np.concatenate(blocks)
+
+    values = np.concatenate([block[0] for block in blocks])
+    nulls = np.concatenate([block[1] for block in blocks])
+
+    if column.dbtype in DATETIME_DBTYPES:
+        return _to_datetime(values, nulls)
+
+    if not nulls.any():
+        return values.astype(values.dtype.newbyteorder('='))
+
+    if column.dbtype in INT_DBTYPES or column.dbtype in FLOAT_DBTYPES:
+        result = np.full(len(nulls), np.nan)
+    else:
+        result = np.full(len(nulls), None, dtype=object)
+        values = values.astype(object)
+
+    result[~nulls] = values
+    return result
+
+
+def _decode_text(buffer, offsets, lengths):
+    nulls = offsets < 0
+    result = np.full(len(offsets), None, dtype=object)
+    offsets = offsets[~nulls]
+    lengths = lengths[~nulls]
+
+    if len(offsets):
+        # PostgreSQL text can't contain NUL characters: the values are joined
+        # with NUL separators, decoded at once and split
+        sizes = lengths + 1
+        separators = np.cumsum(sizes) - 1
+        indices = np.arange(separators[-1] + 1) + np.repeat(offsets - (separators - lengths), sizes)
+        joined = buffer[np.minimum(indices, len(buffer) - 1)]
+        joined[separators] = 0
+        result[~nulls] = np.array(joined.tobytes().decode('utf-8').split('\x00')[:-1], dtype=object)
+
+    return result
+
+
+def _gather_int32(buffer, offsets):
+    return _gather_fixed_width(buffer, offsets, np.dtype('>i4')).astype(np.int64)
+
+
+def _gather_fixed_width(buffer, offsets, dtype):
+    """The rows of a sliding window view of the buffer are the values at every offset. A block
+    can end with less bytes than a value, like the trailer: the discarded candidates of
+    `_scan_tuples` point to the offset 0, so the buffer is padded to fit a value."""
+    if len(offsets) == 0:
+        return np.empty(0, dtype=dtype)
+
+    if len(buffer) < dtype.itemsize:
+        buffer = np.concatenate([buffer, np.zeros(dtype.itemsize - len(buffer), dtype=np.uint8)])
+
+    windows = np.lib.stride_tricks.sliding_window_view(buffer, dtype.itemsize)
+    return windows[offsets].reshape(-1).view(dtype)
+
+
+def _to_datetime(values, nulls):
+    result = np.full(len(nulls), np.datetime64('NaT'), dtype='datetime64[ns]')
+    infinite = np.isin(values, PG_TIMESTAMP_INFINITY)
+    timestamps = PG_EPOCH + values.astype(np.int64).astype('timedelta64[us]')
+    timestamps[infinite] = np.datetime64('NaT')
+    result[~nulls] = timestamps.astype('datetime64[ns]')
+    return result
+
+
+def _wire_type(column):
+    if column.dbtype in INT_DBTYPES:
+        return INT_WIRE_TYPE
+    if column.dbtype in FLOAT_DBTYPES:
+        return FLOAT_WIRE_TYPE
+    if column.dbtype in BOOL_DBTYPES:
+        return BOOL_WIRE_TYPE
+    if column.dbtype in DATETIME_DBTYPES:
+        return DATETIME_WIRE_TYPE
+    return TEXT_WIRE_TYPE
+
+
+def _wire_width(column):
+    """Length of the not null fields of the column, or None for the variable-width ones."""
+    if column.is_geom:
+        return None
+
+    dtype = _wire_type(column)[1]
+    return np.dtype(dtype).itemsize if dtype is not None else None
@@ -0,0 +1,177 @@
+"""On-disk cache of the read_carto results"""
+
+import os
+import json
+import hashlib
+import tempfile
+
+import appdirs
+
+from shapely.geometry.base import BaseGeometry
+
+from .arrow import arrow_types_mapper, DTYPE_BACKEND_PYARROW
+from .logger import log
+from .utils import check_package
+
+CACHE_DIR = appdirs.user_cache_dir('cartoframes')
+DEFAULT_CACHE_MAX_SIZE = 1000000000  # 1GB
+DATA_EXTENSION = '.feather'
+METADATA_EXTENSION = '.json'
+
+_cache = None
+
+
+def setup_cache(max_size=None, path=None):
+    '''Update the configuration of the `read_carto` cache, used with `cache=True`.
+
+    Args:
+        max_size (int, optional): maximum size of the cache in bytes. When it's exceeded,
+            the least recently used results are removed. Default is 1GB.
+        path (str, optional): directory of the cache files. Default is the user cache directory.
+
+    '''
+    global _cache
+
+    _cache = ResultCache(path=path, max_size=max_size)
+
+
+def get_cache():
+    global _cache
+
+    if _cache is None:
+        _cache = ResultCache()
+
+    return _cache
+
+
+class ResultCache:
+    """Stores the downloaded DataFrames as Feather files, memory-mapped on reload. Every entry
+    keeps the update time of the source tables, and it's discarded when the tables change."""
+
+    def __init__(self, path=None, max_size=None):
+        self.path = path or CACHE_DIR
+        self.max_size = max_size if max_size is not None else DEFAULT_CACHE_MAX_SIZE
+
+    def get_key(self, base_url, query, limit=None, format=None, dtype_backend=None):
+        query = ' '.join(query.split())
+        content = json.dumps([base_url, query, limit, format, dtype_backend])
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    def read(self, key, updated_at, dtype_backend=None):
+        data_path, metadata_path = self._get_paths(key)
+
+        if not os.path.exists(data_path) or not os.path.exists(metadata_path):
+            log.debug('Cache miss: %s', key)
+            return None
+
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+
+        if metadata.get('updated_at') != updated_at:
+            log.debug('Cache miss: %s (outdated)', key)
+            self._remove(key)
+            return None
+
+        check_package('pyarrow', is_optional=True)
+        from pyarrow import feather
+
+        log.debug('Cache hit: %s', key)
+        os.utime(data_path)
+        table = feather.read_table(data_path, memory_map=True)
+
+        if dtype_backend == DTYPE_BACKEND_PYARROW:
+            return table.to_pandas(types_mapper=arrow_types_mapper)
+
+        return table.to_pandas()
+
+    def write(self, key, updated_at, df):
+        check_package('pyarrow', is_optional=True)
+        from pyarrow import feather
+
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+        data_path, metadata_path = self._get_paths(key)
+        df = _encode_geometries(df).reset_index(drop=True)
+
+        def write_metadata(path):
+            with open(path, 'w') as f:
+                json.dump({'updated_at': updated_at}, f)
+
+        # The metadata is written last: an entry is only read when both files exist
+        _replace_file(data_path, lambda path: feather.write_feather(df, path))
+        _replace_file(metadata_path, write_metadata)
+
+        self._evict()
+
+    def clear(self):
+        for key in self._get_keys():
+            self._remove(key)
+
+    def _evict(self):
+        """Remove the least recently used entries until the cache fits in `max_size`."""
+        entries = []
+        for key in self._get_keys():
+            data_path, metadata_path = self._get_paths(key)
+            size = os.path.getsize(data_path) + os.path.getsize(metadata_path)
+            entries.append((os.path.getmtime(data_path), size, key))
+
+        total_size = sum(size for _, size, _ in entries)
+
+        for _, size, key in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            log.debug('Cache eviction: %s', key)
+            self._remove(key)
+            total_size -= size
+
+    def _get_keys(self):
+        if not os.path.exists(self.path):
+            return []
+
+        return [
+            filename[:-len(DATA_EXTENSION)] for filename in os.listdir(self.path)
+            if filename.endswith(DATA_EXTENSION) and
+            os.path.exists(os.path.join(self.path, filename[:-len(DATA_EXTENSION)] + METADATA_EXTENSION))
+        ]
+
+    def _get_paths(self, key):
+        return (os.path.join(self.path, key + DATA_EXTENSION),
+                os.path.join(self.path, key + METADATA_EXTENSION))
+
+    def _remove(self, key):
+        for path in self._get_paths(key):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _replace_file(path, write):
+    """Write to a temporary file and rename it, so an interrupted write doesn't corrupt the entry
+    and the concurrent reads never see a partial file."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _encode_geometries(df):
+    """Shapely geometries (from the binary format) are stored as WKB."""
+    geom_columns = [
+        column for column in df.columns
+        if df[column].dtype == object and
+        isinstance(next((value for value in df[column] if value is not None), None), BaseGeometry)
+    ]
+
+    if not geom_columns:
+        return df
+
+    df = df.copy()
+    for column in geom_columns:
+        df[column] = df[column].apply(lambda geom: geom.wkb if geom is not None else None)
+
+    return df
@@ -2,6 +2,8 @@
 
 import re
 
+import numpy as np
+
 from unidecode import unidecode
 
 from .utils import dtypes2pg, pg2dtypes, PG_NULL
@@ -176,53 +178,64 @@ def _is_unsupported(value):
     return not re.match(r'^[a-z_]+[a-z_0-9]*$', value)
 
 
-def obtain_converters(columns):
-    converters = {}
+def obtain_parser_dtypes(columns):
+    """Returns the dtypes of the float and text columns for `pd.read_csv`. Integer and boolean
+    columns are inferred by the parser, and date columns are parsed with `parse_dates`."""
+    dtypes = {}
+
+    for column in columns:
+        if column.dbtype in FLOAT_DBTYPES:
+            dtypes[column.name] = 'float64'
+        elif column.dbtype not in INT_DBTYPES + BOOL_DBTYPES + DATETIME_DBTYPES:
+            dtypes[column.name] = str
+
+    return dtypes
+
+
+def obtain_nullable_dtypes(columns):
+    """Returns the nullable dtypes of the integer, boolean and date columns, which
+    don't depend on the presence of null values. The dates are in microseconds."""
+    dtypes = {}
 
     for column in columns:
         if column.dbtype in INT_DBTYPES:
-            converters[column.name] = _convert_int
-        elif column.dbtype in FLOAT_DBTYPES:
-            converters[column.name] = _convert_float
+            dtypes[column.name] = 'Int64'
         elif column.dbtype in BOOL_DBTYPES:
-            converters[column.name] = _convert_bool
-        else:
-            converters[column.name] = _convert_generic
-
-    return converters
+            dtypes[column.name] = 'boolean'
+        elif column.dbtype in DATETIME_DBTYPES:
+            dtypes[column.name] = 'datetime64[us]'
 
+    return dtypes
 
-def date_columns_names(columns):
-    return [x.name for x in columns if x.dbtype in DATETIME_DBTYPES]
 
+def obtain_na_values(columns):
+    na_values = {}
 
-def _convert_int(x):
-    if _is_none_null(x):
-        return None
-    return int(x)
+    for column in columns:
+        if column.dbtype in FLOAT_DBTYPES:
+            na_values[column.name] = [PG_NULL, 'NaN']
+        else:
+            na_values[column.name] = [PG_NULL]
 
+    return na_values
 
-def _convert_float(x):
-    if _is_none_null(x):
-        return None
-    return float(x)
 
+def normalize_null_values(df, columns):
+    """Uses None as the null value of the boolean columns, and of the
+    columns without values, which become object columns."""
+    for column in columns:
+        if column.name not in df or column.dbtype in DATETIME_DBTYPES:
+            continue
 
-def _convert_bool(x):
-    if _is_none_null(x):
-        return None
-    if x == 't':
-        return True
-    if x == 'f':
-        return False
-    return bool(x)
+        nulls = df[column.name].isna()
 
+        if nulls.all():
+            df[column.name] = np.full(len(nulls), None, dtype=object)
+        elif column.dbtype in BOOL_DBTYPES and nulls.any():
+            df[column.name] = df[column.name].astype(object).where(~nulls, None)
 
-def _convert_generic(x):
-    if _is_none_null(x):
-        return None
-    return x
+    return df
 
 
-def _is_none_null(x):
-    return x is None or x == PG_NULL
+def date_columns_names(columns):
+    return [x.name for x in columns if x.dbtype in DATETIME_DBTYPES]
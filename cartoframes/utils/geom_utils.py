@@ -2,7 +2,10 @@ import re
 import json
 import shapely
 import binascii as ba
+import numpy as np
+import pandas as pd
 
+from concurrent.futures import ThreadPoolExecutor
 from geopandas import GeoSeries, GeoDataFrame, points_from_xy
 
 ENC_SHAPELY = 'shapely'
@@ -13,6 +16,8 @@ ENC_WKT = 'wkt'
 ENC_EWKT = 'ewkt'
 SPHERICAL_TOLERANCE = 0.0001
 SIMPLIFY_TOLERANCE = 0.001
+DECODE_BLOCK_SIZE = 1000000
+HILBERT_ORDER = 16
 
 
 def set_geometry(gdf, col, drop=False, inplace=False, crs=None):
@@ -111,7 +116,7 @@ def has_geometry(gdf):
     return hasattr(gdf, '_geometry_column_name') and gdf._geometry_column_name in gdf
 
 
-def decode_geometry(geom_col):
+def decode_geometry(geom_col, workers=None):
     """Decodes a DataFrame column. It detects the geometry encoding and it decodes the column if required.
     Supported geometry encodings are:
 
@@ -122,21 +127,88 @@ def decode_geometry(geom_col):
 
     Args:
         geom_col (array): Column containing the encoded geometry.
+        workers (int, optional): number of threads used to decode large columns. The column is
+            split in blocks of `DECODE_BLOCK_SIZE` rows decoded concurrently (shapely releases
+            the GIL while decoding). Default is None (a single thread).
 
     Example:
         >>> decode_geometry(df['the_geom'])
 
     """
     if geom_col.size > 0:
+        if shapely.__version__ < '2.0':
+            return _decode_geometry_items(geom_col)
+
+        nulls = _null_geometry_mask(geom_col)
         enc_type = None
-        if any(geom_col):
-            first_geom = next(item for item in geom_col if item is not None)
+        if not nulls.all():
+            first_geom = geom_col[~nulls].iloc[0]
             enc_type = detect_encoding_type(first_geom)
-        return GeoSeries(geom_col.apply(lambda g: decode_geometry_item(g, enc_type)))
+        values = _decode_geometry_blocks(geom_col.to_numpy(dtype=object), nulls, enc_type, workers)
+        return GeoSeries(values, index=geom_col.index, name=geom_col.name)
     else:
         return geom_col
 
 
+def _decode_geometry_items(geom_col):
+    enc_type = None
+    if any(geom_col):
+        first_geom = next(item for item in geom_col if item is not None)
+        enc_type = detect_encoding_type(first_geom)
+    return GeoSeries(geom_col.apply(lambda g: decode_geometry_item(g, enc_type)))
+
+
+def _null_geometry_mask(geom_col):
+    values = geom_col.to_numpy(dtype=object)
+    nulls = pd.isna(values)
+    not_nulls = values[~nulls]
+    nulls[~nulls] = (not_nulls == '') | (not_nulls == b'')
+    return nulls
+
+
+def _decode_geometry_blocks(values, nulls, enc_type, workers):
+    if workers is None or workers < 2 or len(values) <= DECODE_BLOCK_SIZE:
+        return _decode_geometry_array(values, nulls, enc_type)
+
+    bounds = range(0, len(values), DECODE_BLOCK_SIZE)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        blocks = executor.map(
+            lambda start: _decode_geometry_array(
+                values[start:start + DECODE_BLOCK_SIZE], nulls[start:start + DECODE_BLOCK_SIZE], enc_type),
+            bounds)
+        return np.concatenate(list(blocks))
+
+
+def _decode_geometry_array(values, nulls, enc_type):
+    """Decode all the non-null geometries of the array at once with the shapely 2 vectorized functions."""
+    result = np.full(len(values), None, dtype=object)
+    geoms = values[~nulls]
+
+    if enc_type in (ENC_WKB, ENC_WKB_HEX):
+        result[~nulls] = shapely.from_wkb(geoms)
+    elif enc_type == ENC_WKB_BHEX:
+        result[~nulls] = shapely.from_wkb(geoms.astype('S').astype('U'))
+    elif enc_type == ENC_WKT:
+        result[~nulls] = shapely.from_wkt(geoms)
+    elif enc_type == ENC_EWKT:
+        result[~nulls] = _load_ewkt_array(geoms)
+    else:
+        result[~nulls] = geoms
+
+    return result
+
+
+def _load_ewkt_array(egeoms):
+    """Load EWKT geometries. The SRIDs are split from the WKT in bulk and set after loading."""
+    parts = pd.Series(egeoms, dtype=object).str.extract(r'^SRID=(\d+);(.*)$', expand=True)
+    has_srid = parts[0].notna().to_numpy()
+
+    wkts = np.where(has_srid, parts[1].to_numpy(dtype=object), egeoms)
+    geoms = shapely.from_wkt(wkts)
+    geoms[has_srid] = shapely.set_srid(geoms[has_srid], parts[0][has_srid].astype(int).to_numpy())
+    return geoms
+
+
 def detect_encoding_type(input_geom):
     """
     Detect geometry encoding type:
@@ -245,6 +317,18 @@ def encode_geometry_ewkb(geom, srid=4326):
         return shapely.wkb.dumps(geom, hex=True, include_srid=True)
 
 
+def encode_geometries_ewkb(geoms, srid=4326):
+    """Vectorized `encode_geometry_ewkb`: the values that aren't geometries become None."""
+    if shapely.__version__ < '2.0':
+        return np.array([encode_geometry_ewkb(geom, srid) for geom in geoms], dtype=object)
+
+    geoms = np.asarray(geoms, dtype=object)
+    result = np.full(len(geoms), None, dtype=object)
+    is_geom = shapely.is_geometry(geoms)
+    result[is_geom] = shapely.to_wkb(shapely.set_srid(geoms[is_geom], srid), hex=True, include_srid=True)
+    return result
+
+
 def to_geojson(geom, buffer_simplify=True):
     if geom is not None and str(geom) != 'GEOMETRYCOLLECTION EMPTY':
         if buffer_simplify and geom.geom_type in ('Polygon', 'MultiPolygon'):
@@ -255,6 +339,52 @@ def to_geojson(geom, buffer_simplify=True):
             return json.dumps(shapely.geometry.mapping(geom), sort_keys=True)
 
 
+def hilbert_sort(gdf):
+    """Returns the GeoDataFrame sorted by the Hilbert curve distance of the centers of the geometries,
+    so nearby geometries are next to each other. The rows without geometry go last."""
+    bounds = gdf.geometry.bounds.to_numpy(dtype=np.float64)
+    x = (bounds[:, 0] + bounds[:, 2]) / 2
+    y = (bounds[:, 1] + bounds[:, 3]) / 2
+
+    return gdf.iloc[np.argsort(hilbert_distances(x, y), kind='stable')]
+
+
+def hilbert_distances(x, y, order=HILBERT_ORDER):
+    """Distances along a Hilbert curve of `order` that covers the extent of the points.
+    The points with NaN coordinates get the maximum distance."""
+    n = 2 ** order
+    nulls = np.isnan(x) | np.isnan(y)
+
+    if nulls.all():
+        return np.zeros(len(x), dtype=np.int64)
+
+    x = _hilbert_cells(x, nulls, n)
+    y = _hilbert_cells(y, nulls, n)
+    distances = np.zeros(len(x), dtype=np.int64)
+
+    s = n // 2
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        distances += s * s * ((3 * rx) ^ ry)
+
+        # Rotate the quadrant
+        flip = ~ry & rx
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+        x, y = np.where(ry, x, y), np.where(ry, y, x)
+        s //= 2
+
+    distances[nulls] = n * n
+    return distances
+
+
+def _hilbert_cells(values, nulls, n):
+    low, high = values[~nulls].min(), values[~nulls].max()
+    scale = (n - 1) / (high - low) if high > low else 0
+    return np.where(nulls, 0, (values - low) * scale).astype(np.int64)
+
+
 def is_reprojection_needed(gdf):
     crs = get_crs(gdf)
     return crs is not None and crs != 'epsg:4326'
@@ -0,0 +1,98 @@
+"""Local journal of the uploaded chunks, used by `to_carto` with `resume=True`"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+
+import appdirs
+import pandas as pd
+
+from .logger import log
+
+JOURNAL_DIR = os.path.join(appdirs.user_cache_dir('cartoframes'), 'uploads')
+JOURNAL_EXTENSION = '.json'
+
+_journal = None
+
+
+def get_journal():
+    global _journal
+
+    if _journal is None:
+        _journal = UploadJournal()
+
+    return _journal
+
+
+class UploadJournal:
+    """Records the row ranges of a DataFrame that have been committed to a table. Every entry
+    is identified by the account, the table, the fingerprint of the DataFrame and the chunk ranges,
+    so a different DataFrame or chunking never reuses the ranges of a previous upload."""
+
+    def __init__(self, path=None):
+        self.path = path or JOURNAL_DIR
+        self._lock = threading.Lock()
+
+    def get_key(self, base_url, table_name, df, chunk_ranges):
+        content = json.dumps([base_url, table_name, get_fingerprint(df), chunk_ranges])
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    def read(self, key):
+        """Returns the committed row ranges as a set of (start, end) tuples."""
+        entry_path = self._get_path(key)
+
+        if not os.path.exists(entry_path):
+            return set()
+
+        with open(entry_path) as f:
+            ranges = set(tuple(row_range) for row_range in json.load(f)['ranges'])
+
+        log.debug('Upload journal: %s (%d committed chunks)', key, len(ranges))
+        return ranges
+
+    def commit(self, key, start, end):
+        """Record the row range [start, end) as committed. It's safe to call from concurrent uploads."""
+        with self._lock:
+            ranges = self.read(key)
+            ranges.add((start, end))
+
+            if not os.path.exists(self.path):
+                os.makedirs(self.path)
+
+            # Write to a unique temporary file and rename it, so an interrupted write doesn't corrupt
+            # the entry, and the uploads of other processes don't write to the same file
+            tmp_file = tempfile.NamedTemporaryFile('w', dir=self.path, suffix='.tmp', delete=False)
+            try:
+                with tmp_file:
+                    json.dump({'ranges': sorted(ranges)}, tmp_file)
+                os.replace(tmp_file.name, self._get_path(key))
+            finally:
+                if os.path.exists(tmp_file.name):
+                    os.remove(tmp_file.name)
+
+    def remove(self, key):
+        entry_path = self._get_path(key)
+        if os.path.exists(entry_path):
+            os.remove(entry_path)
+
+    def _get_path(self, key):
+        return os.path.join(self.path, key + JOURNAL_EXTENSION)
+
+
+def get_fingerprint(df):
+    """Hash of the columns, dtypes and values of the DataFrame."""
+    hasher = hashlib.sha1()
+    hasher.update(json.dumps([[str(column), str(dtype)] for column, dtype in df.dtypes.items()]).encode('utf-8'))
+
+    for column in df.columns:
+        series = df[column]
+        try:
+            hashes = pd.util.hash_pandas_object(series, index=False)
+        except TypeError:
+            # Unhashable values, like dicts or lists
+            hashes = pd.util.hash_pandas_object(series.astype(str), index=False)
+        hasher.update(hashes.to_numpy().tobytes())
+
+    return hasher.hexdigest()
@@ -0,0 +1,111 @@
+"""In-memory cache of the metadata queries of the ContextManager"""
+
+import re
+import time
+import threading
+
+from .logger import log
+
+DEFAULT_METADATA_TTL = 60  # seconds
+DEFAULT_METADATA_MAX_ENTRIES = 1000
+
+# Statements that can change the tables or their columns
+DDL_PATTERN = re.compile(r'\b(CREATE|DROP|ALTER|TRUNCATE|CDB_CartodbfyTable|CDB_RegenerateTable)\b', re.IGNORECASE)
+
+# Kinds of entries that depend on the tables
+TABLE_KINDS = ['exists', 'columns']
+
+_metadata_cache = None
+
+
+def setup_metadata_cache(ttl=None, max_entries=None):
+    '''Update the configuration of the metadata cache, shared by all the operations with the same
+    credentials: the user schema, the existence and columns of the tables and the server capabilities.
+    The table entries are discarded every time cartoframes runs a statement that can change the tables.
+
+    Args:
+        ttl (int, optional): seconds that the metadata is kept. 0 disables the cache. Default is 60.
+        max_entries (int, optional): maximum number of entries kept. When the cache is full, the
+            oldest entries are discarded. Default is 1000.
+
+    '''
+    global _metadata_cache
+
+    _metadata_cache = MetadataCache(ttl=ttl, max_entries=max_entries)
+
+
+def get_metadata_cache():
+    global _metadata_cache
+
+    if _metadata_cache is None:
+        _metadata_cache = MetadataCache()
+
+    return _metadata_cache
+
+
+class MetadataCache:
+    """Stores the results of the metadata queries by credentials, kind and query, for `ttl`
+    seconds and up to `max_entries`. It's safe to use from concurrent operations."""
+
+    def __init__(self, ttl=None, max_entries=None):
+        self.ttl = ttl if ttl is not None else DEFAULT_METADATA_TTL
+        self.max_entries = max_entries if max_entries is not None else DEFAULT_METADATA_MAX_ENTRIES
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, credentials_key, kind, key, compute):
+        """Returns the cached value, or the result of `compute()` that is cached.
+        The exceptions of `compute` are not cached."""
+        if self.ttl <= 0:
+            return compute()
+
+        entry_key = (credentials_key, kind, key)
+
+        with self._lock:
+            entry = self._entries.get(entry_key)
+
+        if entry is not None and entry[1] > time.monotonic():
+            log.debug('Metadata cache hit: %s', kind)
+            return entry[0]
+
+        value = compute()
+
+        with self._lock:
+            self._set(entry_key, value)
+
+        return value
+
+    def invalidate(self, credentials_key, kinds=None):
+        """Discard the entries of the credentials, or only the ones of `kinds`."""
+        with self._lock:
+            for entry_key in list(self._entries):
+                if entry_key[0] == credentials_key and (kinds is None or entry_key[1] in kinds):
+                    del self._entries[entry_key]
+
+    def invalidate_query(self, credentials_key, query):
+        """Discard the table entries of the credentials if the query can change the tables."""
+        if DDL_PATTERN.search(query):
+            log.debug('Metadata cache invalidation')
+            self.invalidate(credentials_key, TABLE_KINDS)
+
+    def _set(self, entry_key, value):
+        """Add the entry, discarding the expired entries and the oldest ones when the cache is full.
+        All the entries have the same TTL, so they are in the order they expire."""
+        now = time.monotonic()
+        self._entries.pop(entry_key, None)
+
+        while self._entries:
+            oldest_key = next(iter(self._entries))
+            if self._entries[oldest_key][1] > now and len(self._entries) < self.max_entries:
+                break
+            del self._entries[oldest_key]
+
+        self._entries[entry_key] = (value, now + self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def get_credentials_key(credentials):
+    return (credentials.base_url, credentials.api_key)
@@ -1,4 +1,8 @@
+import pytest
+
 from cartoframes.utils import setup_metrics
+from cartoframes.auth.rate_limit import clear_rate_limiters
+from cartoframes.utils.metadata_cache import get_metadata_cache
 
 
 def pytest_configure(config):
@@ -28,3 +32,19 @@ def pytest_unconfigure(config):
     """
     called before test process is exited.
     """
+
+
+@pytest.fixture(autouse=True)
+def clear_metadata_cache():
+    """
+    The metadata cached by a test, with mocked queries, is not used by the next tests.
+    """
+    get_metadata_cache().clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_rate_limits():
+    """
+    The rate limits of the mocked responses of a test are not applied to the next tests.
+    """
+    clear_rate_limiters()
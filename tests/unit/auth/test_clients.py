@@ -0,0 +1,54 @@
+"""Unit tests for cartoframes.auth.clients"""
+
+import requests
+
+from cartoframes.auth import Credentials
+from cartoframes.auth.clients import ClientRegistry, create_session
+from cartoframes.io.managers.context_manager import ContextManager
+
+
+class TestClientRegistry(object):
+
+    def setup_method(self):
+        self.credentials = Credentials('fake_user', 'fake_api')
+
+    def test_get_auth_client(self):
+        # Given
+        registry = ClientRegistry()
+
+        # When
+        auth_client = registry.get_auth_client(self.credentials)
+        same_auth_client = registry.get_auth_client(Credentials('fake_user', 'fake_api'))
+        public_auth_client = registry.get_auth_client(self.credentials, public=True)
+
+        # Then
+        assert auth_client is same_auth_client
+        assert auth_client.api_key == 'fake_api'
+        assert public_auth_client.api_key == 'default_public'
+        assert public_auth_client.session is auth_client.session is registry.session
+
+    def test_get_auth_client_with_session(self):
+        # Given
+        registry = ClientRegistry()
+        session = requests.Session()
+
+        # When
+        auth_client = registry.get_auth_client(Credentials('fake_user', 'fake_api', session=session))
+
+        # Then
+        assert auth_client.session is session
+        assert auth_client is not registry.get_auth_client(self.credentials)
+
+    def test_create_session(self):
+        session = create_session(pool_size=8)
+
+        adapter = session.get_adapter('https://fake_user.carto.com')
+        assert adapter._pool_connections == 8
+        assert adapter._pool_maxsize == 8
+
+    def test_context_managers_share_clients(self):
+        cm = ContextManager(self.credentials)
+        other_cm = ContextManager(Credentials('fake_user', 'fake_api'))
+
+        assert cm.auth_client is other_cm.auth_client
+        assert cm.auth_client is self.credentials.get_api_key_auth_client()
@@ -0,0 +1,286 @@
+"""Unit tests for cartoframes.auth.rate_limit"""
+
+import pytest
+import requests
+
+from carto.auth import APIKeyAuthClient
+from carto.exceptions import CartoException, CartoRateLimitException
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from cartoframes.auth.clients import RateLimitedAuthClient
+from cartoframes.auth.rate_limit import (RateLimiter, get_rate_limiter, backoff_delay, is_transient_error,
+                                         is_connect_error, is_idempotent, is_replayable)
+
+
+class ResponseMock(object):
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = ''
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def rate_limit_headers(limit, remaining, reset, retry_after=None):
+    headers = {
+        'Carto-Rate-Limit-Limit': str(limit),
+        'Carto-Rate-Limit-Remaining': str(remaining),
+        'Carto-Rate-Limit-Reset': str(reset)
+    }
+    if retry_after is not None:
+        headers['Retry-After'] = str(retry_after)
+    return headers
+
+
+class TestRateLimiter(object):
+
+    def test_acquire_without_limits(self, mocker):
+        # Given
+        sleep_mock = mocker.patch('time.sleep')
+        rate_limiter = RateLimiter()
+
+        # When
+        for _ in range(100):
+            rate_limiter.acquire()
+
+        # Then
+        sleep_mock.assert_not_called()
+
+    def test_update_from_headers(self):
+        # Given
+        rate_limiter = RateLimiter()
+
+        # When
+        rate_limiter.update_from_headers(rate_limit_headers(10, 6, 2))
+
+        # Then
+        assert rate_limiter.capacity == 10
+        assert rate_limiter.tokens == 6
+        assert rate_limiter.rate == 2
+
+    def test_update_from_headers_without_limits(self):
+        # Given
+        rate_limiter = RateLimiter()
+
+        # When
+        rate_limiter.update_from_headers({'Content-Type': 'application/json'})
+
+        # Then
+        assert rate_limiter.tokens is None
+
+    def test_acquire_spaces_the_requests_at_the_rate(self, mocker):
+        # Given
+        mocker.patch('time.monotonic', return_value=100)
+        sleep_mock = mocker.patch('time.sleep')
+        rate_limiter = RateLimiter()
+        rate_limiter.update(10, 1, 9)
+
+        # When
+        for _ in range(3):
+            rate_limiter.acquire()
+
+        # Then
+        assert [call[0][0] for call in sleep_mock.call_args_list] == [1, 2]
+
+    def test_acquire_after_rate_limited(self, mocker):
+        # Given
+        mocker.patch('time.monotonic', return_value=100)
+        sleep_mock = mocker.patch('time.sleep')
+        rate_limiter = RateLimiter()
+
+        # When
+        rate_limiter.update(10, 0, 10, retry_after=3)
+        rate_limiter.acquire()
+
+        # Then
+        sleep_mock.assert_called_once_with(3)
+
+    def test_refill(self, mocker):
+        # Given
+        monotonic_mock = mocker.patch('time.monotonic', return_value=100)
+        sleep_mock = mocker.patch('time.sleep')
+        rate_limiter = RateLimiter()
+        rate_limiter.update(10, 0, 5)
+
+        # When
+        monotonic_mock.return_value = 102
+        rate_limiter.acquire()
+
+        # Then
+        sleep_mock.assert_not_called()
+        assert rate_limiter.tokens == 3
+
+    def test_get_rate_limiter_by_endpoint(self):
+        # When
+        sql_limiter = get_rate_limiter('https://fake_user.carto.com', 'api/v2/sql')
+        copy_limiter = get_rate_limiter('https://fake_user.carto.com', 'api/v2/sql/copyfrom?q=COPY')
+        job_limiter = get_rate_limiter('https://fake_user.carto.com',
+                                       'api/v2/sql/job/f5e7d4b1-8c8a-4b8e-9b7a-1e3c2d4f5a6b')
+
+        # Then
+        assert sql_limiter is get_rate_limiter('https://fake_user.carto.com', 'api/v2/sql')
+        assert copy_limiter is get_rate_limiter('https://fake_user.carto.com', 'api/v2/sql/copyfrom?q=COPY 2')
+        assert job_limiter is get_rate_limiter('https://fake_user.carto.com', 'api/v2/sql/job/')
+        assert sql_limiter is not copy_limiter
+        assert sql_limiter is not get_rate_limiter('https://other_user.carto.com', 'api/v2/sql')
+
+
+class TestRetries(object):
+
+    def test_backoff_delay(self):
+        for attempt in range(10):
+            assert 0 <= backoff_delay(attempt) <= min(30, 0.5 * 2 ** attempt)
+
+    def test_is_transient_error(self):
+        assert is_transient_error(CartoException(requests.exceptions.ConnectionError('reset')))
+        assert is_transient_error(CartoException(CartoException(requests.exceptions.ConnectionError('reset'))))
+        assert not is_transient_error(CartoException(requests.exceptions.ReadTimeout('timeout')))
+        assert not is_transient_error(CartoException('syntax error'))
+
+    def test_is_connect_error(self):
+        new_connection_error = MaxRetryError(None, '/api/v2/sql', NewConnectionError(None, 'refused'))
+        assert is_connect_error(CartoException(requests.exceptions.ConnectionError(new_connection_error)))
+        assert is_connect_error(CartoException(requests.exceptions.ConnectTimeout('timeout')))
+        assert not is_connect_error(CartoException(requests.exceptions.ConnectionError('reset')))
+        assert not is_connect_error(CartoException('syntax error'))
+
+    def test_is_idempotent(self):
+        assert is_idempotent('GET')
+        assert not is_idempotent('post')
+
+    def test_is_replayable(self):
+        assert is_replayable({'json': {'q': 'SELECT 1'}})
+        assert is_replayable({'data': b'data'})
+        assert not is_replayable({'data': iter([b'data'])})
+
+
+class TestRateLimitedAuthClient(object):
+
+    def setup_method(self):
+        self.auth_client = RateLimitedAuthClient('https://fake_user.carto.com', 'fake_api')
+
+    def test_send_updates_the_rate_limiter(self, mocker):
+        # Given
+        mocker.patch.object(APIKeyAuthClient, 'send', return_value=ResponseMock(headers=rate_limit_headers(10, 5, 1)))
+
+        # When
+        self.auth_client.send('api/v2/sql', 'POST', json={'q': 'SELECT 1'})
+
+        # Then
+        assert get_rate_limiter('https://fake_user.carto.com', 'api/v2/sql').tokens == 5
+
+    def test_send_retries_rate_limited_requests(self, mocker):
+        # Given
+        mocker.patch('time.sleep')
+        response = ResponseMock()
+        send_mock = mocker.patch.object(APIKeyAuthClient, 'send', side_effect=[
+            CartoRateLimitException(ResponseMock(429, rate_limit_headers(10, 0, 10, retry_after=2))),
+            response
+        ])
+
+        # When
+        result = self.auth_client.send('api/v2/sql', 'POST', json={'q': 'SELECT 1'})
+
+        # Then
+        assert result is response
+        assert send_mock.call_count == 2
+        assert get_rate_limiter('https://fake_user.carto.com', 'api/v2/sql').blocked_until > 0
+
+    def test_send_retries_transient_errors(self, mocker):
+        # Given
+        mocker.patch('time.sleep')
+        bad_gateway = ResponseMock(502)
+        response = ResponseMock()
+        send_mock = mocker.patch.object(APIKeyAuthClient, 'send', side_effect=[
+            CartoException(requests.exceptions.ConnectionError('reset')),
+            bad_gateway,
+            response
+        ])
+
+        # When
+        result = self.auth_client.send('api/v2/sql/job/f5e7d4b1-8c8a-4b8e-9b7a-1e3c2d4f5a6b', 'GET')
+
+        # Then
+        assert result is response
+        assert send_mock.call_count == 3
+        assert bad_gateway.closed
+
+    def test_send_retries_connect_errors(self, mocker):
+        # Given
+        mocker.patch('time.sleep')
+        response = ResponseMock()
+        send_mock = mocker.patch.object(APIKeyAuthClient, 'send', side_effect=[
+            CartoException(requests.exceptions.ConnectTimeout('timeout')),
+            response
+        ])
+
+        # When
+        result = self.auth_client.send('api/v2/sql', 'POST', json={'q': 'INSERT INTO t VALUES (1)'})
+
+        # Then
+        assert result is response
+        assert send_mock.call_count == 2
+
+    def test_send_does_not_retry_writes(self, mocker):
+        # Given
+        mocker.patch('time.sleep')
+        send_mock = mocker.patch.object(APIKeyAuthClient, 'send', side_effect=[
+            CartoException(requests.exceptions.ConnectionError('reset')),
+            ResponseMock()
+        ])
+
+        # When
+        with pytest.raises(CartoException):
+            self.auth_client.send('api/v2/sql', 'POST', json={'q': 'INSERT INTO t VALUES (1)'})
+
+        # Then
+        assert send_mock.call_count == 1
+
+    def test_send_does_not_retry_writes_bad_gateway(self, mocker):
+        # Given
+        send_mock = mocker.patch.object(APIKeyAuthClient, 'send', return_value=ResponseMock(502))
+
+        # When
+        result = self.auth_client.send('api/v2/sql/job', 'POST', json={'query': 'SELECT 1'})
+
+        # Then
+        assert result.status_code == 502
+        assert send_mock.call_count == 1
+
+    def test_send_max_retries(self, mocker):
+        # Given
+        mocker.patch('time.sleep')
+        send_mock = mocker.patch.object(APIKeyAuthClient, 'send', return_value=ResponseMock(503))
+
+        # When
+        result = self.auth_client.send('api/v2/sql', 'GET', params={'q': 'SELECT 1'})
+
+        # Then
+        assert result.status_code == 503
+        assert send_mock.call_count == 4
+
+    def test_send_does_not_retry_streamed_data(self, mocker):
+        # Given
+        mocker.patch('time.sleep')
+        send_mock = mocker.patch.object(APIKeyAuthClient, 'send', side_effect=CartoException(
+            requests.exceptions.ConnectionError('reset')))
+
+        # When
+        with pytest.raises(CartoException):
+            self.auth_client.send('api/v2/sql/copyfrom', 'POST', data=iter([b'data']))
+
+        # Then
+        assert send_mock.call_count == 1
+
+    def test_send_does_not_retry_other_errors(self, mocker):
+        # Given
+        send_mock = mocker.patch.object(APIKeyAuthClient, 'send', side_effect=CartoException('syntax error'))
+
+        # When
+        with pytest.raises(CartoException):
+            self.auth_client.send('api/v2/sql', 'POST', json={'q': 'SELECT 1'})
+
+        # Then
+        assert send_mock.call_count == 1
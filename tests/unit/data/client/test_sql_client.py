@@ -106,6 +106,15 @@ class TestSQLClient(object):
         assert output == SQL_BATCH_RESPONSE
         mock.assert_called_once_with('query')
 
+    def test_execute_many(self, mocker):
+        """client.SQLClient.execute_many"""
+        mock = mocker.patch.object(ContextManager, 'execute_long_running_queries',
+                                   return_value=[SQL_BATCH_RESPONSE, SQL_BATCH_RESPONSE])
+        output = SQLClient(self.credentials).execute_many([' query_1 ', 'query_2'], timeout=60)
+
+        assert output == [SQL_BATCH_RESPONSE, SQL_BATCH_RESPONSE]
+        mock.assert_called_once_with(['query_1', 'query_2'], 60)
+
     def test_distinct(self, mocker):
         """client.SQLClient.distinct"""
         mock = mocker.patch.object(ContextManager, 'execute_query', return_value=SQL_DISTINCT_RESPONSE)
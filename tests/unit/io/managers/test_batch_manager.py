@@ -0,0 +1,161 @@
+"""Unit tests for cartoframes.io.managers.batch_manager"""
+
+import time
+import threading
+
+from concurrent.futures import TimeoutError
+
+import pytest
+import requests
+
+from carto.exceptions import CartoException
+
+from cartoframes.io.managers.batch_manager import BatchJobManager
+
+
+class FakeBatchSQLClient(object):
+    """Jobs that are finished after being read `reads` times. The first reads of a job raise its `errors`"""
+
+    def __init__(self, reads, status='done', errors=None):
+        self.reads = reads
+        self.status = status
+        self.errors = errors or {}
+        self.read_jobs = []
+        self.canceled_jobs = []
+        self._lock = threading.Lock()
+
+    def create(self, query):
+        return {'job_id': query, 'status': 'pending' if self.reads.get(query) else self.status}
+
+    def read(self, job_id):
+        with self._lock:
+            self.read_jobs.append(job_id)
+            if self.errors.get(job_id):
+                raise self.errors[job_id].pop(0)
+            pending = self.read_jobs.count(job_id) < self.reads[job_id]
+        return {'job_id': job_id, 'status': 'running' if pending else self.status}
+
+    def cancel(self, job_id):
+        self.canceled_jobs.append(job_id)
+        return 'cancelled'
+
+
+class TestBatchJobManager(object):
+
+    def test_submit(self):
+        # Given
+        client = FakeBatchSQLClient({'job_1': 1, 'job_2': 3})
+        manager = BatchJobManager(client, min_interval=0.01, max_interval=0.01)
+
+        # When
+        futures = [manager.submit('job_1'), manager.submit('job_2')]
+        result = manager.wait(futures, timeout=5)
+
+        # Then
+        assert [future.job_id for future in futures] == ['job_1', 'job_2']
+        assert result == [{'job_id': 'job_1', 'status': 'done'}, {'job_id': 'job_2', 'status': 'done'}]
+        assert client.read_jobs.count('job_1') == 1
+        assert client.read_jobs.count('job_2') == 3
+
+    def test_submit_finished(self):
+        client = FakeBatchSQLClient({})
+        manager = BatchJobManager(client)
+
+        assert manager.submit('job_1').result() == {'job_id': 'job_1', 'status': 'done'}
+        assert client.read_jobs == []
+
+    def test_submit_failed(self):
+        # Given
+        client = FakeBatchSQLClient({'job_1': 2}, status='failed')
+        manager = BatchJobManager(client, min_interval=0.01)
+
+        # When
+        with pytest.raises(CartoException) as e:
+            manager.wait([manager.submit('job_1')], timeout=5)
+
+        # Then
+        assert str(e.value) == "Batch SQL job failed with result: {'job_id': 'job_1', 'status': 'failed'}"
+
+    def test_submit_timeout(self):
+        # Given
+        client = FakeBatchSQLClient({'job_1': 1000})
+        manager = BatchJobManager(client, min_interval=0.01, max_interval=0.01)
+
+        # When
+        future = manager.submit('job_1', timeout=0.05)
+        with pytest.raises(TimeoutError):
+            future.result(timeout=5)
+
+        # Then
+        assert client.canceled_jobs == ['job_1']
+
+    def test_submit_read_connection_error(self):
+        # Given
+        error = CartoException(requests.exceptions.ConnectionError('Connection reset'))
+        client = FakeBatchSQLClient({'job_1': 3}, errors={'job_1': [error, error]})
+        manager = BatchJobManager(client, min_interval=0.01, max_interval=0.01)
+
+        # When
+        result = manager.wait([manager.submit('job_1')], timeout=5)
+
+        # Then
+        assert result == [{'job_id': 'job_1', 'status': 'done'}]
+        assert client.read_jobs.count('job_1') == 3
+
+    def test_submit_read_errors(self):
+        # Given
+        connection_error = CartoException(requests.exceptions.ConnectionError('Connection reset'))
+        client = FakeBatchSQLClient({'job_1': 1000, 'job_2': 1000}, errors={
+            'job_1': [CartoException('Job not found')],
+            'job_2': [connection_error] * 3
+        })
+        manager = BatchJobManager(client, min_interval=0.01, max_interval=0.01, max_read_errors=2)
+
+        # When
+        futures = [manager.submit('job_1'), manager.submit('job_2')]
+
+        # Then
+        assert str(futures[0].exception(timeout=5)) == 'Job not found'
+        assert futures[1].exception(timeout=5) is connection_error
+        assert client.read_jobs.count('job_1') == 1
+        assert client.read_jobs.count('job_2') == 3
+
+    def test_cancel(self):
+        # Given
+        client = FakeBatchSQLClient({'job_1': 1000})
+        manager = BatchJobManager(client, min_interval=0.01, max_interval=0.01)
+        future = manager.submit('job_1')
+
+        # When
+        canceled = future.cancel()
+        manager._poller.join(5)
+
+        # Then
+        assert canceled
+        assert client.canceled_jobs == ['job_1']
+
+    def test_backoff(self):
+        # Given
+        client = FakeBatchSQLClient({'job_1': 1000})
+        manager = BatchJobManager(client, min_interval=0.01, max_interval=0.04, backoff=2)
+        future = manager.submit('job_1')
+
+        # When
+        while len(client.read_jobs) < 4:
+            time.sleep(0.001)
+        interval = manager._interval
+        future.cancel()
+
+        # Then
+        assert interval == 0.04
+
+    def test_wait_timeout(self):
+        client = FakeBatchSQLClient({'job_1': 1000})
+        manager = BatchJobManager(client, min_interval=0.01, max_interval=0.01)
+        future = manager.submit('job_1')
+
+        with pytest.raises(TimeoutError) as e:
+            manager.wait([future], timeout=0.05)
+        future.cancel()
+
+        assert str(e.value) == '1 Batch SQL jobs are not finished.'
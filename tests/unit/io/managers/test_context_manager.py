@@ -1,15 +1,28 @@
+import io
+import time
+import hashlib
+
 from collections import namedtuple
 
 import pytest
+import requests
+import numpy as np
+
+from urllib3.exceptions import MaxRetryError, NewConnectionError
 
 from carto.datasets import DatasetManager
 from carto.sql import SQLClient, BatchSQLClient, CopySQLClient
-from carto.exceptions import CartoRateLimitException
+from carto.exceptions import CartoException, CartoRateLimitException
+from pyrestcli.exceptions import BadRequestException
 
-from pandas import DataFrame
+from pandas import DataFrame, Timestamp
 from geopandas import GeoDataFrame
+from shapely.geometry import Point
 from cartoframes.auth import Credentials
-from cartoframes.io.managers.context_manager import ContextManager, DEFAULT_RETRY_TIMES, retry_copy
+from cartoframes.io.managers.context_manager import ContextManager, DEFAULT_RETRY_TIMES, retry_copy, \
+    _compute_copy_data, _pipeline_copy_data, _encode_copy_block, _upsert_query, _delete_rows_query, \
+    _compute_row_hashes, _row_hash_expression, _bulk_load_query, encode_copy_data, get_chunk_ranges, \
+    COPY_MAX_BUFFER_SIZE, get_index_statements
 from cartoframes.utils.columns import ColumnInfo
 
 
@@ -30,6 +43,67 @@ class TestContextManager(object):
         # Then
         mock.assert_called_once_with('query', True, True, None)
 
+    def test_execute_long_running_queries(self, mocker):
+        # Given
+        mocker.patch('cartoframes.io.managers.context_manager._create_auth_client')
+        mocker.patch.object(BatchSQLClient, 'create', side_effect=lambda query: {'job_id': query, 'status': 'done'})
+        mock_invalidate = mocker.patch('cartoframes.utils.metadata_cache.MetadataCache.invalidate')
+
+        # When
+        cm = ContextManager(self.credentials)
+        result = cm.execute_long_running_queries(['SELECT 1', 'DROP TABLE t'])
+
+        # Then
+        assert result == [{'job_id': 'SELECT 1', 'status': 'done'}, {'job_id': 'DROP TABLE t', 'status': 'done'}]
+        mock_invalidate.assert_called_once()
+
+    def test_get_schema_cached(self, mocker):
+        # Given
+        mocker.patch('cartoframes.io.managers.context_manager._create_auth_client')
+        mock = mocker.patch.object(SQLClient, 'send', return_value={'rows': [{'current_schema': 'schema'}]})
+
+        # When
+        schema = ContextManager(self.credentials).get_schema()
+        cached_schema = ContextManager(self.credentials).get_schema()
+
+        # Then
+        assert schema == cached_schema == 'schema'
+        mock.assert_called_once_with('SELECT current_schema()', True, False, None)
+
+    def test_has_table_invalidated_by_ddl(self, mocker):
+        # Given
+        mocker.patch('cartoframes.io.managers.context_manager._create_auth_client')
+        mocker.patch.object(ContextManager, 'get_schema', return_value='schema')
+        not_found = CartoException(BadRequestException('relation "table_name" does not exist', 400))
+        mock = mocker.patch.object(SQLClient, 'send', side_effect=[not_found, {}, {}, {}])
+        cm = ContextManager(self.credentials)
+
+        # When
+        before = cm.has_table('table_name')
+        cached = cm.has_table('table_name')
+        cm.execute_query('CREATE TABLE table_name (a int)')
+        after = cm.has_table('table_name')
+
+        # Then
+        assert (before, cached, after) == (False, False, True)
+        assert mock.call_count == 3
+
+    def test_has_table_errors_not_cached(self, mocker):
+        # Given
+        mocker.patch('cartoframes.io.managers.context_manager._create_auth_client')
+        mocker.patch.object(ContextManager, 'get_schema', return_value='schema')
+        connection_error = CartoException(requests.exceptions.ConnectionError('reset'))
+        mock = mocker.patch.object(SQLClient, 'send', side_effect=[connection_error, {}])
+        cm = ContextManager(self.credentials)
+
+        # When
+        failed = cm.has_table('table_name')
+        retried = cm.has_table('table_name')
+
+        # Then
+        assert (failed, retried) == (False, True)
+        assert mock.call_count == 2
+
     def test_execute_long_running_query(self, mocker):
         # Given
         mocker.patch('cartoframes.io.managers.context_manager._create_auth_client')
@@ -57,6 +131,378 @@ class TestContextManager(object):
         # Then
         mock.assert_called_once_with('SELECT "A" FROM (__query__) _q', columns, 3)
 
+    def test_copy_to_binary(self, mocker):
+        # Given
+        query = '__query__'
+        columns = [
+            ColumnInfo('A', 'a', 'bigint', False),
+            ColumnInfo('the_geom', 'the_geom', 'geometry', True),
+            ColumnInfo('the_geom_webmercator', 'the_geom_webmercator', 'geometry', True)
+        ]
+        mocker.patch.object(ContextManager, 'compute_query', return_value=query)
+        mocker.patch.object(ContextManager, '_get_query_columns_info', return_value=columns)
+        mock = mocker.patch.object(ContextManager, '_copy_to_binary')
+
+        # When
+        cm = ContextManager(self.credentials)
+        cm.copy_to(query, format='binary')
+
+        # Then
+        mock.assert_called_once_with(
+            'SELECT "A"::int8 AS "A",ST_AsBinary("the_geom") AS "the_geom" FROM (__query__) _q', columns, 3)
+
+    def test_copy_to_wrong_format(self):
+        # When
+        with pytest.raises(ValueError) as e:
+            cm = ContextManager(self.credentials)
+            cm.copy_to('__query__', format='xml')
+
+        # Then
+        assert str(e.value) == 'Wrong COPY format. Valid formats are: csv, binary.'
+
+    def test_copy_to_pushdown(self, mocker):
+        # Given
+        query = '__query__'
+        columns = [
+            ColumnInfo('cartodb_id', 'cartodb_id', 'integer', False),
+            ColumnInfo('name', 'name', 'text', False),
+            ColumnInfo('pop', 'pop', 'integer', False),
+            ColumnInfo('the_geom', 'the_geom', 'geometry', True),
+            ColumnInfo('the_geom_webmercator', 'the_geom_webmercator', 'geometry', True)
+        ]
+        mocker.patch.object(ContextManager, 'compute_query', return_value=query)
+        mocker.patch.object(ContextManager, '_get_query_columns_info', return_value=columns)
+        mock = mocker.patch.object(ContextManager, '_copy_to')
+
+        # When
+        cm = ContextManager(self.credentials)
+        cm.copy_to(query, columns=['name'], where='pop > 10', bbox=(-4, 40, -3, 41), simplify_tolerance=0.01)
+
+        # Then
+        mock.assert_called_once_with(
+            'SELECT "name","the_geom" FROM ('
+            'SELECT "name",ST_SimplifyPreserveTopology("the_geom", 0.01) AS "the_geom" FROM (__query__) _q '
+            'WHERE (pop > 10) AND "the_geom" && ST_MakeEnvelope(-4, 40, -3, 41, 4326)) _q',
+            [columns[1], columns[3]], 3)
+
+    def test_copy_to_pushdown_parallel(self, mocker):
+        # Given
+        query = '__query__'
+        columns = [
+            ColumnInfo('cartodb_id', 'cartodb_id', 'integer', False),
+            ColumnInfo('name', 'name', 'text', False)
+        ]
+        mocker.patch.object(ContextManager, 'compute_query', return_value=query)
+        mocker.patch.object(ContextManager, '_get_query_columns_info', return_value=columns)
+        mock_bounds = mocker.patch.object(ContextManager, 'execute_query',
+                                          return_value={'rows': [{'min': 1, 'max': 100}]})
+
+        def copy_to(copy_query, columns, retry_times):
+            return DataFrame({'name': [copy_query.count('AND')]})
+        mock = mocker.patch.object(ContextManager, '_copy_to', side_effect=copy_to)
+
+        # When
+        cm = ContextManager(self.credentials)
+        df = cm.copy_to(query, columns=['name'], parallel=2)
+
+        # Then
+        pushdown_query = 'SELECT "cartodb_id","name" FROM (__query__) _q'
+        mock_bounds.assert_called_once_with(
+            'SELECT MIN("cartodb_id") AS min, MAX("cartodb_id") AS max FROM ({}) _q'.format(pushdown_query),
+            do_post=False)
+        mock.assert_any_call(
+            'SELECT "name" FROM ({}) _q WHERE ("cartodb_id" < 51 OR "cartodb_id" IS NULL)'.format(pushdown_query),
+            [columns[1]], retry_times=3)
+        mock.assert_any_call(
+            'SELECT "name" FROM ({}) _q WHERE "cartodb_id" >= 51'.format(pushdown_query),
+            [columns[1]], retry_times=3)
+        assert df.columns.tolist() == ['name']
+
+    def test_copy_to_pushdown_geometry(self, mocker):
+        # Given
+        query = '__query__'
+        columns = [
+            ColumnInfo('cartodb_id', 'cartodb_id', 'integer', False),
+            ColumnInfo('the_geom', 'the_geom', 'geometry', True)
+        ]
+        mocker.patch.object(ContextManager, 'compute_query', return_value=query)
+        mocker.patch.object(ContextManager, '_get_query_columns_info', return_value=columns)
+        mock = mocker.patch.object(ContextManager, '_copy_to')
+
+        # When
+        cm = ContextManager(self.credentials)
+        cm.copy_to(query, geometry=Point(1, 2))
+
+        # Then
+        mock.assert_called_once_with(
+            'SELECT "cartodb_id","the_geom" FROM ('
+            'SELECT "cartodb_id","the_geom" FROM (__query__) _q '
+            'WHERE ST_Intersects("the_geom", ST_GeomFromText(\'POINT (1 2)\', 4326))) _q',
+            columns, 3)
+
+    def test_copy_to_pushdown_wrong_columns(self, mocker):
+        # Given
+        columns = [ColumnInfo('cartodb_id', 'cartodb_id', 'integer', False)]
+        mocker.patch.object(ContextManager, 'compute_query', return_value='__query__')
+        mocker.patch.object(ContextManager, '_get_query_columns_info', return_value=columns)
+
+        # When
+        with pytest.raises(ValueError) as e:
+            cm = ContextManager(self.credentials)
+            cm.copy_to('__query__', columns=['name', 'pop'])
+
+        # Then
+        assert str(e.value) == 'Wrong columns. "name", "pop" not found in the source.'
+
+    def test_copy_to_pushdown_wrong_spatial_filter(self, mocker):
+        # Given
+        columns = [ColumnInfo('cartodb_id', 'cartodb_id', 'integer', False)]
+        mocker.patch.object(ContextManager, 'compute_query', return_value='__query__')
+        mocker.patch.object(ContextManager, '_get_query_columns_info', return_value=columns)
+
+        # When
+        with pytest.raises(ValueError) as e:
+            cm = ContextManager(self.credentials)
+            cm.copy_to('__query__', bbox=(0, 0, 1, 1))
+
+        # Then
+        assert str(e.value) == 'Wrong spatial filter. The source has no geometry column.'
+
+    def test_copy_to_cache(self, mocker):
+        # Given
+        df = DataFrame({'cartodb_id': [1]})
+        columns = [ColumnInfo('cartodb_id', 'cartodb_id', 'integer', False)]
+        mocker.patch.object(ContextManager, 'compute_query', return_value='__query__')
+        mocker.patch.object(ContextManager, '_get_query_columns_info', return_value=columns)
+        mocker.patch.object(ContextManager, 'get_updated_at', return_value='2021-01-01T00:00:00Z')
+        copy_mock = mocker.patch.object(ContextManager, '_copy_to', return_value=df)
+        cache_mock = mocker.patch('cartoframes.io.managers.context_manager.get_cache').return_value
+        cache_mock.get_key.return_value = '__key__'
+        cache_mock.read.return_value = None
+
+        # When
+        cm = ContextManager(self.credentials)
+        result = cm.copy_to('__query__', cache=True)
+
+        # Then
+        cache_mock.get_key.assert_called_once_with('https://fake_user.carto.com', '__query__', None, 'csv', None)
+        cache_mock.read.assert_called_once_with('__key__', '2021-01-01T00:00:00Z', None)
+        copy_mock.assert_called_once_with('SELECT "cartodb_id" FROM (__query__) _q', columns, 3)
+        cache_mock.write.assert_called_once_with('__key__', '2021-01-01T00:00:00Z', df)
+        assert result is df
+
+    def test_get_updated_at(self, mocker):
+        # Given
+        mock = mocker.patch.object(SQLClient, 'send', return_value={'rows': [{'updated_at': '2021-01-01T00:00:00Z'}]})
+
+        # When
+        cm = ContextManager(self.credentials)
+        updated_at = cm.get_updated_at('__query__')
+
+        # Then
+        mock.assert_called_once_with(
+            'SELECT MAX(updated_at) AS updated_at FROM CDB_QueryTables_Updated_At($q$__query__$q$)',
+            True, True, None)
+        assert updated_at == '2021-01-01T00:00:00Z'
+
+    def test_copy_to_cache_hit(self, mocker):
+        # Given
+        df = DataFrame({'cartodb_id': [1]})
+        mocker.patch.object(ContextManager, 'compute_query', return_value='__query__')
+        mocker.patch.object(ContextManager, '_get_query_columns_info', return_value=[])
+        mocker.patch.object(ContextManager, 'get_updated_at', return_value='2021-01-01T00:00:00Z')
+        copy_mock = mocker.patch.object(ContextManager, '_copy_to')
+        cache_mock = mocker.patch('cartoframes.io.managers.context_manager.get_cache').return_value
+        cache_mock.read.return_value = df
+
+        # When
+        cm = ContextManager(self.credentials)
+        result = cm.copy_to('__query__', cache=True)
+
+        # Then
+        copy_mock.assert_not_called()
+        cache_mock.write.assert_not_called()
+        assert result is df
+
+    def test_copy_to_pyarrow(self, mocker):
+        # Given
+        pytest.importorskip('pyarrow')
+        columns = [
+            ColumnInfo('cartodb_id', 'cartodb_id', 'integer', False),
+            ColumnInfo('the_geom', 'the_geom', 'geometry', True)
+        ]
+        mocker.patch.object(ContextManager, 'compute_query', return_value='__query__')
+        mocker.patch.object(ContextManager, '_get_query_columns_info', return_value=columns)
+        mocker.patch.object(CopySQLClient, 'copyto_stream', return_value=io.BytesIO(
+            b'cartodb_id,the_geom\n1,0101\n__null,__null\n'))
+
+        # When
+        cm = ContextManager(self.credentials)
+        df = cm.copy_to('__query__', dtype_backend='pyarrow')
+
+        # Then
+        assert str(df['cartodb_id'].dtype) == 'int64[pyarrow]'
+        assert str(df['the_geom'].dtype) == 'string[pyarrow]'
+        assert df['cartodb_id'].isna().tolist() == [False, True]
+
+    def test_copy_to_pyarrow_binary(self, mocker):
+        # When
+        with pytest.raises(ValueError) as e:
+            cm = ContextManager(self.credentials)
+            cm.copy_to('__query__', format='binary', dtype_backend='pyarrow')
+
+        # Then
+        assert str(e.value) == 'Arrow-backed output is only available with the csv format without chunks.'
+
+    def test_copy_to_chunks(self, mocker):
+        # Given
+        query = '__query__'
+        columns = [
+            ColumnInfo('cartodb_id', 'cartodb_id', 'integer', False),
+            ColumnInfo('flag', 'flag', 'boolean', False),
+            ColumnInfo('date', 'date', 'timestamp', False),
+            ColumnInfo('the_geom_webmercator', 'the_geom_webmercator', 'geometry', True)
+        ]
+        mocker.patch.object(ContextManager, 'compute_query', return_value=query)
+        mocker.patch.object(ContextManager, '_get_query_columns_info', return_value=columns)
+        mock = mocker.patch.object(CopySQLClient, 'copyto_stream', return_value=io.BytesIO(
+            b'cartodb_id,flag,date\n1,t,2020-01-01 10:00:00\n2,f,__null\n__null,__null,__null\n'))
+
+        # When
+        cm = ContextManager(self.credentials)
+        chunks = list(cm.copy_to(query, chunksize=2))
+
+        # Then
+        mock.assert_called_once_with(
+            'COPY (SELECT "cartodb_id","flag","date" FROM (__query__) _q) TO stdout '
+            'WITH (FORMAT csv, HEADER true, NULL \'__null\')')
+        assert len(chunks) == 2
+        assert chunks[0].dtypes.to_dict() == chunks[1].dtypes.to_dict()
+        assert str(chunks[0]['date'].dtype) == 'datetime64[us]'
+        assert chunks[0]['cartodb_id'].tolist() == [1, 2]
+        assert chunks[0]['flag'].tolist() == [True, False]
+        assert chunks[0]['date'][0] == Timestamp('2020-01-01 10:00:00')
+        assert chunks[1]['cartodb_id'].isna().all()
+        assert chunks[1]['flag'].isna().all()
+        assert chunks[1]['date'].isna().all()
+
+    def test_copy_to_chunks_timestamp_with_time_zone(self, mocker):
+        # Given
+        columns = [ColumnInfo('date', 'date', 'timestamp', False)]
+        mocker.patch.object(ContextManager, 'compute_query', return_value='__query__')
+        mocker.patch.object(ContextManager, '_get_query_columns_info', return_value=columns)
+        mocker.patch.object(CopySQLClient, 'copyto_stream', return_value=io.BytesIO(
+            b'date\n2020-01-01 10:00:00+00\n'))
+
+        # When
+        cm = ContextManager(self.credentials)
+        chunks = list(cm.copy_to('__query__', chunksize=2))
+
+        # Then
+        assert str(chunks[0]['date'].dtype) == 'datetime64[us, UTC]'
+
+    def test_copy_to_chunks_parallel(self, mocker):
+        # Given
+        mocker.patch.object(ContextManager, 'compute_query', return_value='__query__')
+        mocker.patch.object(ContextManager, '_get_query_columns_info', return_value=[])
+
+        # When
+        with pytest.raises(ValueError) as e:
+            cm = ContextManager(self.credentials)
+            cm.copy_to('__query__', parallel=2, chunksize=10)
+
+        # Then
+        assert str(e.value) == 'Reading in chunks is only available with a single COPY stream in csv format.'
+
+    def test_copy_to_parallel(self, mocker):
+        # Given
+        query = '__query__'
+        columns = [ColumnInfo('cartodb_id', 'cartodb_id', 'integer', False)]
+        mocker.patch.object(ContextManager, 'compute_query', return_value=query)
+        mocker.patch.object(ContextManager, '_get_query_columns_info', return_value=columns)
+        mocker.patch.object(ContextManager, 'execute_query', return_value={'rows': [{'min': 1, 'max': 100}]})
+
+        def copy_to(copy_query, columns, retry_times):
+            return DataFrame({'cartodb_id': [copy_query.count('AND')]})
+        mock = mocker.patch.object(ContextManager, '_copy_to', side_effect=copy_to)
+
+        # When
+        cm = ContextManager(self.credentials)
+        df = cm.copy_to(query, parallel=3)
+
+        # Then
+        assert mock.call_count == 3
+        mock.assert_any_call(
+            'SELECT "cartodb_id" FROM (__query__) _q WHERE ("cartodb_id" < 34 OR "cartodb_id" IS NULL)',
+            columns, retry_times=3)
+        mock.assert_any_call(
+            'SELECT "cartodb_id" FROM (__query__) _q WHERE "cartodb_id" >= 34 AND "cartodb_id" < 67',
+            columns, retry_times=3)
+        mock.assert_any_call(
+            'SELECT "cartodb_id" FROM (__query__) _q WHERE "cartodb_id" >= 67',
+            columns, retry_times=3)
+        assert df['cartodb_id'].tolist() == [0, 1, 0]
+
+    def test_copy_to_parallel_pyarrow(self, mocker):
+        # Given
+        pytest.importorskip('pyarrow')
+        query = '__query__'
+        columns = [
+            ColumnInfo('cartodb_id', 'cartodb_id', 'integer', False),
+            ColumnInfo('city', 'city', 'text', False)
+        ]
+        mocker.patch.object(ContextManager, 'compute_query', return_value=query)
+        mocker.patch.object(ContextManager, '_get_query_columns_info', return_value=columns)
+        mocker.patch.object(ContextManager, 'execute_query', return_value={'rows': [{'min': 1, 'max': 8}]})
+
+        def copyto_stream(copy_query):
+            city = b'Madrid' if '< 5' in copy_query else b'Paris'
+            first_id = 1 if '< 5' in copy_query else 5
+            return io.BytesIO(b'cartodb_id,city\n' + b''.join(
+                '{},'.format(first_id + i).encode() + city + b'\n' for i in range(4)))
+        mocker.patch.object(CopySQLClient, 'copyto_stream', side_effect=copyto_stream)
+
+        # When
+        cm = ContextManager(self.credentials)
+        df = cm.copy_to(query, parallel=2, dtype_backend='pyarrow')
+
+        # Then
+        assert str(df['cartodb_id'].dtype) == 'int64[pyarrow]'
+        assert str(df['city'].dtype) == 'category'
+        assert df['city'].cat.categories.tolist() == ['Madrid', 'Paris']
+        assert df['city'].tolist() == ['Madrid'] * 4 + ['Paris'] * 4
+
+    def test_copy_to_parallel_single_value(self, mocker):
+        # Given
+        query = '__query__'
+        columns = [ColumnInfo('cartodb_id', 'cartodb_id', 'integer', False)]
+        mocker.patch.object(ContextManager, 'compute_query', return_value=query)
+        mocker.patch.object(ContextManager, '_get_query_columns_info', return_value=columns)
+        mocker.patch.object(ContextManager, 'execute_query', return_value={'rows': [{'min': None, 'max': None}]})
+        mock = mocker.patch.object(ContextManager, '_copy_to')
+
+        # When
+        cm = ContextManager(self.credentials)
+        cm.copy_to(query, parallel=3)
+
+        # Then
+        mock.assert_called_once_with('SELECT "cartodb_id" FROM (__query__) _q', columns, 3)
+
+    def test_copy_to_parallel_wrong_partition_column(self, mocker):
+        # Given
+        query = '__query__'
+        columns = [ColumnInfo('name', 'name', 'text', False)]
+        mocker.patch.object(ContextManager, 'compute_query', return_value=query)
+        mocker.patch.object(ContextManager, '_get_query_columns_info', return_value=columns)
+
+        # When
+        with pytest.raises(ValueError) as e:
+            cm = ContextManager(self.credentials)
+            cm.copy_to(query, parallel=3, partition_column='name')
+
+        # Then
+        assert str(e.value) == 'Wrong partition column. "name" must be a numeric column of the source.'
+
     def test_copy_from(self, mocker):
         # Given
         mocker.patch('cartoframes.io.managers.context_manager._create_auth_client')
@@ -75,7 +521,357 @@ class TestContextManager(object):
         mock_create_table.assert_called_once_with('''
             BEGIN; CREATE TABLE table_name ("a" bigint); COMMIT;
         '''.strip())
-        mock.assert_called_once_with(df, 'table_name', columns, DEFAULT_RETRY_TIMES)
+        mock.assert_called_once_with(df, 'table_name', columns, DEFAULT_RETRY_TIMES,
+                                     max_buffer_size=COPY_MAX_BUFFER_SIZE, compression='gzip', compression_level=1,
+                                     copy_data=None)
+
+    def test_parallel_copy_from(self, mocker):
+        # Given
+        mocker.patch('cartoframes.io.managers.context_manager._create_auth_client')
+        mocker.patch.object(ContextManager, 'has_table', return_value=False)
+        mocker.patch.object(ContextManager, 'get_schema', return_value='schema')
+        mock_create_table = mocker.patch.object(ContextManager, 'execute_query')
+        mock_cartodbfy = mocker.patch.object(ContextManager, 'execute_long_running_query')
+        mock = mocker.patch.object(ContextManager, '_copy_from')
+        df = DataFrame({'A': [1, 2, 3, 4, 5]})
+        columns = [ColumnInfo('A', 'a', 'bigint', False)]
+
+        # When
+        cm = ContextManager(self.credentials)
+        cm.parallel_copy_from(df, 'TABLE NAME', parallel=2, row_sizes=np.ones(5), max_chunk_size=2)
+
+        # Then
+        mock_create_table.assert_called_once()
+        mock_cartodbfy.assert_called_once()
+        assert mock.call_count == 3
+        chunks = sorted([call[0][0]['A'].tolist() for call in mock.call_args_list])
+        assert chunks == [[1, 2], [3, 4], [5]]
+        for call in mock.call_args_list:
+            assert call[0][1:] == ('table_name', columns)
+            assert call[1] == {'retry_times': DEFAULT_RETRY_TIMES, 'max_buffer_size': COPY_MAX_BUFFER_SIZE,
+                               'compression': 'gzip', 'compression_level': 1, 'copy_data': None}
+
+    def test_parallel_copy_from_append(self, mocker):
+        # Given
+        mocker.patch('cartoframes.io.managers.context_manager._create_auth_client')
+        mocker.patch.object(ContextManager, 'has_table', return_value=True)
+        mocker.patch.object(ContextManager, 'get_schema', return_value='schema')
+        mock_cartodbfy = mocker.patch.object(ContextManager, 'execute_long_running_query')
+        mock = mocker.patch.object(ContextManager, '_copy_from')
+        df = DataFrame({'A': [1, 2, 3, 4]})
+
+        # When
+        cm = ContextManager(self.credentials)
+        cm.parallel_copy_from(df, 'TABLE NAME', if_exists='append', parallel=4)
+
+        # Then
+        assert mock.call_count == 4
+        mock_cartodbfy.assert_not_called()
+
+    def test_parallel_copy_from_skip_ranges(self, mocker):
+        # Given
+        mocker.patch('cartoframes.io.managers.context_manager._create_auth_client')
+        mocker.patch.object(ContextManager, 'get_schema', return_value='schema')
+        mock_has_table = mocker.patch.object(ContextManager, 'has_table')
+        mock_cartodbfy = mocker.patch.object(ContextManager, 'execute_long_running_query')
+        mock = mocker.patch.object(ContextManager, '_copy_from')
+        df = DataFrame({'A': [1, 2, 3, 4, 5]})
+        copied = []
+
+        # When
+        cm = ContextManager(self.credentials)
+        cm.parallel_copy_from(df, 'TABLE NAME', if_exists='replace', parallel=2, row_sizes=np.ones(5), max_chunk_size=2,
+                              skip_ranges={(0, 2)}, on_copied=lambda start, end: copied.append((start, end)))
+
+        # Then
+        mock_has_table.assert_not_called()
+        mock_cartodbfy.assert_called_once()
+        assert mock.call_count == 2
+        assert sorted(copied) == [(2, 4), (4, 5)]
+
+    def test_upsert_from(self, mocker):
+        # Given
+        mocker.patch('cartoframes.io.managers.context_manager._create_auth_client')
+        mocker.patch('cartoframes.io.managers.context_manager.create_tmp_name', return_value='tmp_upsert_1')
+        mocker.patch.object(ContextManager, 'has_table', return_value=True)
+        mocker.patch.object(ContextManager, 'get_schema', return_value='schema')
+        mock_query = mocker.patch.object(ContextManager, 'execute_query')
+        mock_long_query = mocker.patch.object(ContextManager, 'execute_long_running_query')
+        mock = mocker.patch.object(ContextManager, '_copy_from')
+        df = DataFrame({'Store ID': [1, 2], 'A': [3, 4]})
+
+        # When
+        cm = ContextManager(self.credentials)
+        cm.upsert_from(df, 'TABLE NAME', ['Store ID'])
+
+        # Then
+        assert mock_query.call_args_list[0][0][0] == (
+            'BEGIN; CREATE UNLOGGED TABLE tmp_upsert_1 ("store_id" bigint,"a" bigint); COMMIT;')
+        assert mock.call_args[0][1] == 'tmp_upsert_1'
+        mock_long_query.assert_called_once_with(_upsert_query('table_name', 'tmp_upsert_1', [
+            ColumnInfo('Store ID', 'store_id', 'bigint', False),
+            ColumnInfo('A', 'a', 'bigint', False)
+        ], ['store_id']))
+        assert mock_query.call_args_list[1][0][0] == 'DROP TABLE IF EXISTS tmp_upsert_1'
+
+    def test_upsert_from_new_table(self, mocker):
+        # Given
+        mocker.patch('cartoframes.io.managers.context_manager._create_auth_client')
+        mocker.patch.object(ContextManager, 'has_table', return_value=False)
+        mocker.patch.object(ContextManager, 'get_schema', return_value='schema')
+        mocker.patch.object(ContextManager, 'execute_query')
+        mock_long_query = mocker.patch.object(ContextManager, 'execute_long_running_query')
+        mock = mocker.patch.object(ContextManager, '_copy_from')
+        df = DataFrame({'store_id': [1, 2]})
+
+        # When
+        cm = ContextManager(self.credentials)
+        cm.upsert_from(df, 'TABLE NAME', ['store_id'])
+
+        # Then
+        assert mock.call_args[0][1] == 'table_name'
+        mock_long_query.assert_called_once_with("SELECT CDB_CartodbfyTable('schema', 'table_name')")
+
+    def test_upsert_from_wrong_key(self, mocker):
+        # Given
+        mocker.patch('cartoframes.io.managers.context_manager._create_auth_client')
+        mocker.patch.object(ContextManager, 'get_schema', return_value='schema')
+        df = DataFrame({'store_id': [1, 2]})
+
+        # When
+        with pytest.raises(ValueError) as e:
+            ContextManager(self.credentials).upsert_from(df, 'table_name', ['id'])
+
+        # Then
+        assert str(e.value) == 'Wrong key. The columns id are not in the dataframe.'
+
+    def test_upsert_query(self):
+        # Given
+        columns = [
+            ColumnInfo('k', 'k', 'bigint', False),
+            ColumnInfo('a', 'a', 'text', False),
+            ColumnInfo('b', 'b', 'double precision', False),
+            ColumnInfo('the_geom', 'the_geom', 'geometry(Geometry, 4326)', True)
+        ]
+
+        # When
+        query = _upsert_query('table_name', 'tmp_upsert_1', columns, ['k'])
+
+        # Then
+        assert ' '.join(query.split()) == (
+            'BEGIN; '
+            'UPDATE table_name _t SET "a" = _s."a","b" = _s."b","the_geom" = _s."the_geom" FROM tmp_upsert_1 _s '
+            'WHERE _t."k" = _s."k" AND (_t."a"::text,_t."b",ST_AsEWKB(_t."the_geom")) '
+            'IS DISTINCT FROM (_s."a"::text,_s."b",ST_AsEWKB(_s."the_geom")); '
+            'INSERT INTO table_name ("k","a","b","the_geom") SELECT "k","a","b","the_geom" FROM tmp_upsert_1 _s '
+            'WHERE NOT EXISTS (SELECT 1 FROM table_name _t WHERE _t."k" = _s."k"); '
+            'COMMIT;')
+
+    def test_bulk_copy_from(self, mocker):
+        # Given
+        mocker.patch('cartoframes.io.managers.context_manager._create_auth_client')
+        mocker.patch('cartoframes.io.managers.context_manager.create_tmp_name', return_value='tmp_bulk_1')
+        mocker.patch.object(ContextManager, 'has_table', return_value=True)
+        mocker.patch.object(ContextManager, 'get_schema', return_value='schema')
+        mock_query = mocker.patch.object(ContextManager, 'execute_query')
+        mock_long_query = mocker.patch.object(ContextManager, 'execute_long_running_query')
+        mock = mocker.patch.object(ContextManager, '_copy_from')
+        df = DataFrame({'A': [1, 2]})
+        columns = [ColumnInfo('A', 'a', 'bigint', False)]
+
+        # When
+        cm = ContextManager(self.credentials)
+        cm.bulk_copy_from(df, 'TABLE NAME', 'replace')
+
+        # Then
+        assert mock_query.call_args_list[0][0][0] == 'BEGIN; CREATE UNLOGGED TABLE tmp_bulk_1 ("a" bigint); COMMIT;'
+        assert mock.call_args[0][1] == 'tmp_bulk_1'
+        mock_long_query.assert_called_once_with(
+            _bulk_load_query('table_name', 'tmp_bulk_1', 'schema', columns, False, True))
+        assert mock_query.call_args_list[1][0][0] == 'DROP TABLE IF EXISTS tmp_bulk_1'
+
+    def test_bulk_copy_from_exists_fail(self, mocker):
+        # Given
+        mocker.patch('cartoframes.io.managers.context_manager._create_auth_client')
+        mocker.patch.object(ContextManager, 'has_table', return_value=True)
+        mocker.patch.object(ContextManager, 'get_schema', return_value='schema')
+        mock = mocker.patch.object(ContextManager, '_copy_from')
+
+        # When
+        with pytest.raises(Exception) as e:
+            ContextManager(self.credentials).bulk_copy_from(DataFrame({'A': [1]}), 'table_name', 'fail')
+
+        # Then
+        assert 'already exists' in str(e.value)
+        mock.assert_not_called()
+
+    def test_bulk_load_query(self):
+        # Given
+        columns = [ColumnInfo('A', 'a', 'bigint', False), ColumnInfo('G', 'g', 'geometry(Geometry, 4326)', True)]
+
+        # When / Then
+        assert _bulk_load_query('t', 'tmp_bulk_1', 'schema', columns) == (
+            'BEGIN; DROP TABLE IF EXISTS t; CREATE TABLE t AS SELECT "a","g" FROM tmp_bulk_1; COMMIT; '
+            "SELECT CDB_CartodbfyTable('schema', 't'); ANALYZE t;")
+        assert _bulk_load_query('t', 'tmp_bulk_1', 'schema', columns, cartodbfy=False) == (
+            'BEGIN; DROP TABLE IF EXISTS t; CREATE TABLE t AS SELECT "a","g" FROM tmp_bulk_1; COMMIT; '
+            'CREATE INDEX ON t USING GIST ("g"); ANALYZE t;')
+        assert _bulk_load_query('t', 'tmp_bulk_1', 'schema', columns, append=True, cartodbfy=False) == (
+            'BEGIN; INSERT INTO t ("a","g") SELECT "a","g" FROM tmp_bulk_1; COMMIT; ANALYZE t;')
+
+    def test_bulk_load_query_indexes(self):
+        # Given
+        columns = [ColumnInfo('A', 'a', 'bigint', False), ColumnInfo('G', 'g', 'geometry(Geometry, 4326)', True)]
+
+        # When / Then
+        assert _bulk_load_query('t', 'tmp_bulk_1', 'schema', columns, cartodbfy=False, indexes=['a'],
+                                cluster_on='g') == (
+            'BEGIN; DROP TABLE IF EXISTS t; CREATE TABLE t AS SELECT "a","g" FROM tmp_bulk_1; COMMIT; '
+            'CREATE INDEX ON t USING GIST ("g"); '
+            'CREATE INDEX IF NOT EXISTS t_a_idx ON t USING BTREE ("a"); '
+            'CREATE INDEX IF NOT EXISTS t_g_idx ON t USING GIST ("g"); '
+            'CLUSTER t USING t_g_idx; ANALYZE t;')
+
+    def test_get_index_statements(self):
+        # Given
+        columns = [
+            ColumnInfo('A', 'a', 'bigint', False),
+            ColumnInfo('B', 'b', 'text', False),
+            ColumnInfo('the_geom', 'the_geom', 'geometry(Geometry, 4326)', True)
+        ]
+
+        # When
+        statements = get_index_statements('t', columns, indexes=['A', ('a', 'B')], cluster_on='the_geom')
+
+        # Then
+        assert statements == [
+            'CREATE INDEX IF NOT EXISTS t_a_idx ON t USING BTREE ("a")',
+            'CREATE INDEX IF NOT EXISTS t_a_b_idx ON t USING BTREE ("a","b")',
+            'CREATE INDEX IF NOT EXISTS t_the_geom_idx ON t USING GIST ("the_geom")',
+            'CLUSTER t USING t_the_geom_idx'
+        ]
+
+    def test_get_index_statements_wrong_column(self):
+        columns = [ColumnInfo('A', 'a', 'bigint', False)]
+
+        with pytest.raises(ValueError) as e:
+            get_index_statements('t', columns, indexes=[('a', 'c')])
+        assert str(e.value) == 'Wrong indexes. The columns c are not in the dataframe.'
+
+        with pytest.raises(ValueError) as e:
+            get_index_statements('t', columns, cluster_on='the_geom')
+        assert str(e.value) == 'Wrong cluster_on. The columns the_geom are not in the dataframe.'
+
+    def test_create_indexes(self, mocker):
+        # Given
+        mocker.patch('cartoframes.io.managers.context_manager._create_auth_client')
+        mock = mocker.patch.object(ContextManager, 'execute_long_running_query')
+        columns = [ColumnInfo('A', 'a', 'bigint', False)]
+
+        # When
+        cm = ContextManager(self.credentials)
+        cm.create_indexes('TABLE NAME', columns, indexes=['a'], cluster_on='a')
+
+        # Then
+        mock.assert_called_once_with(
+            'CREATE INDEX IF NOT EXISTS table_name_a_idx ON table_name USING BTREE ("a"); '
+            'CREATE INDEX IF NOT EXISTS table_name_a_idx ON table_name USING BTREE ("a"); '
+            'CLUSTER table_name USING table_name_a_idx; ANALYZE table_name;')
+
+    def test_sync_from(self, mocker):
+        # Given
+        mocker.patch('cartoframes.io.managers.context_manager._create_auth_client')
+        mocker.patch.object(ContextManager, 'has_table', return_value=True)
+        mocker.patch.object(ContextManager, 'get_schema', return_value='schema')
+        mocker.patch.object(ContextManager, '_get_query_columns_info')
+        mock_upsert = mocker.patch.object(ContextManager, 'upsert_from')
+        mock_delete = mocker.patch.object(ContextManager, '_delete_rows')
+        df = DataFrame({'id': [1, 2, 3], 'A': ['a', 'b', 'c']})
+        columns = [ColumnInfo('id', 'id', 'bigint', False), ColumnInfo('A', 'a', 'text', False)]
+        hashes = _compute_row_hashes(df, columns)
+        mock_copy_to = mocker.patch.object(ContextManager, '_copy_to', return_value=DataFrame({
+            'id': [1, 2, 4],
+            '_row_hash': [hashes[0], '__changed__', '__deleted__']
+        }))
+
+        # When
+        cm = ContextManager(self.credentials)
+        cm.sync_from(df, 'TABLE NAME', ['id'])
+
+        # Then
+        assert mock_copy_to.call_args[0][0] == (
+            'SELECT "id", {} AS _row_hash FROM "schema"."table_name"'.format(_row_hash_expression(columns)))
+        assert mock_upsert.call_args[0][0]['id'].tolist() == [2, 3]
+        assert mock_upsert.call_args[0][1:4] == ('table_name', ['id'], False)
+        assert mock_delete.call_args[0][2]['id'].tolist() == [4]
+
+    def test_sync_from_unchanged(self, mocker):
+        # Given
+        mocker.patch('cartoframes.io.managers.context_manager._create_auth_client')
+        mocker.patch.object(ContextManager, 'has_table', return_value=True)
+        mocker.patch.object(ContextManager, 'get_schema', return_value='schema')
+        mocker.patch.object(ContextManager, '_get_query_columns_info')
+        mock_upsert = mocker.patch.object(ContextManager, 'upsert_from')
+        mock_delete = mocker.patch.object(ContextManager, '_delete_rows')
+        df = DataFrame({'id': [1, 2], 'A': [1.5, None]})
+        columns = [ColumnInfo('id', 'id', 'bigint', False), ColumnInfo('A', 'a', 'double precision', False)]
+        mocker.patch.object(ContextManager, '_copy_to', return_value=DataFrame({
+            'id': [2, 1],
+            '_row_hash': _compute_row_hashes(df, columns)[::-1]
+        }))
+
+        # When
+        cm = ContextManager(self.credentials)
+        cm.sync_from(df, 'table_name', ['id'])
+
+        # Then
+        mock_upsert.assert_not_called()
+        mock_delete.assert_not_called()
+
+    def test_compute_row_hashes(self):
+        # Given
+        df = GeoDataFrame({
+            'A': [1, 2],
+            'B': [1.5, float('nan')],
+            'C': ['d "e"', None],
+            'D': [True, False],
+            'E': [Point(0, 0), None]
+        })
+        columns = [
+            ColumnInfo('A', 'a', 'bigint', False),
+            ColumnInfo('B', 'b', 'double precision', False),
+            ColumnInfo('C', 'c', 'text', False),
+            ColumnInfo('D', 'd', 'boolean', False),
+            ColumnInfo('E', 'e', 'geometry(Geometry, 4326)', True)
+        ]
+
+        # When
+        hashes = _compute_row_hashes(df, columns)
+
+        # Then
+        assert hashes == [
+            hashlib.md5(b'1:116:3ff80000000000005:d "e"4:true'
+                        b'50:0101000020e610000000000000000000000000000000000000').hexdigest(),
+            hashlib.md5(b'1:216:7ff80000000000003:NaN5:false-').hexdigest()
+        ]
+
+    def test_compute_row_hashes_lengths(self):
+        # Given
+        df = DataFrame({'A': ['ñandú', 'ab', None, 'cd', '']})
+        columns = [ColumnInfo('A', 'a', 'text', False)]
+
+        # When
+        hashes = _compute_row_hashes(df, columns)
+
+        # Then
+        assert hashes == [hashlib.md5(field.encode('utf-8')).hexdigest()
+                          for field in ['5:ñandú', '2:ab', '3:NaN', '2:cd', '0:']]
+        assert _compute_row_hashes(df[:0], columns) == []
+
+    def test_delete_rows_query(self):
+        assert _delete_rows_query('table_name', 'tmp_delete_1', ['k1', 'k2']) == (
+            'BEGIN; DELETE FROM table_name _t USING tmp_delete_1 _s '
+            'WHERE _t."k1" = _s."k1" AND _t."k2" = _s."k2"; COMMIT;')
 
     def test_copy_from_exists_fail(self, mocker):
         # Given
@@ -145,11 +941,154 @@ class TestContextManager(object):
         assert mock.call_args[0][0] == '''
             COPY table_name("a","b") FROM stdin WITH (FORMAT csv, DELIMITER '|', NULL '__null');
         '''.strip()
-        assert list(mock.call_args[0][1]) == [
-            b'1|0101000020E610000000000000000000000000000000000000\n',
+        assert b''.join(mock.call_args[0][1]) == (
+            b'1|0101000020E610000000000000000000000000000000000000\n'
             b'2|0101000020E6100000000000000000F03F000000000000F03F\n'
+        )
+        assert mock.call_args[1] == {'compress': True, 'compression_level': 1}
+
+    def test_internal_copy_from_uncompressed(self, mocker):
+        # Given
+        mocker.patch('cartoframes.io.managers.context_manager._create_auth_client')
+        mock = mocker.patch.object(CopySQLClient, 'copyfrom')
+        df = DataFrame({'A': [1, 2]})
+        columns = [ColumnInfo('A', 'a', 'bigint', False)]
+
+        # When
+        cm = ContextManager(self.credentials)
+        cm._copy_from(df, 'table_name', columns, compression=None)
+
+        # Then
+        assert mock.call_args[1] == {'compress': False, 'compression_level': 1}
+
+    def test_compute_copy_data(self):
+        # Given
+        gdf = GeoDataFrame({
+            'A': [1, 2, 3],
+            'B': [1.5, float('inf'), float('nan')],
+            'C': ['a', 'b|c', 'd "e"'],
+            'D': [True, False, True],
+            'E': [None, b'f\ng', 7],
+            'F': [Point(0, 0), None, Point(1, 1)]
+        })
+        columns = [ColumnInfo(name, name.lower(), 'text', name == 'F') for name in ['A', 'B', 'C', 'D', 'E', 'F']]
+
+        # When
+        blocks = list(_compute_copy_data(gdf, columns, block_size=2))
+
+        # Then
+        assert blocks == [
+            b'1|1.5|a|True|__null|0101000020E610000000000000000000000000000000000000\n'
+            b'2|Infinity|"b|c"|False|"f\ng"|__null\n',
+            b'3|NaN|"d ""e"""|True|7|0101000020E6100000000000000000F03F000000000000F03F\n'
         ]
 
+    def test_encode_copy_data(self):
+        # Given
+        gdf = GeoDataFrame({
+            'A': [1, 22, 333],
+            'B': [1.5, float('nan'), True],
+            'C': ['a|b', 'Gran Vía', None],
+            'D': [Point(0, 0), None, Point(1, 1)]
+        })
+        columns = [ColumnInfo(name, name.lower(), 'text', name == 'D') for name in ['A', 'B', 'C', 'D']]
+
+        # When
+        copy_data = encode_copy_data(gdf, columns, block_size=2)
+
+        # Then
+        data = b''.join(_compute_copy_data(gdf, columns))
+        assert copy_data.row_sizes.tolist() == [len(row) + 1 for row in data.split(b'\n')[:-1]]
+        assert b''.join(copy_data.iter_blocks()) == data
+
+    def test_copy_data_get_range(self, mocker):
+        # Given
+        df = DataFrame({'A': range(10), 'B': ['Vía {}'.format(i) for i in range(10)]})
+        columns = [ColumnInfo('A', 'a', 'bigint', False), ColumnInfo('B', 'b', 'text', False)]
+        rows = b''.join(_compute_copy_data(df, columns)).split(b'\n')[:-1]
+
+        # Only the first two blocks are kept
+        copy_data = encode_copy_data(df, columns, block_size=3, max_size=len(b''.join(rows[:6])) + 6)
+        encode_mock = mocker.patch('cartoframes.io.managers.context_manager._encode_copy_block',
+                                   wraps=_encode_copy_block)
+
+        for start, end in [(0, 10), (1, 5), (3, 6), (4, 9), (7, 8)]:
+            # When
+            data = b''.join(copy_data.get_range(start, end).iter_blocks())
+
+            # Then
+            assert data == b''.join(row + b'\n' for row in rows[start:end])
+
+        assert [len(call.args[0]) for call in encode_mock.call_args_list] == [3, 1, 3, 1]
+
+    def test_copy_data_release(self):
+        # Given
+        df = DataFrame({'A': range(10)})
+        columns = [ColumnInfo('A', 'a', 'bigint', False)]
+        copy_data = encode_copy_data(df, columns, block_size=3)
+
+        # When
+        copy_data.get_range(2, 9).release()
+        copy_data.get_range(9, 10).release()
+
+        # Then
+        assert sorted(copy_data._blocks) == [0]
+
+    def test_get_chunk_ranges(self):
+        # Given
+        row_sizes = np.array([10, 10, 10, 50, 10, 10])
+
+        # When / Then
+        assert get_chunk_ranges(row_sizes) == [(0, 6)]
+        assert get_chunk_ranges(row_sizes, 30) == [(0, 3), (3, 4), (4, 6)]
+        assert get_chunk_ranges(row_sizes, 1000, 2) == [(0, 3), (3, 4), (4, 6)]
+        assert get_chunk_ranges(np.full(6, 10), 1000, 2) == [(0, 3), (3, 6)]
+        assert get_chunk_ranges(np.array([], dtype=np.int64), 30) == [(0, 0)]
+
+    def test_pipeline_copy_data(self):
+        # Given
+        df = DataFrame({'A': range(10), 'B': ['a|{}'.format(i) for i in range(10)]})
+        columns = [ColumnInfo('A', 'a', 'bigint', False), ColumnInfo('B', 'b', 'text', False)]
+
+        # When
+        blocks = list(_pipeline_copy_data(df, columns, block_size=3, max_buffer_size=10))
+
+        # Then
+        assert blocks == list(_compute_copy_data(df, columns, block_size=3))
+        assert len(blocks) == 4
+
+    def test_pipeline_copy_data_backpressure(self, mocker):
+        # Given
+        df = DataFrame({'A': range(10)})
+        columns = [ColumnInfo('A', 'a', 'bigint', False)]
+        encode_mock = mocker.patch('cartoframes.io.managers.context_manager._encode_copy_block',
+                                   return_value=b'0123456789')
+
+        # When
+        data = _pipeline_copy_data(df, columns, block_size=1, max_buffer_size=30)
+        next(data)
+        time.sleep(0.1)
+        encoded = encode_mock.call_count
+        rest = list(data)
+
+        # Then
+        assert encoded == 4  # The first block plus 3 blocks of 10 bytes in flight
+        assert len(rest) == 9
+        assert encode_mock.call_count == 10
+
+    def test_pipeline_copy_data_close(self):
+        # Given
+        df = DataFrame({'A': range(10)})
+        columns = [ColumnInfo('A', 'a', 'bigint', False)]
+
+        # When
+        data = _pipeline_copy_data(df, columns, block_size=2)
+        first = next(data)
+        data.close()
+
+        # Then
+        assert first == b'0\n1\n'
+
     def test_rename_table(self, mocker):
         # Given
         def has_table(table_name):
@@ -279,6 +1218,79 @@ class TestContextManager(object):
         with pytest.raises(CartoRateLimitException):
             test_function(retry_times=0)
 
+    def test_retry_copy_from_connect_error(self, mocker):
+        # Given
+        mocker.patch('time.sleep')
+        connect_error = requests.exceptions.ConnectionError(
+            MaxRetryError(None, '/api/v2/sql/copyfrom', NewConnectionError(None, 'refused')))
+        mock = mocker.patch('requests.Session.request', side_effect=connect_error)
+        df = DataFrame({'A': [1]})
+        columns = [ColumnInfo('A', 'a', 'bigint', False)]
+
+        # When
+        cm = ContextManager(self.credentials)
+        with pytest.raises(CartoException):
+            cm._copy_from(df, 'table_name', columns, retry_times=3)
+
+        # Then
+        assert mock.call_count == 3
+
+    def test_retry_copy_from_connection_reset(self, mocker):
+        # Given
+        mocker.patch('time.sleep')
+        mock = mocker.patch('requests.Session.request', side_effect=requests.exceptions.ConnectionError('reset'))
+        df = DataFrame({'A': [1]})
+        columns = [ColumnInfo('A', 'a', 'bigint', False)]
+
+        # When
+        cm = ContextManager(self.credentials)
+        with pytest.raises(CartoException):
+            cm._copy_from(df, 'table_name', columns, retry_times=3)
+
+        # Then
+        assert mock.call_count == 1
+
+    def test_retry_copy_to_connection_reset(self, mocker):
+        # Given
+        mocker.patch('time.sleep')
+        mocker.patch('cartoframes.io.managers.context_manager._create_auth_client')
+        mock = mocker.patch.object(CopySQLClient, 'copyto_stream',
+                                   side_effect=CartoException(requests.exceptions.ConnectionError('reset')))
+        columns = [ColumnInfo('A', 'a', 'bigint', False)]
+
+        # When
+        cm = ContextManager(self.credentials)
+        with pytest.raises(CartoException):
+            cm._copy_to('SELECT 1 AS a', columns, retry_times=3)
+
+        # Then
+        assert mock.call_count == 3
+
+    def test_retry_copy_from_copy_data(self, mocker):
+        # Given
+        mocker.patch('time.sleep')
+        mocker.patch('cartoframes.io.managers.context_manager._create_auth_client')
+        df = DataFrame({'A': range(5)})
+        columns = [ColumnInfo('A', 'a', 'bigint', False)]
+        copy_data = encode_copy_data(df, columns, block_size=2)
+        encode_mock = mocker.patch('cartoframes.io.managers.context_manager._encode_copy_block')
+        sent = []
+
+        def copyfrom(query, data, **kwargs):
+            sent.append(b''.join(data))
+            if len(sent) == 1:
+                raise CartoException(requests.exceptions.ConnectTimeout('timeout'))
+        mocker.patch.object(CopySQLClient, 'copyfrom', side_effect=copyfrom)
+
+        # When
+        cm = ContextManager(self.credentials)
+        cm._copy_from(df, 'table_name', columns, retry_times=3, copy_data=copy_data.get_range(0, 4))
+
+        # Then
+        assert sent == [b'0\n1\n2\n3\n'] * 2
+        encode_mock.assert_not_called()
+        assert sorted(copy_data._blocks) == [4]
+
     def test_create_table_from_query_cartodbfy(self, mocker):
         # Given
         mocker.patch.object(ContextManager, 'has_table', return_value=False)
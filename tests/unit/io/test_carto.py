@@ -1,19 +1,37 @@
 import pytest
 
+import os
 import random
 
-from pandas import Index
+import numpy as np
+
+from pandas import DataFrame, Index
 from geopandas import GeoDataFrame
 from shapely.geometry import Point
 from shapely import wkt
 
 from carto.exceptions import CartoException
 from cartoframes.auth import Credentials
-from cartoframes.io.managers.context_manager import ContextManager
-from cartoframes.io.carto import read_carto, to_carto, copy_table, create_table_from_query
+from cartoframes.io.managers.context_manager import ContextManager, COPY_MAX_BUFFER_SIZE, _encode_copy_block
+from cartoframes.utils.columns import get_dataframe_columns_info
+from cartoframes.utils.journal import UploadJournal
+from cartoframes.io.carto import read_carto, to_carto, copy_table, create_table_from_query, MAX_UPLOAD_SIZE_BYTES
 
 
 CREDENTIALS = Credentials('fake_user', 'fake_api_key')
+COPY_TO_OPTIONS = {
+    'parallel': None,
+    'partition_column': None,
+    'format': 'csv',
+    'chunksize': None,
+    'columns': None,
+    'where': None,
+    'bbox': None,
+    'geometry': None,
+    'simplify_tolerance': None,
+    'cache': False,
+    'dtype_backend': None
+}
 
 
 def test_read_carto(mocker):
@@ -40,7 +58,7 @@ def test_read_carto(mocker):
     gdf = read_carto('__source__', CREDENTIALS)
 
     # Then
-    cm_mock.assert_called_once_with('__source__', None, None, 3)
+    cm_mock.assert_called_once_with('__source__', None, None, 3, **COPY_TO_OPTIONS)
     assert expected.equals(gdf)
     assert gdf.crs == 'epsg:4326'
 
@@ -66,7 +84,7 @@ def test_read_carto_none_as_null_geom_value(mocker):
         ]
     }, geometry='the_geom')
 
-    cm_mock.assert_called_once_with('__source__', None, None, 3)
+    cm_mock.assert_called_once_with('__source__', None, None, 3, **COPY_TO_OPTIONS)
     assert expected.equals(gdf)
     assert gdf.crs == 'epsg:4326'
 
@@ -92,7 +110,7 @@ def test_read_carto_basegeometry_as_null_geom_value(mocker):
         ]
     }, geometry='the_geom')
 
-    cm_mock.assert_called_once_with('__source__', None, None, 3)
+    cm_mock.assert_called_once_with('__source__', None, None, 3, **COPY_TO_OPTIONS)
     print(expected, gdf)
     assert expected.equals(gdf)
     assert gdf.crs == 'epsg:4326'
@@ -126,7 +144,7 @@ def test_read_carto_limit(mocker):
     read_carto('__source__', CREDENTIALS, limit=1)
 
     # Then
-    cm_mock.assert_called_once_with('__source__', None, 1, 3)
+    cm_mock.assert_called_once_with('__source__', None, 1, 3, **COPY_TO_OPTIONS)
 
 
 def test_read_carto_retry_times(mocker):
@@ -138,7 +156,7 @@ def test_read_carto_retry_times(mocker):
     read_carto('__source__', CREDENTIALS, retry_times=1)
 
     # Then
-    cm_mock.assert_called_once_with('__source__', None, None, 1)
+    cm_mock.assert_called_once_with('__source__', None, None, 1, **COPY_TO_OPTIONS)
 
 
 def test_read_carto_schema(mocker):
@@ -150,7 +168,135 @@ def test_read_carto_schema(mocker):
     read_carto('__source__', CREDENTIALS, schema='__schema__')
 
     # Then
-    cm_mock.assert_called_once_with('__source__', '__schema__', None, 3)
+    cm_mock.assert_called_once_with('__source__', '__schema__', None, 3, **COPY_TO_OPTIONS)
+
+
+def test_read_carto_parallel(mocker):
+    # Given
+    mocker.patch('cartoframes.utils.geom_utils.set_geometry')
+    cm_mock = mocker.patch.object(ContextManager, 'copy_to')
+
+    # When
+    read_carto('__source__', CREDENTIALS, parallel=4, partition_column='__column__')
+
+    # Then
+    cm_mock.assert_called_once_with('__source__', None, None, 3,
+                                    **dict(COPY_TO_OPTIONS, parallel=4, partition_column='__column__'))
+
+
+def test_read_carto_wrong_parallel(mocker):
+    # When
+    with pytest.raises(ValueError) as e:
+        read_carto('__source__', CREDENTIALS, parallel=0)
+
+    # Then
+    assert str(e.value) == 'Wrong parallel value. You should provide an integer >= 1.'
+
+
+def test_read_carto_format(mocker):
+    # Given
+    mocker.patch('cartoframes.utils.geom_utils.set_geometry')
+    cm_mock = mocker.patch.object(ContextManager, 'copy_to')
+
+    # When
+    read_carto('__source__', CREDENTIALS, format='binary')
+
+    # Then
+    cm_mock.assert_called_once_with('__source__', None, None, 3, **dict(COPY_TO_OPTIONS, format='binary'))
+
+
+def test_read_carto_delta(mocker):
+    # Given
+    base = GeoDataFrame({
+        'cartodb_id': [1, 2, 3],
+        'updated_at': [10, 20, 30],
+        'the_geom': [Point([0, 0]), Point([1, 1]), Point([2, 2])]
+    }, geometry='the_geom', crs='epsg:4326')
+    cm_mock = mocker.patch.object(ContextManager, 'copy_to')
+    cm_mock.return_value = GeoDataFrame({
+        'cartodb_id': [2, 4],
+        'updated_at': [40, 50],
+        'the_geom': [
+            '010100000000000000000024400000000000002e40',
+            '010100000000000000000034400000000000003e40'
+        ]
+    })
+
+    # When
+    gdf, watermark = read_carto('__source__', CREDENTIALS, since=30, watermark_column='updated_at', base=base)
+
+    # Then
+    cm_mock.assert_called_once_with('__source__', None, None, 3, **dict(
+        COPY_TO_OPTIONS, where='"updated_at" > 30 OR "cartodb_id" > 3'))
+    assert gdf['cartodb_id'].tolist() == [1, 3, 2, 4]
+    assert gdf['updated_at'].tolist() == [10, 30, 40, 50]
+    assert gdf['the_geom'].tolist() == [Point([0, 0]), Point([2, 2]), Point([10, 15]), Point([20, 30])]
+    assert watermark == 50
+
+
+def test_read_carto_delta_empty(mocker):
+    # Given
+    base = GeoDataFrame({'cartodb_id': [1], 'updated_at': ['2021-01-01']})
+    cm_mock = mocker.patch.object(ContextManager, 'copy_to')
+    cm_mock.return_value = GeoDataFrame({'cartodb_id': [], 'updated_at': []})
+
+    # When
+    gdf, watermark = read_carto('__source__', CREDENTIALS, where='a = 1', since='2021-01-01',
+                                watermark_column='updated_at', base=base)
+
+    # Then
+    cm_mock.assert_called_once_with('__source__', None, None, 3, **dict(
+        COPY_TO_OPTIONS, where="(a = 1) AND (\"updated_at\" > '2021-01-01' OR \"cartodb_id\" > 1)"))
+    assert gdf is base
+    assert watermark == '2021-01-01'
+
+
+def test_read_carto_delta_wrong_watermark_column(mocker):
+    # When
+    with pytest.raises(ValueError) as e:
+        read_carto('__source__', CREDENTIALS, since=1)
+
+    # Then
+    assert str(e.value) == 'Wrong watermark_column. You should provide the column to compare with `since`.'
+
+
+def test_read_carto_chunksize(mocker):
+    # Given
+    cm_mock = mocker.patch.object(ContextManager, 'copy_to')
+    cm_mock.return_value = iter([
+        GeoDataFrame({
+            'cartodb_id': [1, 2],
+            'the_geom': [
+                '010100000000000000000000000000000000000000',
+                '010100000000000000000024400000000000002e40'
+            ]
+        }),
+        GeoDataFrame({
+            'cartodb_id': [3],
+            'the_geom': [
+                '010100000000000000000034400000000000003e40'
+            ]
+        })
+    ])
+
+    # When
+    chunks = list(read_carto('__source__', CREDENTIALS, chunksize=2))
+
+    # Then
+    cm_mock.assert_called_once_with('__source__', None, None, 3, **dict(COPY_TO_OPTIONS, chunksize=2))
+    assert len(chunks) == 2
+    assert chunks[0]['the_geom'].tolist() == [Point([0, 0]), Point([10, 15])]
+    assert chunks[1]['the_geom'].tolist() == [Point([20, 30])]
+    assert chunks[1].crs == 'epsg:4326'
+
+
+def test_read_carto_wrong_chunksize(mocker):
+    # When
+    with pytest.raises(ValueError) as e:
+        read_carto('__source__', CREDENTIALS, chunksize=0)
+
+    # Then
+    assert str(e.value) == 'Wrong chunksize value. You should provide an integer >= 1.'
 
 
 def test_read_carto_index_col_exists(mocker):
@@ -381,6 +527,290 @@ def test_to_carto_chunks(mocker):
     assert norm_table_name == table_name
 
 
+def test_to_carto_parallel(mocker):
+    # Given
+    table_name = '__table_name__'
+    cm_mock = mocker.patch.object(ContextManager, 'parallel_copy_from')
+    cm_mock.return_value = table_name
+    copy_from_mock = mocker.patch.object(ContextManager, 'copy_from')
+    gdf = GeoDataFrame({'A': range(10)}, geometry=[Point(0, 0)] * 10)
+
+    # When
+    norm_table_name = to_carto(gdf, table_name, CREDENTIALS, skip_quota_warning=True, parallel=4)
+
+    # Then
+    assert norm_table_name == table_name
+    copy_from_mock.assert_not_called()
+    assert cm_mock.call_args[0][1:] == (table_name, 'fail', True, 3)
+    kwargs = cm_mock.call_args[1]
+    assert kwargs.pop('row_sizes').tolist() == [53] * 10
+    assert kwargs.pop('copy_data').row_sizes.tolist() == [53] * 10
+    assert kwargs == {'parallel': 4, 'max_chunk_size': MAX_UPLOAD_SIZE_BYTES, 'max_buffer_size': COPY_MAX_BUFFER_SIZE,
+                      'compression': 'gzip', 'compression_level': 1, 'skip_ranges': set(), 'on_copied': None}
+
+
+def test_to_carto_encoded_data_not_kept(mocker):
+    # Given
+    cm_mock = mocker.patch.object(ContextManager, 'copy_from', return_value='table_name')
+    df = DataFrame({'A': range(10, 100)})  # 3 bytes per row: 2 digits and 1 newline
+
+    # When
+    to_carto(df, 'table_name', CREDENTIALS, skip_quota_warning=True)
+    to_carto(df, 'table_name', CREDENTIALS, skip_quota_warning=True, copy=False)
+    to_carto(df, 'table_name', CREDENTIALS, skip_quota_warning=True, max_buffer_size=100)
+
+    # Then
+    copy_data = [call[1]['copy_data'] for call in cm_mock.call_args_list]
+    assert len(copy_data[0]._blocks) == 1
+    assert copy_data[1]._blocks == {}
+    assert copy_data[2]._blocks == {}
+    assert cm_mock.call_args_list[1][1]['max_buffer_size'] == COPY_MAX_BUFFER_SIZE
+    assert cm_mock.call_args_list[2][1]['max_buffer_size'] == 100
+    assert b''.join(copy_data[1].iter_blocks()) == b''.join(copy_data[0].iter_blocks())
+
+
+def test_to_carto_resume(mocker, tmpdir):
+    # Given
+    journal = UploadJournal(path=str(tmpdir))
+    mocker.patch('cartoframes.io.carto.get_journal', return_value=journal)
+    cm_mock = mocker.patch.object(ContextManager, 'copy_from', side_effect=['table_name', CartoException('Error')])
+    df = DataFrame({'A': range(10, 100)})  # 3 bytes per row: 2 digits and 1 newline
+
+    # When
+    with pytest.raises(CartoException):
+        to_carto(df, 'Table Name', CREDENTIALS, skip_quota_warning=True, max_upload_size=99, resume=True)
+
+    cm_mock.reset_mock(side_effect=True)
+    cm_mock.return_value = 'table_name'
+    to_carto(df, 'Table Name', CREDENTIALS, skip_quota_warning=True, max_upload_size=99, resume=True)
+
+    # Then
+    chunks = [chunk[0][0]['A'].tolist() for chunk in cm_mock.call_args_list]
+    assert chunks == [list(range(43, 76)), list(range(76, 100))]
+    assert cm_mock.call_args_list[0][0][2] == 'append'
+    assert os.listdir(str(tmpdir)) == []
+
+
+def test_to_carto_upsert(mocker):
+    # Given
+    cm_mock = mocker.patch.object(ContextManager, 'upsert_from', return_value='table_name')
+    df = DataFrame({'store_id': [1, 2], 'A': [3, 4]})
+
+    # When
+    norm_table_name = to_carto(df, 'table_name', CREDENTIALS, if_exists='upsert', key='store_id',
+                               skip_quota_warning=True)
+
+    # Then
+    assert norm_table_name == 'table_name'
+    assert cm_mock.call_args[0][1:] == ('table_name', ['store_id'], True, 3)
+
+
+def test_to_carto_sync(mocker):
+    # Given
+    cm_mock = mocker.patch.object(ContextManager, 'sync_from', return_value='table_name')
+    df = DataFrame({'store_id': [1, 2], 'A': [3, 4]})
+
+    # When
+    to_carto(df, 'table_name', CREDENTIALS, if_exists='sync', key=['store_id'], skip_quota_warning=True)
+
+    # Then
+    assert cm_mock.call_args[0][1:] == ('table_name', ['store_id'], True, 3)
+
+
+def test_to_carto_upsert_without_key(mocker):
+    # Given
+    df = DataFrame({'store_id': [1, 2]})
+
+    # When
+    with pytest.raises(ValueError) as e:
+        to_carto(df, 'table_name', CREDENTIALS, if_exists='upsert', skip_quota_warning=True)
+
+    # Then
+    assert str(e.value) == "Wrong key. You should provide the columns that identify the rows with if_exists='upsert'."
+
+
+def test_to_carto_bulk_load(mocker):
+    # Given
+    cm_mock = mocker.patch.object(ContextManager, 'bulk_copy_from', return_value='table_name')
+    df = DataFrame({'A': [1, 2]})
+
+    # When
+    to_carto(df, 'table_name', CREDENTIALS, if_exists='replace', skip_quota_warning=True, bulk_load=True)
+
+    # Then
+    assert cm_mock.call_args[0][1:] == ('table_name', 'replace', True, 3)
+    assert cm_mock.call_args[1]['parallel'] == 1
+
+
+def test_to_carto_indexes(mocker):
+    # Given
+    mocker.patch.object(ContextManager, 'copy_from', return_value='table_name')
+    cm_mock = mocker.patch.object(ContextManager, 'create_indexes')
+    df = GeoDataFrame({'A': [1, 2], 'B': ['a', 'b'], 'geometry': [Point(0, 0), Point(1, 1)]})
+
+    # When
+    to_carto(df, 'table_name', CREDENTIALS, skip_quota_warning=True, indexes=['A', ('A', 'B')],
+             cluster_on='the_geom')
+
+    # Then
+    assert cm_mock.call_args[0][0] == 'table_name'
+    assert [column.dbname for column in cm_mock.call_args[0][1]] == ['a', 'b', 'the_geom']
+    assert cm_mock.call_args[0][2:] == (['A', ('A', 'B')], 'the_geom')
+
+
+def test_to_carto_empty(mocker):
+    # Given
+    cm_mock = mocker.patch.object(ContextManager, 'copy_from', return_value='table_name')
+    create_indexes_mock = mocker.patch.object(ContextManager, 'create_indexes')
+    gdf = GeoDataFrame({'A': []}, geometry=[])
+
+    # When
+    to_carto(gdf, 'table_name', CREDENTIALS, skip_quota_warning=True, indexes=['A'])
+
+    # Then
+    cm_mock.assert_called_once()
+    assert len(cm_mock.call_args[0][0]) == 0
+    assert cm_mock.call_args[0][2] == 'fail'
+    assert list(cm_mock.call_args[1]['copy_data'].iter_blocks()) == []
+    create_indexes_mock.assert_called_once()
+
+
+def test_to_carto_indexes_bulk_load(mocker):
+    # Given
+    cm_mock = mocker.patch.object(ContextManager, 'bulk_copy_from', return_value='table_name')
+    create_indexes_mock = mocker.patch.object(ContextManager, 'create_indexes')
+    df = DataFrame({'A': [1, 2]})
+
+    # When
+    to_carto(df, 'table_name', CREDENTIALS, skip_quota_warning=True, bulk_load=True, indexes=['A'], cluster_on='A')
+
+    # Then
+    assert cm_mock.call_args[1]['indexes'] == ['A']
+    assert cm_mock.call_args[1]['cluster_on'] == 'A'
+    create_indexes_mock.assert_not_called()
+
+
+def test_to_carto_wrong_indexes(mocker):
+    # Given
+    cm_mock = mocker.patch.object(ContextManager, 'copy_from')
+    df = DataFrame({'A': [1]})
+
+    # When
+    with pytest.raises(ValueError) as e:
+        to_carto(df, '__table_name__', CREDENTIALS, skip_quota_warning=True, indexes=['A', 'B'])
+
+    # Then
+    assert str(e.value) == 'Wrong indexes. The columns b are not in the dataframe.'
+    cm_mock.assert_not_called()
+
+    with pytest.raises(ValueError) as e:
+        to_carto(df, '__table_name__', CREDENTIALS, skip_quota_warning=True, indexes='A')
+    assert str(e.value) == 'Wrong indexes. You should provide a list of column names or tuples of column names.'
+
+
+def test_to_carto_spatial_sort(mocker):
+    # Given
+    cm_mock = mocker.patch.object(ContextManager, 'copy_from')
+    df = GeoDataFrame({
+        'id': [1, 2, 3, 4],
+        'geometry': [Point(10, 0), Point(0, 0), Point(10, 10), Point(0, 10)]
+    })
+
+    # When
+    to_carto(df, '__table_name__', CREDENTIALS, skip_quota_warning=True, spatial_sort=True)
+
+    # Then
+    assert cm_mock.call_args[0][0]['id'].tolist() == [2, 4, 3, 1]
+    assert df['id'].tolist() == [1, 2, 3, 4]
+
+
+def test_to_carto_spatial_sort_no_geometry(mocker):
+    # Given
+    df = DataFrame({'id': [1, 2]})
+
+    # When
+    with pytest.raises(ValueError) as e:
+        to_carto(df, '__table_name__', CREDENTIALS, skip_quota_warning=True, spatial_sort=True)
+
+    # Then
+    assert str(e.value) == 'Wrong spatial_sort value. The dataframe has no geometry column.'
+
+
+def test_to_carto_no_copy(mocker):
+    # Given
+    cm_mock = mocker.patch.object(ContextManager, 'copy_from')
+    values = np.arange(3.0)
+    values.setflags(write=False)
+    df = GeoDataFrame({
+        'A': values,
+        'geometry': [Point(0, 0), Point(1, 1), None]
+    }, index=Index([4, 5, 6], name='id'), copy=False)
+
+    # When
+    to_carto(df, '__table_name__', CREDENTIALS, skip_quota_warning=True, index=True, copy=False)
+
+    # Then
+    gdf = cm_mock.call_args[0][0]
+    assert list(gdf.columns) == ['A', 'the_geom', 'id']
+    assert gdf.geometry.name == 'the_geom'
+    assert np.shares_memory(gdf['A'].to_numpy(), df['A'].to_numpy())
+    assert list(df.columns) == ['A', 'geometry']
+    assert df.geometry.name == 'geometry'
+
+
+def test_to_carto_no_copy_reprojection(mocker):
+    # Given
+    cm_mock = mocker.patch.object(ContextManager, 'copy_from')
+    df = GeoDataFrame({'geometry': [Point(0, 0), Point(1113194.9, 0)]}, crs='epsg:3857')
+
+    # When
+    to_carto(df, '__table_name__', CREDENTIALS, skip_quota_warning=True, copy=False)
+
+    # Then
+    gdf = cm_mock.call_args[0][0]
+    assert gdf.crs == 'epsg:3857'
+    assert _encode_copy_block(gdf, get_dataframe_columns_info(gdf)) == _encode_copy_block(
+        df.to_crs(epsg=4326).rename_geometry('the_geom'), get_dataframe_columns_info(gdf))
+    assert df['geometry'][1].x == 1113194.9
+
+
+def test_to_carto_compression(mocker):
+    # Given
+    cm_mock = mocker.patch.object(ContextManager, 'copy_from')
+    df = DataFrame({'A': [1]})
+
+    # When
+    to_carto(df, '__table_name__', CREDENTIALS, skip_quota_warning=True, compression=None, compression_level=6)
+
+    # Then
+    assert cm_mock.call_args[1]['compression'] is None
+    assert cm_mock.call_args[1]['compression_level'] == 6
+
+
+def test_to_carto_wrong_compression(mocker):
+    # Given
+    df = DataFrame({'A': [1]})
+
+    # When
+    with pytest.raises(ValueError) as e:
+        to_carto(df, '__table_name__', CREDENTIALS, compression='zstd')
+
+    # Then
+    assert str(e.value) == "Wrong compression. Valid values are: None, 'gzip'."
+
+
+def test_to_carto_wrong_parallel(mocker):
+    # Given
+    df = DataFrame({'A': [1]})
+
+    # When
+    with pytest.raises(ValueError) as e:
+        to_carto(df, '__table_name__', CREDENTIALS, parallel=0)
+
+    # Then
+    assert str(e.value) == 'Wrong parallel value. You should provide an integer >= 1.'
+
+
 def test_to_carto_wrong_dataframe(mocker):
     # When
     with pytest.raises(ValueError) as e:
@@ -424,7 +854,8 @@ def test_to_carto_wrong_if_exists(mocker):
         to_carto(df, '__table_name__', if_exists='keep_calm', skip_quota_warning=True)
 
     # Then
-    assert str(e.value) == 'Wrong option for the `if_exists` param. You should provide: fail, replace, append.'
+    assert str(e.value) == ('Wrong option for the `if_exists` param. '
+                            'You should provide: fail, replace, append, upsert, sync.')
 
 
 def test_to_carto_if_exists_replace(mocker):
@@ -5,7 +5,7 @@ from shapely.geometry import Point
 
 from cartoframes.auth import Credentials
 from cartoframes.io.carto import to_carto
-from cartoframes.io.managers.context_manager import ContextManager
+from cartoframes.io.managers.context_manager import ContextManager, COPY_MAX_BUFFER_SIZE
 from cartoframes.viz import Layer
 
 CREDENTIALS = Credentials('fake_user', 'fake_api_key')
@@ -31,4 +31,5 @@ def test_transform_crs_to_carto(mocker, crs):
     to_carto(gdf, 'table_name', CREDENTIALS, skip_quota_warning=True)
 
     # Then
-    cm_mock.assert_called_once_with(mocker.ANY, 'table_name', 'fail', True, 3)
+    cm_mock.assert_called_once_with(mocker.ANY, 'table_name', 'fail', True, 3, max_buffer_size=COPY_MAX_BUFFER_SIZE,
+                                    compression='gzip', compression_level=1, copy_data=mocker.ANY)
@@ -0,0 +1,141 @@
+"""Unit tests for cartoframes.aio"""
+
+import time
+import asyncio
+import threading
+
+import pytest
+
+from pandas import DataFrame
+
+from cartoframes import aio
+from cartoframes.auth import Credentials
+from cartoframes.io.managers.context_manager import ContextManager
+
+CREDENTIALS = Credentials('fake_user', 'fake_api_key')
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class TestAio(object):
+
+    def teardown_method(self):
+        aio.setup_aio()
+
+    def test_read_carto(self, mocker):
+        # Given
+        mock = mocker.patch('cartoframes.io.carto.read_carto', return_value=DataFrame({'A': [1]}))
+
+        # When
+        df = run(aio.read_carto('__source__', CREDENTIALS, limit=10))
+
+        # Then
+        mock.assert_called_once_with('__source__', credentials=CREDENTIALS, limit=10)
+        assert df['A'].tolist() == [1]
+
+    def test_read_carto_chunksize(self):
+        with pytest.raises(ValueError) as e:
+            run(aio.read_carto('__source__', CREDENTIALS, chunksize=10))
+
+        assert str(e.value) == 'Wrong chunksize value. The chunked reads are not available in the asynchronous API.'
+
+    def test_to_carto(self, mocker):
+        # Given
+        mock = mocker.patch('cartoframes.io.carto.to_carto', return_value='table_name')
+        df = DataFrame({'A': [1]})
+
+        # When
+        table_name = run(aio.to_carto(df, 'table_name', CREDENTIALS, if_exists='replace'))
+
+        # Then
+        mock.assert_called_once_with(df, 'table_name', credentials=CREDENTIALS, if_exists='replace')
+        assert table_name == 'table_name'
+
+    def test_execute_query(self, mocker):
+        # Given
+        mocker.patch('cartoframes.io.managers.context_manager._create_auth_client')
+        mock = mocker.patch.object(ContextManager, 'execute_query', return_value={'rows': []})
+
+        # When
+        result = run(aio.execute_query('SELECT 1', CREDENTIALS))
+
+        # Then
+        mock.assert_called_once_with('SELECT 1', True, True, None)
+        assert result == {'rows': []}
+
+    def test_has_table_without_credentials(self):
+        with pytest.raises(ValueError) as e:
+            run(aio.has_table('table_name'))
+
+        assert 'Credentials attribute is required' in str(e.value)
+
+    def test_concurrency_by_account(self, mocker):
+        # Given
+        aio.setup_aio(max_concurrency=2)
+        lock = threading.Lock()
+        running = {'current': 0, 'max': 0}
+
+        def has_table(table_name, credentials=None, schema=None):
+            with lock:
+                running['current'] += 1
+                running['max'] = max(running['max'], running['current'])
+            time.sleep(0.05)
+            with lock:
+                running['current'] -= 1
+            return True
+
+        mocker.patch('cartoframes.io.carto.has_table', side_effect=has_table)
+
+        async def main():
+            return await asyncio.gather(*[aio.has_table('table_{}'.format(i), CREDENTIALS) for i in range(6)])
+
+        # When
+        result = run(main())
+
+        # Then
+        assert result == [True] * 6
+        assert running['max'] == 2
+
+    def test_cancellation_keeps_slot(self, mocker):
+        # Given
+        aio.setup_aio(max_concurrency=1)
+        release = threading.Event()
+        started = []
+
+        def has_table(table_name, credentials=None, schema=None):
+            started.append(table_name)
+            if table_name == 'first':
+                release.wait(5)
+            return True
+
+        mocker.patch('cartoframes.io.carto.has_table', side_effect=has_table)
+
+        async def main():
+            first = asyncio.ensure_future(aio.has_table('first', CREDENTIALS))
+            await asyncio.sleep(0.05)
+            first.cancel()
+            second = asyncio.ensure_future(aio.has_table('second', CREDENTIALS))
+            await asyncio.sleep(0.05)
+            started_before_release = list(started)
+            release.set()
+            return started_before_release, await second, first.cancelled()
+
+        # When
+        started_before_release, result, cancelled = run(main())
+
+        # Then
+        assert started_before_release == ['first']
+        assert result is True
+        assert cancelled is True
+
+    def test_setup_aio_wrong_max_concurrency(self):
+        with pytest.raises(ValueError) as e:
+            aio.setup_aio(max_concurrency=0)
+
+        assert str(e.value) == 'Wrong max_concurrency value. You should provide an integer >= 1.'
@@ -0,0 +1,83 @@
+"""Unit tests for cartoframes.utils.arrow"""
+
+import io
+
+import pytest
+
+from cartoframes.utils.arrow import check_dtype_backend, get_arrow_column_types, read_csv_arrow, \
+    arrow_tables_to_dataframe
+from cartoframes.utils.columns import ColumnInfo
+
+pa = pytest.importorskip('pyarrow')
+
+
+class TestArrow(object):
+
+    def test_check_dtype_backend(self):
+        check_dtype_backend(None)
+        check_dtype_backend('pyarrow')
+
+        with pytest.raises(ValueError) as e:
+            check_dtype_backend('numpy')
+
+        assert str(e.value) == "Wrong dtype_backend. Valid values are: None, 'pyarrow'."
+
+    def test_get_arrow_column_types(self):
+        columns = [
+            ColumnInfo('cartodb_id', 'cartodb_id', 'integer', False),
+            ColumnInfo('the_geom', 'the_geom', 'geometry', True),
+            ColumnInfo('flag', 'flag', 'boolean', False),
+            ColumnInfo('number', 'number', 'double precision', False),
+            ColumnInfo('date', 'date', 'timestamp', False)
+        ]
+
+        assert get_arrow_column_types(columns) == {
+            'cartodb_id': pa.int64(),
+            'the_geom': pa.string(),
+            'flag': pa.bool_(),
+            'number': pa.float64()
+        }
+
+    def test_read_csv_arrow(self):
+        # Given
+        stream = io.BytesIO(
+            b'cartodb_id,flag,city,name,the_geom\n'
+            b'1,t,Madrid,a,0101\n'
+            b'2,f,Madrid,b,0101\n'
+            b'__null,__null,__null,c,__null\n'
+            b'4,t,Madrid,d,0101\n')
+
+        # When
+        df = read_csv_arrow(
+            stream,
+            column_types={'cartodb_id': pa.int64(), 'flag': pa.bool_(), 'the_geom': pa.string()},
+            null_values=['__null'],
+            true_values=['t'],
+            false_values=['f'],
+            exclude_dictionary=['the_geom'])
+
+        # Then
+        assert str(df['cartodb_id'].dtype) == 'int64[pyarrow]'
+        assert str(df['flag'].dtype) == 'bool[pyarrow]'
+        assert str(df['city'].dtype) == 'category'
+        assert str(df['name'].dtype) == 'string[pyarrow]'
+        assert str(df['the_geom'].dtype) == 'string[pyarrow]'
+        assert df['cartodb_id'].isna().tolist() == [False, False, True, False]
+        assert df['flag'].tolist()[:2] == [True, False]
+        assert df['city'].tolist()[:2] == ['Madrid', 'Madrid']
+
+    def test_arrow_tables_to_dataframe(self):
+        # Given
+        tables = [
+            pa.table({'city': ['Madrid', 'Madrid'], 'date': pa.array([None, None], type=pa.null())}),
+            pa.table({'city': ['Paris', 'Paris'], 'date': pa.array([0, 1], type=pa.timestamp('s'))})
+        ]
+
+        # When
+        df = arrow_tables_to_dataframe(tables)
+
+        # Then
+        assert str(df['city'].dtype) == 'category'
+        assert df['city'].cat.categories.tolist() == ['Madrid', 'Paris']
+        assert str(df['date'].dtype) == 'timestamp[s][pyarrow]'
+        assert df['date'].isna().tolist() == [True, True, False, False]
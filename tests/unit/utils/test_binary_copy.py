@@ -0,0 +1,175 @@
+"""Unit tests for cartoframes.utils.binary_copy"""
+
+import io
+import struct
+
+import numpy as np
+import pytest
+
+from shapely.geometry import Point
+
+from cartoframes.utils.binary_copy import BINARY_SIGNATURE, binary_copy_expression, read_binary_copy
+from cartoframes.utils.columns import ColumnInfo
+
+
+def _binary_stream(rows):
+    data = BINARY_SIGNATURE + struct.pack('>ii', 0, 0)
+    for row in rows:
+        data += struct.pack('>h', len(row))
+        for value in row:
+            if value is None:
+                data += struct.pack('>i', -1)
+            else:
+                data += struct.pack('>i', len(value)) + value
+    data += struct.pack('>h', -1)
+    return io.BytesIO(data)
+
+
+class TestBinaryCopy(object):
+
+    def setup_method(self):
+        self.columns = [
+            ColumnInfo('cartodb_id', 'cartodb_id', 'bigint', False),
+            ColumnInfo('value', 'value', 'double precision', False),
+            ColumnInfo('flag', 'flag', 'boolean', False),
+            ColumnInfo('name', 'name', 'text', False),
+            ColumnInfo('date', 'date', 'timestamp', False),
+            ColumnInfo('the_geom', 'the_geom', 'geometry', True)
+        ]
+
+    def test_binary_copy_expression(self):
+        assert [binary_copy_expression(column) for column in self.columns] == [
+            '"cartodb_id"::int8 AS "cartodb_id"',
+            '"value"::float8 AS "value"',
+            '"flag"::bool AS "flag"',
+            '"name"::text AS "name"',
+            '"date"::timestamp AS "date"',
+            'ST_AsBinary("the_geom") AS "the_geom"'
+        ]
+
+    def test_read_binary_copy(self):
+        # Given
+        stream = _binary_stream([
+            [struct.pack('>q', 1), struct.pack('>d', 1.5), b'\x01', 'Gran Vía'.encode('utf-8'),
+             struct.pack('>q', 86400 * 1000000), Point(1, 2).wkb],
+            [struct.pack('>q', 2), struct.pack('>d', -2.0), b'\x00', b'Ebro',
+             struct.pack('>q', 0), Point(3, 4).wkb]
+        ])
+
+        # When
+        df = read_binary_copy(stream, self.columns)
+
+        # Then
+        assert list(df.columns) == ['cartodb_id', 'value', 'flag', 'name', 'date', 'the_geom']
+        assert df['cartodb_id'].dtype == np.int64
+        assert df['cartodb_id'].tolist() == [1, 2]
+        assert df['value'].tolist() == [1.5, -2.0]
+        assert df['flag'].tolist() == [True, False]
+        assert df['name'].tolist() == ['Gran Vía', 'Ebro']
+        assert [str(date) for date in df['date']] == ['2000-01-02 00:00:00', '2000-01-01 00:00:00']
+        assert df['the_geom'].tolist() == [Point(1, 2), Point(3, 4)]
+
+    def test_read_binary_copy_nulls(self):
+        # Given
+        stream = _binary_stream([
+            [struct.pack('>q', 1), None, None, None, None, None],
+            [None, struct.pack('>d', 2.5), b'\x01', b'Ebro', struct.pack('>q', 0), Point(3, 4).wkb]
+        ])
+
+        # When
+        df = read_binary_copy(stream, self.columns)
+
+        # Then
+        assert np.isnan(df['cartodb_id'][1])
+        assert np.isnan(df['value'][0])
+        assert df['flag'].tolist() == [None, True]
+        assert df['name'].isnull().tolist() == [True, False]
+        assert str(df['date'][0]) == 'NaT'
+        assert df['the_geom'].tolist() == [None, Point(3, 4)]
+
+    def test_read_binary_copy_blocks(self):
+        # Given
+        # The id 6 is also the field count, so its bytes look like the start of a tuple
+        rows = [
+            [struct.pack('>q', i), struct.pack('>d', i / 2), b'\x01', 'Gran Vía {}'.format(i).encode('utf-8'),
+             struct.pack('>q', 0), Point(i, i).wkb if i % 3 else None]
+            for i in range(6, 106)
+        ]
+
+        # When
+        df = read_binary_copy(_binary_stream(rows), self.columns, block_size=100)
+
+        # Then
+        assert df['cartodb_id'].tolist() == list(range(6, 106))
+        assert df['value'].tolist() == [i / 2 for i in range(6, 106)]
+        assert df['name'].tolist() == ['Gran Vía {}'.format(i) for i in range(6, 106)]
+        assert df['the_geom'].tolist() == [Point(i, i) if i % 3 else None for i in range(6, 106)]
+        assert df.equals(read_binary_copy(_binary_stream(rows), self.columns))
+
+    def test_read_binary_copy_block_ends_after_tuples(self):
+        # Given
+        columns = [ColumnInfo('cartodb_id', 'cartodb_id', 'bigint', False)]
+        data = _binary_stream([[struct.pack('>q', i)] for i in range(3)]).getvalue()
+
+        # When
+        # The first block ends after the last tuple, and the second one is the 2-byte trailer
+        df = read_binary_copy(io.BytesIO(data), columns, block_size=len(data) - 2)
+
+        # Then
+        assert df['cartodb_id'].tolist() == [0, 1, 2]
+
+    def test_read_binary_copy_small_blocks(self):
+        # Given
+        data = _binary_stream([
+            [struct.pack('>q', i), struct.pack('>d', i / 2), b'\x01', 'Gran Vía {}'.format(i).encode('utf-8'),
+             struct.pack('>q', 0), Point(i, i).wkb if i % 3 else None]
+            for i in range(6, 10)
+        ]).getvalue()
+        expected = read_binary_copy(io.BytesIO(data), self.columns)
+
+        for block_size in range(1, len(data) + 1):
+            # When
+            df = read_binary_copy(io.BytesIO(data), self.columns, block_size=block_size)
+
+            # Then
+            assert df.equals(expected)
+
+    def test_read_binary_copy_truncated(self):
+        # Given
+        stream = _binary_stream([
+            [struct.pack('>q', 1), struct.pack('>d', 1.5), b'\x01', b'Ebro', struct.pack('>q', 0), Point(1, 2).wkb]
+        ])
+
+        # When
+        with pytest.raises(ValueError) as e:
+            read_binary_copy(io.BytesIO(stream.getvalue()[:-10]), self.columns)
+
+        # Then
+        assert str(e.value) == 'Wrong binary COPY stream. The stream ended before the trailer.'
+
+    def test_read_binary_copy_wrong_field_count(self):
+        # Given
+        stream = _binary_stream([[struct.pack('>q', 1)]])
+
+        # When
+        with pytest.raises(ValueError) as e:
+            read_binary_copy(stream, self.columns)
+
+        # Then
+        assert str(e.value) == 'Wrong binary COPY stream. Expected 6 fields but found 1.'
+
+    def test_read_binary_copy_empty(self):
+        # When
+        df = read_binary_copy(_binary_stream([]), self.columns)
+
+        # Then
+        assert len(df) == 0
+        assert list(df.columns) == ['cartodb_id', 'value', 'flag', 'name', 'date', 'the_geom']
+
+    def test_read_binary_copy_wrong_signature(self):
+        # When
+        with pytest.raises(ValueError) as e:
+            read_binary_copy(io.BytesIO(b'cartodb_id\n1\n'), self.columns)
+
+        # Then
+        assert str(e.value) == 'Wrong binary COPY stream. The PGCOPY signature was not found.'
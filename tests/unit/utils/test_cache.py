@@ -0,0 +1,108 @@
+"""Unit tests for cartoframes.utils.cache"""
+
+import os
+
+import pytest
+
+from pandas import DataFrame
+from shapely.geometry import Point
+
+from cartoframes.utils.cache import ResultCache
+
+pytest.importorskip('pyarrow')
+
+
+class TestResultCache(object):
+
+    def setup_method(self):
+        self.df = DataFrame({
+            'cartodb_id': [1, 2],
+            'name': ['a', None],
+            'the_geom': ['0101000000000000000000F03F0000000000000040', None]
+        })
+
+    def test_get_key(self):
+        cache = ResultCache()
+
+        key = cache.get_key('https://user.carto.com', 'SELECT *\n  FROM  table', 10)
+
+        assert key == cache.get_key('https://user.carto.com', 'SELECT * FROM table', 10)
+        assert key != cache.get_key('https://user.carto.com', 'SELECT * FROM table', None)
+        assert key != cache.get_key('https://other.carto.com', 'SELECT * FROM table', 10)
+
+    def test_read_write(self, tmpdir):
+        # Given
+        cache = ResultCache(path=str(tmpdir))
+
+        # When
+        miss = cache.read('__key__', '2021-01-01')
+        cache.write('__key__', '2021-01-01', self.df)
+        hit = cache.read('__key__', '2021-01-01')
+
+        # Then
+        assert miss is None
+        assert hit['cartodb_id'].tolist() == [1, 2]
+        assert hit['name'][0] == 'a'
+        assert hit['name'].isnull()[1]
+        assert hit['the_geom'][0] == self.df['the_geom'][0]
+
+    def test_write_interrupted(self, tmpdir, mocker):
+        # Given
+        cache = ResultCache(path=str(tmpdir))
+        cache.write('__key__', '2021-01-01', self.df)
+
+        def write_feather(df, path):
+            with open(path, 'wb') as f:
+                f.write(b'ARROW1')
+            raise KeyboardInterrupt()
+        mocker.patch('pyarrow.feather.write_feather', side_effect=write_feather)
+
+        # When
+        with pytest.raises(KeyboardInterrupt):
+            cache.write('__key__', '2021-02-01', self.df.head(1))
+
+        # Then
+        assert sorted(os.listdir(str(tmpdir))) == ['__key__.feather', '__key__.json']
+        assert cache.read('__key__', '2021-01-01')['cartodb_id'].tolist() == [1, 2]
+
+    def test_read_outdated(self, tmpdir):
+        # Given
+        cache = ResultCache(path=str(tmpdir))
+        cache.write('__key__', '2021-01-01', self.df)
+
+        # When
+        result = cache.read('__key__', '2021-02-01')
+
+        # Then
+        assert result is None
+        assert os.listdir(str(tmpdir)) == []
+
+    def test_write_geometries(self, tmpdir):
+        # Given
+        cache = ResultCache(path=str(tmpdir))
+        df = DataFrame({'the_geom': [Point(1, 2), None]})
+
+        # When
+        cache.write('__key__', '2021-01-01', df)
+        result = cache.read('__key__', '2021-01-01')
+
+        # Then
+        assert result['the_geom'].tolist() == [Point(1, 2).wkb, None]
+        assert isinstance(df['the_geom'][0], Point)
+
+    def test_evict_least_recently_used(self, tmpdir):
+        # Given
+        cache = ResultCache(path=str(tmpdir))
+        cache.write('__key1__', '2021-01-01', self.df)
+        cache.write('__key2__', '2021-01-01', self.df)
+        os.utime(os.path.join(str(tmpdir), '__key1__.feather'), (1, 1))
+        cache.read('__key2__', '2021-01-01')
+        cache.max_size = 2 * (os.path.getsize(os.path.join(str(tmpdir), '__key2__.feather')) +
+                              os.path.getsize(os.path.join(str(tmpdir), '__key2__.json')))
+
+        # When
+        cache.write('__key3__', '2021-01-01', self.df)
+
+        # Then
+        assert sorted(os.listdir(str(tmpdir))) == [
+            '__key2__.feather', '__key2__.json', '__key3__.feather', '__key3__.json']
@@ -7,8 +7,8 @@ from geopandas import GeoDataFrame
 
 from cartoframes.utils.geom_utils import set_geometry
 from cartoframes.utils.columns import ColumnInfo, get_dataframe_columns_info, normalize_names, \
-                                      obtain_converters, _convert_int, _convert_float, \
-                                      _convert_bool, _convert_generic
+                                      obtain_parser_dtypes, obtain_nullable_dtypes, obtain_na_values, \
+                                      normalize_null_values
 
 
 class TestColumns(object):
@@ -116,23 +116,46 @@ class TestColumns(object):
             ColumnInfo('g-e-o-m-e-t-r-y', 'g_e_o_m_e_t_r_y', 'text', False)
         ]
 
-    def test_converters(self):
+    def test_parser_dtypes(self):
         columns = [
             ColumnInfo('cartodb_id', 'cartodb_id', 'integer', False),
             ColumnInfo('the_geom', 'the_geom', 'geometry(Geometry, 4326)', True),
             ColumnInfo('name', 'name', 'text', False),
             ColumnInfo('flag', 'flag', 'boolean', False),
-            ColumnInfo('number', 'number', 'double precision', False)
+            ColumnInfo('number', 'number', 'double precision', False),
+            ColumnInfo('date', 'date', 'timestamp', False)
         ]
 
-        converters = obtain_converters(columns)
-
-        assert type(converters) == dict
-        assert converters['cartodb_id'] == _convert_int
-        assert converters['the_geom'] == _convert_generic
-        assert converters['name'] == _convert_generic
-        assert converters['flag'] == _convert_bool
-        assert converters['number'] == _convert_float
+        assert obtain_parser_dtypes(columns) == {'the_geom': str, 'name': str, 'number': 'float64'}
+        assert obtain_nullable_dtypes(columns) == {
+            'cartodb_id': 'Int64', 'flag': 'boolean', 'date': 'datetime64[us]'}
+        assert obtain_na_values(columns) == {
+            'cartodb_id': ['__null'],
+            'the_geom': ['__null'],
+            'name': ['__null'],
+            'flag': ['__null'],
+            'number': ['__null', 'NaN'],
+            'date': ['__null']
+        }
+
+    def test_normalize_null_values(self):
+        columns = [
+            ColumnInfo('cartodb_id', 'cartodb_id', 'integer', False),
+            ColumnInfo('flag', 'flag', 'boolean', False),
+            ColumnInfo('name', 'name', 'text', False)
+        ]
+        df = DataFrame({
+            'cartodb_id': [1.0, float('nan')],
+            'flag': [True, float('nan')],
+            'name': [float('nan'), float('nan')]
+        })
+
+        df = normalize_null_values(df, columns)
+
+        assert df['cartodb_id'].dtype == 'float64'
+        assert df['flag'].tolist() == [True, None]
+        assert df['name'].dtype == object
+        assert df['name'].tolist() == [None, None]
 
     def test_column_info_sort(self):
         columns = [
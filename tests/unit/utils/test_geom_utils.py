@@ -1,5 +1,6 @@
 """Unit tests for cartoframes.data.utils"""
 
+import numpy as np
 import pandas as pd
 import geopandas as gpd
 
@@ -8,7 +9,8 @@ from shapely.geometry import Point
 from cartoframes.utils.geom_utils import (ENC_EWKT, ENC_SHAPELY, ENC_WKB,
                                           ENC_WKB_BHEX, ENC_WKB_HEX, ENC_WKT,
                                           decode_geometry, decode_geometry_item,
-                                          detect_encoding_type, get_srid)
+                                          detect_encoding_type, get_srid,
+                                          hilbert_distances, hilbert_sort)
 
 
 class TestGeomUtils(object):
@@ -49,6 +51,22 @@ class TestGeomUtils(object):
         decoded_geom = decode_geometry(geom_none)
         assert str(decoded_geom) == str(expected_decoded_geom)
 
+    def test_decode_geometry_nulls(self):
+        geom = pd.Series([None, 'SRID=4326;POINT (1 2)', float('nan'), '', 'POINT (3 4)'], index=[5, 6, 7, 8, 9])
+
+        decoded_geom = decode_geometry(geom)
+        assert list(decoded_geom.index) == [5, 6, 7, 8, 9]
+        assert decoded_geom.tolist() == [None, Point([1, 2]), None, None, Point([3, 4])]
+        assert get_srid(decoded_geom[6]) == 4326
+        assert get_srid(decoded_geom[9]) == 0
+
+    def test_decode_geometry_workers(self, mocker):
+        mocker.patch('cartoframes.utils.geom_utils.DECODE_BLOCK_SIZE', 2)
+        geom = pd.Series(self.geom + [None, self.geom[0]])
+
+        decoded_geom = decode_geometry(geom, workers=2)
+        assert decoded_geom.tolist() == list(self.geometry) + [None, Point([0, 0])]
+
     def test_detect_encoding_type_shapely(self):
         enc_type = detect_encoding_type(Point(1234, 5789))
         assert enc_type == ENC_SHAPELY
@@ -127,3 +145,34 @@ class TestGeomUtils(object):
         geom = decode_geometry_item('SRID=4326;POINT (1234 5789)', ENC_EWKT)  # ext
         assert get_srid(geom) == 4326
         assert geom.wkt == 'POINT (1234 5789)'
+
+    def test_hilbert_distances(self):
+        # Given
+        x, y = np.meshgrid(np.arange(8.0), np.arange(8.0))
+        x, y = x.ravel(), y.ravel()
+
+        # When
+        distances = hilbert_distances(x, y, order=3)
+
+        # Then
+        assert sorted(distances) == list(range(64))
+        order = np.argsort(distances)
+        assert all(np.abs(np.diff(x[order])) + np.abs(np.diff(y[order])) == 1)
+
+    def test_hilbert_distances_nulls(self):
+        distances = hilbert_distances(np.array([0.0, np.nan, 1.0]), np.array([0.0, 1.0, 0.0]), order=1)
+
+        assert distances.tolist() == [0, 4, 3]
+
+    def test_hilbert_sort(self):
+        # Given
+        gdf = gpd.GeoDataFrame({
+            'id': [1, 2, 3, 4, 5],
+            'geometry': [Point(10, 0), None, Point(0, 0), Point(10, 10), Point(0, 10)]
+        })
+
+        # When
+        result = hilbert_sort(gdf)
+
+        # Then
+        assert result['id'].tolist() == [3, 5, 4, 1, 2]
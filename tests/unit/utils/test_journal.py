@@ -0,0 +1,88 @@
+"""Unit tests for cartoframes.utils.journal"""
+
+import os
+
+import pytest
+
+from pandas import DataFrame
+from geopandas import GeoDataFrame
+from shapely.geometry import Point
+
+from cartoframes.utils.journal import UploadJournal, get_fingerprint
+
+
+class TestUploadJournal(object):
+
+    def setup_method(self):
+        self.df = DataFrame({'A': [1, 2, 3], 'B': ['a', 'b', 'c']})
+
+    def test_get_key(self):
+        journal = UploadJournal()
+
+        key = journal.get_key('https://user.carto.com', 'table_name', self.df, 2)
+
+        assert key == journal.get_key('https://user.carto.com', 'table_name', self.df.copy(), 2)
+        assert key != journal.get_key('https://user.carto.com', 'table_name', self.df, 3)
+        assert key != journal.get_key('https://user.carto.com', 'other_table', self.df, 2)
+        assert key != journal.get_key('https://user.carto.com', 'table_name', self.df.iloc[:2], 2)
+
+    def test_commit_read_remove(self, tmpdir):
+        # Given
+        journal = UploadJournal(path=str(tmpdir.join('uploads')))
+
+        # When
+        empty = journal.read('__key__')
+        journal.commit('__key__', 0, 2)
+        journal.commit('__key__', 2, 3)
+        committed = journal.read('__key__')
+        journal.remove('__key__')
+
+        # Then
+        assert empty == set()
+        assert committed == {(0, 2), (2, 3)}
+        assert journal.read('__key__') == set()
+
+    def test_commit_interrupted(self, tmpdir, mocker):
+        # Given
+        journal = UploadJournal(path=str(tmpdir))
+        journal.commit('__key__', 0, 2)
+
+        def dump(data, f):
+            f.write('{"ranges": [[0, ')
+            raise KeyboardInterrupt()
+        mocker.patch('cartoframes.utils.journal.json.dump', side_effect=dump)
+
+        # When
+        with pytest.raises(KeyboardInterrupt):
+            journal.commit('__key__', 2, 3)
+
+        # Then
+        assert os.listdir(str(tmpdir)) == ['__key__.json']
+        assert journal.read('__key__') == {(0, 2)}
+
+    def test_commit_temporary_files(self, tmpdir, mocker):
+        # Given
+        replace_mock = mocker.patch('cartoframes.utils.journal.os.replace')
+
+        # When
+        UploadJournal(path=str(tmpdir)).commit('__key__', 0, 2)
+        UploadJournal(path=str(tmpdir)).commit('__key__', 2, 3)
+
+        # Then
+        tmp_paths = [call[0][0] for call in replace_mock.call_args_list]
+        assert tmp_paths[0] != tmp_paths[1]
+        assert all(os.path.dirname(path) == str(tmpdir) and path.endswith('.tmp') for path in tmp_paths)
+
+
+def test_get_fingerprint():
+    # Given
+    gdf = GeoDataFrame({'A': [1, 2], 'B': [{'x': 1}, None]}, geometry=[Point(0, 0), Point(1, 1)])
+    other = GeoDataFrame({'A': [1, 2], 'B': [{'x': 1}, None]}, geometry=[Point(0, 0), Point(1, 2)])
+
+    # When
+    fingerprint = get_fingerprint(gdf)
+
+    # Then
+    assert fingerprint == get_fingerprint(gdf.copy())
+    assert fingerprint != get_fingerprint(other)
+    assert fingerprint != get_fingerprint(gdf.rename(columns={'A': 'C'}))
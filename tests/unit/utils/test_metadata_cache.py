@@ -0,0 +1,90 @@
+"""Unit tests for cartoframes.utils.metadata_cache"""
+
+from cartoframes.utils.metadata_cache import MetadataCache
+
+
+class TestMetadataCache(object):
+
+    def setup_method(self):
+        self.calls = []
+
+    def compute(self):
+        self.calls.append(1)
+        return len(self.calls)
+
+    def test_get(self):
+        # Given
+        cache = MetadataCache()
+
+        # When
+        first = cache.get('__creds__', 'schema', None, self.compute)
+        second = cache.get('__creds__', 'schema', None, self.compute)
+        other = cache.get('__other_creds__', 'schema', None, self.compute)
+
+        # Then
+        assert (first, second, other) == (1, 1, 2)
+
+    def test_get_expired(self, mocker):
+        # Given
+        cache = MetadataCache(ttl=10)
+        mock = mocker.patch('cartoframes.utils.metadata_cache.time.monotonic', return_value=100)
+        cache.get('__creds__', 'schema', None, self.compute)
+
+        # When
+        mock.return_value = 111
+        result = cache.get('__creds__', 'schema', None, self.compute)
+
+        # Then
+        assert result == 2
+
+    def test_get_drops_expired(self, mocker):
+        # Given
+        cache = MetadataCache(ttl=10)
+        mock = mocker.patch('cartoframes.utils.metadata_cache.time.monotonic', return_value=100)
+        cache.get('__creds__', 'exists', 'SELECT * FROM a', self.compute)
+        cache.get('__creds__', 'exists', 'SELECT * FROM b', self.compute)
+
+        # When
+        mock.return_value = 111
+        cache.get('__creds__', 'exists', 'SELECT * FROM c', self.compute)
+
+        # Then
+        assert list(cache._entries) == [('__creds__', 'exists', 'SELECT * FROM c')]
+
+    def test_get_max_entries(self):
+        # Given
+        cache = MetadataCache(max_entries=2)
+
+        # When
+        cache.get('__creds__', 'exists', 'SELECT * FROM a', self.compute)
+        cache.get('__creds__', 'exists', 'SELECT * FROM b', self.compute)
+        cache.get('__creds__', 'exists', 'SELECT * FROM c', self.compute)
+
+        # Then
+        assert len(cache._entries) == 2
+        assert cache.get('__creds__', 'exists', 'SELECT * FROM c', self.compute) == 3
+        assert cache.get('__creds__', 'exists', 'SELECT * FROM a', self.compute) == 4
+
+    def test_get_disabled(self):
+        cache = MetadataCache(ttl=0)
+
+        cache.get('__creds__', 'schema', None, self.compute)
+        cache.get('__creds__', 'schema', None, self.compute)
+
+        assert len(self.calls) == 2
+
+    def test_invalidate_query(self):
+        # Given
+        cache = MetadataCache()
+        cache.get('__creds__', 'schema', None, self.compute)
+        cache.get('__creds__', 'exists', 'SELECT * FROM t', self.compute)
+        cache.get('__other_creds__', 'exists', 'SELECT * FROM t', self.compute)
+
+        # When
+        cache.invalidate_query('__creds__', 'SELECT * FROM t')
+        cache.invalidate_query('__creds__', 'BEGIN; drop TABLE IF EXISTS t; COMMIT;')
+
+        # Then
+        assert cache.get('__creds__', 'schema', None, self.compute) == 1
+        assert cache.get('__creds__', 'exists', 'SELECT * FROM t', self.compute) == 4
+        assert cache.get('__other_creds__', 'exists', 'SELECT * FROM t', self.compute) == 3